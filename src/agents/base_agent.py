@@ -1,33 +1,57 @@
 import json
 from json import JSONDecodeError
+from typing import TYPE_CHECKING
 
-from anthropic import Anthropic
+from src.telemetry import LLM_CALL, record_anthropic_usage, span
 
+from .prompts import DETECT_DOCUMENT_TYPE_PROMPT, DOCUMENT_TYPES, PromptCacheStats, cached_text
 
-class ProxyAgent:
-    """Прокси агент, который подготовит данные для документа"""
-    DOCUMENT_TYPES = ["Счёт", "Акт", "Карточка организации"]
+if TYPE_CHECKING:
+    from .llm_client import LLMClient
 
-    def __init__(self, client: Anthropic):
-        self.client = client
 
-    def detect_document_type(self, user_prompt: str) -> dict[str, str|None]:
-        """Функция для определения типа документа"""
-        prompt = f"""
-        Определи тип документа, который хочет сформировать юзер.
-        Пришли ответ в виде json и никак больше.
-        Формат ответа: {{"type": "вид документа"}}
-        Вместо "вид документа" используй один из: {self.DOCUMENT_TYPES}
-        Если не удалось определить — верни "None".
-        Промт юзера: {user_prompt}
-        """
+class LLMBackedAgent:
+    """Агент с одним запросом к модели на вызов: клиент и статистика кэша промптов"""
+
+    def __init__(self, llm: "LLMClient | None" = None):
+        self._llm = llm
+        self.cache_stats = PromptCacheStats()
+
+    # SDK Anthropic импортируется около полусекунды, а локальный классификатор
+    # часто обходится без LLM, поэтому клиент подключается при первом запросе
+
+    @property
+    def llm(self) -> "LLMClient":
+        """Общий клиент процесса: пул соединений, повторы и лимиты запросов"""
+        if self._llm is None:
+            from .llm_client import shared_llm_client
+            self._llm = shared_llm_client()
+        return self._llm
+
+    def _record_usage(self, response) -> None:
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.cache_stats.record_anthropic_usage(usage)
+            record_anthropic_usage(getattr(response, "model", None), usage)
+
 
+class ProxyAgent(LLMBackedAgent):
+    """Прокси агент, который подготовит данные для документа"""
+    DOCUMENT_TYPES = DOCUMENT_TYPES
+
+    @staticmethod
+    def _build_request(user_prompt: str) -> dict:
+        # Инструкция — неизменный кэшируемый system, промт юзера — отдельным сообщением
+        return {
+            "model": "claude-3-5-haiku-latest",
+            "max_tokens": 300,
+            "system": [cached_text(DETECT_DOCUMENT_TYPE_PROMPT)],
+            "messages": [{"role": "user", "content": user_prompt}],
+        }
+
+    def _parse_response(self, response) -> dict[str, str|None]:
+        self._record_usage(response)
         try:
-            response = self.client.messages.create(
-                model="claude-3-5-haiku-latest",
-                max_tokens=300,
-                messages=[{"role": "user", "content": prompt}]
-            )
             data = json.loads(response.content[0].text)
             doc_type = data["type"]
 
@@ -38,3 +62,17 @@ class ProxyAgent:
 
         except (JSONDecodeError, KeyError, IndexError, AttributeError) as e:
             return {"type": None, "error": str(e)}
+
+    def detect_document_type(self, user_prompt: str) -> dict[str, str|None]:
+        """Функция для определения типа документа"""
+        request = self._build_request(user_prompt)
+        with span(LLM_CALL, model=request["model"]):
+            response = self.llm.create(**request)
+        return self._parse_response(response)
+
+    async def adetect_document_type(self, user_prompt: str) -> dict[str, str|None]:
+        """Асинхронное определение типа документа, не блокирующее event loop"""
+        request = self._build_request(user_prompt)
+        with span(LLM_CALL, model=request["model"]):
+            response = await self.llm.acreate(**request)
+        return self._parse_response(response)
@@ -0,0 +1,68 @@
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.telemetry import LLM_CALL, record_span, record_tokens
+
+from .prompts import PromptCacheStats
+
+
+def _model_name(serialized: dict | None, kwargs: dict) -> str | None:
+    params = kwargs.get("invocation_params") or {}
+    metadata = kwargs.get("metadata") or {}
+    return params.get("model") or params.get("model_name") or metadata.get("ls_model_name") or (
+        (serialized or {}).get("name")
+    )
+
+
+class TelemetryCallbackHandler(BaseCallbackHandler):
+    """Спан на каждый вызов модели внутри графа и учёт токенов из usage_metadata.
+
+    Колбэки LangChain вызываются в контексте хода агента, поэтому вызовы модели
+    попадают в разбивку спана agent_turn.
+    """
+
+    def __init__(self):
+        self._started: dict[UUID, tuple[float, str | None]] = {}
+
+    def on_chat_model_start(
+        self, serialized: dict, messages: list, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._started[run_id] = (time.perf_counter(), _model_name(serialized, kwargs))
+
+    def on_llm_start(
+        self, serialized: dict, prompts: list[str], *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._started[run_id] = (time.perf_counter(), _model_name(serialized, kwargs))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        started, model = self._started.pop(run_id, (None, None))
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or usage
+        model = model or (response.llm_output or {}).get("model")
+
+        # usage_metadata ChatAnthropic включает кэшированные токены во input_tokens
+        stats = PromptCacheStats()
+        stats.record_usage_metadata(usage)
+        record_tokens(
+            model,
+            input_tokens=stats.uncached_input_tokens,
+            output_tokens=stats.output_tokens,
+            cache_read_tokens=stats.cache_read_input_tokens,
+            cache_creation_tokens=stats.cache_creation_input_tokens,
+        )
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            record_span(LLM_CALL, elapsed, model=model, output_tokens=stats.output_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        started, model = self._started.pop(run_id, (None, None))
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            record_span(LLM_CALL, elapsed, error=f"{type(error).__name__}: {error}", model=model)
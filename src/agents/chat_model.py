@@ -0,0 +1,51 @@
+from functools import cached_property
+from typing import Any, Callable
+
+from langchain_anthropic import ChatAnthropic
+from pydantic import Field
+
+from .llm_client import LLMClient
+
+
+class _ManagedMessages:
+    """messages SDK, у которого create идёт через LLMClient, остальное — напрямую"""
+
+    def __init__(self, messages: Any, create):
+        self._messages = messages
+        self.create = create
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._messages, name)
+
+
+class _ManagedClient:
+    """Клиент SDK для ChatAnthropic; async-клиент берётся у LLMClient для текущего event loop"""
+
+    def __init__(self, get_client: Callable[[], Any], create):
+        self._get_client = get_client
+        self._create = create
+
+    @property
+    def messages(self) -> _ManagedMessages:
+        return _ManagedMessages(self._get_client().messages, self._create)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get_client(), name)
+
+
+class ManagedChatAnthropic(ChatAnthropic):
+    """ChatAnthropic, чьи вызовы модели проходят через общий LLMClient:
+    его пул соединений, дедлайны, повторы и лимиты запросов и токенов"""
+
+    llm_client: LLMClient = Field(exclude=True)
+    max_retries: int = 0
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @cached_property
+    def _client(self) -> Any:
+        return _ManagedClient(lambda: self.llm_client.client, self.llm_client.create)
+
+    @cached_property
+    def _async_client(self) -> Any:
+        return _ManagedClient(lambda: self.llm_client.async_client, self.llm_client.acreate)
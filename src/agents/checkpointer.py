@@ -0,0 +1,401 @@
+import asyncio
+import random
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator, Sequence
+from pathlib import Path
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.types import TASKS, ChannelProtocol
+from sqlalchemy import (
+    Column,
+    Float,
+    Integer,
+    LargeBinary,
+    MetaData,
+    String,
+    Table,
+    and_,
+    create_engine,
+    delete,
+    event,
+    insert,
+    select,
+    update,
+)
+
+metadata_obj = MetaData()
+
+threads_table = Table(
+    "threads", metadata_obj,
+    Column("thread_id", String, primary_key=True),
+    Column("updated_at", Float, nullable=False),
+    Column("finished_at", Float, nullable=True),
+)
+
+checkpoints_table = Table(
+    "checkpoints", metadata_obj,
+    Column("thread_id", String, primary_key=True),
+    Column("checkpoint_ns", String, primary_key=True),
+    Column("checkpoint_id", String, primary_key=True),
+    Column("parent_checkpoint_id", String, nullable=True),
+    Column("checkpoint_type", String, nullable=False),
+    Column("checkpoint", LargeBinary, nullable=False),
+    Column("metadata_type", String, nullable=False),
+    Column("metadata", LargeBinary, nullable=False),
+)
+
+writes_table = Table(
+    "writes", metadata_obj,
+    Column("thread_id", String, primary_key=True),
+    Column("checkpoint_ns", String, primary_key=True),
+    Column("checkpoint_id", String, primary_key=True),
+    Column("task_id", String, primary_key=True),
+    Column("idx", Integer, primary_key=True),
+    Column("channel", String, nullable=False),
+    Column("value_type", String, nullable=False),
+    Column("value", LargeBinary, nullable=False),
+    Column("task_path", String, nullable=False, default=""),
+)
+
+
+class SqliteCheckpointer(BaseCheckpointSaver[str]):
+    """Хранилище состояния диалогов LangGraph в SQLite.
+
+    В отличие от InMemorySaver, состояние переживает перезапуск и не растёт
+    в памяти процесса. После каждой записи у треда остаются только последние
+    keep_last чекпоинтов (нужен текущий и его родитель). Завершённые треды
+    удаляются через finished_ttl, брошенные — через idle_ttl секунд.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = "output/.state/checkpoints.sqlite3",
+        *,
+        keep_last: int = 2,
+        finished_ttl: float = 24 * 3600,
+        idle_ttl: float = 30 * 24 * 3600,
+        evict_every: int = 100,
+        serde: Optional[SerializerProtocol] = None,
+    ) -> None:
+        super().__init__(serde=serde)
+        if keep_last < 2:
+            raise ValueError("keep_last must be at least 2")
+        self.keep_last = keep_last
+        self.finished_ttl = finished_ttl
+        self.idle_ttl = idle_ttl
+        self.evict_every = evict_every
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        event.listen(self.engine, "connect", self._on_connect)
+        metadata_obj.create_all(self.engine)
+
+    @staticmethod
+    def _on_connect(dbapi_connection, _) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    def _row_to_tuple(self, conn, row) -> CheckpointTuple:
+        thread_id, checkpoint_ns = row.thread_id, row.checkpoint_ns
+        checkpoint_id = row.checkpoint_id
+        writes = conn.execute(
+            select(writes_table)
+            .where(and_(
+                writes_table.c.thread_id == thread_id,
+                writes_table.c.checkpoint_ns == checkpoint_ns,
+                writes_table.c.checkpoint_id == checkpoint_id,
+            ))
+            .order_by(writes_table.c.task_id, writes_table.c.idx)
+        ).all()
+
+        sends = []
+        if row.parent_checkpoint_id:
+            sends = conn.execute(
+                select(writes_table.c.value_type, writes_table.c.value)
+                .where(and_(
+                    writes_table.c.thread_id == thread_id,
+                    writes_table.c.checkpoint_ns == checkpoint_ns,
+                    writes_table.c.checkpoint_id == row.parent_checkpoint_id,
+                    writes_table.c.channel == TASKS,
+                ))
+                .order_by(writes_table.c.task_path, writes_table.c.task_id, writes_table.c.idx)
+            ).all()
+
+        checkpoint: Checkpoint = self.serde.loads_typed((row.checkpoint_type, row.checkpoint))
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "pending_sends": [self.serde.loads_typed((s.value_type, s.value)) for s in sends],
+            },
+            metadata=self.serde.loads_typed((row.metadata_type, row.metadata)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": row.parent_checkpoint_id,
+                    }
+                }
+                if row.parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (w.task_id, w.channel, self.serde.loads_typed((w.value_type, w.value)))
+                for w in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = select(checkpoints_table).where(and_(
+            checkpoints_table.c.thread_id == thread_id,
+            checkpoints_table.c.checkpoint_ns == checkpoint_ns,
+        ))
+        if checkpoint_id := get_checkpoint_id(config):
+            query = query.where(checkpoints_table.c.checkpoint_id == checkpoint_id)
+        else:
+            query = query.order_by(checkpoints_table.c.checkpoint_id.desc()).limit(1)
+
+        with self.engine.connect() as conn:
+            row = conn.execute(query).first()
+            return self._row_to_tuple(conn, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = select(checkpoints_table).order_by(
+            checkpoints_table.c.thread_id, checkpoints_table.c.checkpoint_id.desc()
+        )
+        if config:
+            thread_id = config["configurable"]["thread_id"]
+            query = query.where(checkpoints_table.c.thread_id == thread_id)
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query = query.where(checkpoints_table.c.checkpoint_ns == checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query = query.where(checkpoints_table.c.checkpoint_id == checkpoint_id)
+        if before and (before_checkpoint_id := get_checkpoint_id(before)):
+            query = query.where(checkpoints_table.c.checkpoint_id < before_checkpoint_id)
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+            for row in rows:
+                if limit is not None and limit <= 0:
+                    break
+                item = self._row_to_tuple(conn, row)
+                if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                if limit is not None:
+                    limit -= 1
+                yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        c = checkpoint.copy()
+        c.pop("pending_sends", None)  # type: ignore[misc]
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(c)
+        metadata_type, metadata_blob = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        now = time.time()
+
+        with self.engine.begin() as conn:
+            conn.execute(
+                insert(checkpoints_table).prefix_with("OR REPLACE").values(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    checkpoint_id=checkpoint["id"],
+                    parent_checkpoint_id=config["configurable"].get("checkpoint_id"),
+                    checkpoint_type=checkpoint_type,
+                    checkpoint=checkpoint_blob,
+                    metadata_type=metadata_type,
+                    metadata=metadata_blob,
+                )
+            )
+            conn.execute(
+                insert(threads_table).prefix_with("OR REPLACE").values(
+                    thread_id=thread_id, updated_at=now, finished_at=None
+                )
+            )
+            self._compact(conn, thread_id, checkpoint_ns)
+
+        with self._lock:
+            self._puts += 1
+            evict = self._puts % self.evict_every == 0
+        if evict:
+            self.evict()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def _compact(self, conn, thread_id: str, checkpoint_ns: str) -> None:
+        """Удаляет у треда всё, кроме последних keep_last чекпоинтов"""
+        stale = conn.execute(
+            select(checkpoints_table.c.checkpoint_id)
+            .where(and_(
+                checkpoints_table.c.thread_id == thread_id,
+                checkpoints_table.c.checkpoint_ns == checkpoint_ns,
+            ))
+            .order_by(checkpoints_table.c.checkpoint_id.desc())
+            .offset(self.keep_last)
+        ).scalars().all()
+        if not stale:
+            return
+        for table in (checkpoints_table, writes_table):
+            conn.execute(delete(table).where(and_(
+                table.c.thread_id == thread_id,
+                table.c.checkpoint_ns == checkpoint_ns,
+                table.c.checkpoint_id.in_(stale),
+            )))
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        rows = []
+        replace = all(c in WRITES_IDX_MAP for c, _ in writes)
+        for idx, (channel, value) in enumerate(writes):
+            value_type, value_blob = self.serde.dumps_typed(value)
+            rows.append({
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+                "task_id": task_id,
+                "idx": WRITES_IDX_MAP.get(channel, idx),
+                "channel": channel,
+                "value_type": value_type,
+                "value": value_blob,
+                "task_path": task_path,
+            })
+        if not rows:
+            return
+
+        # Специальные каналы (ошибки, прерывания) перезаписываются, обычные записи — только первая
+        with self.engine.begin() as conn:
+            conflict = "OR REPLACE" if replace else "OR IGNORE"
+            conn.execute(insert(writes_table).prefix_with(conflict), rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.engine.begin() as conn:
+            for table in (checkpoints_table, writes_table, threads_table):
+                conn.execute(delete(table).where(table.c.thread_id == thread_id))
+
+    def mark_finished(self, thread_id: str) -> None:
+        """Отмечает диалог завершённым: он будет удалён через finished_ttl"""
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(threads_table)
+                .where(threads_table.c.thread_id == thread_id)
+                .values(finished_at=time.time())
+            )
+
+    def evict(self) -> int:
+        """Удаляет завершённые и давно неактивные треды, возвращает их число"""
+        now = time.time()
+        with self.engine.begin() as conn:
+            expired = conn.execute(
+                select(threads_table.c.thread_id).where(
+                    (threads_table.c.finished_at < now - self.finished_ttl)
+                    | (threads_table.c.updated_at < now - self.idle_ttl)
+                )
+            ).scalars().all()
+            for table in (checkpoints_table, writes_table, threads_table):
+                conn.execute(delete(table).where(table.c.thread_id.in_(expired)))
+        return len(expired)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: ChannelProtocol) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        next_v = current_v + 1
+        next_h = random.random()
+        return f"{next_v:032}.{next_h:016}"
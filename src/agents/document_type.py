@@ -0,0 +1,153 @@
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from src.telemetry import increment
+
+from .base_agent import ProxyAgent
+
+ACT = "Акт"
+INVOICE = "Счёт"
+ORG_CARD = "Карточка организации"
+DOCUMENT_TYPES = [INVOICE, ACT, ORG_CARD]
+
+# Окончания существительных мужского рода (акт, счёт) и на -ка (карточка)
+_MASC_ENDINGS = r"(?:а|у|ом|е|ы|ов|ам|ами|ах)?"
+_FEM_ENDINGS = r"(?:а|и|е|у|ой|ою|ам|ами|ах)"
+
+# (тип, шаблон, вес): вес 1.0 — однозначная фраза, меньше — одиночное слово
+_PATTERNS = [
+    (ACT, rf"акт{_MASC_ENDINGS}\s+(?:выполненных|оказанных|приема|сдачи|сверки)", 1.0),
+    (ACT, rf"акт{_MASC_ENDINGS}", 0.8),
+    (ACT, r"acts?", 0.8),
+    (INVOICE, rf"сч[её]т{_MASC_ENDINGS}\s+на\s+оплату", 1.0),
+    (INVOICE, rf"сч[её]т{_MASC_ENDINGS}", 0.8),
+    (INVOICE, r"invoices?", 0.8),
+    (
+        ORG_CARD,
+        rf"(?:карточк{_FEM_ENDINGS}|карточек)\s+(?:организации|предприятия|компании|ип|контрагента)",
+        1.0,
+    ),
+    (ORG_CARD, rf"карточк{_FEM_ENDINGS}|карточек", 0.8),
+    (ORG_CARD, r"реквизит(?:ы|а|ов|ам|ами|ах)?", 0.8),
+    (ORG_CARD, r"(?:org(?:anization)?\s+card|requisites)", 0.8),
+]
+
+
+def normalize_prompt(user_prompt: str) -> str:
+    """Нижний регистр, ё -> е, без пунктуации и лишних пробелов"""
+    text = user_prompt.lower().replace("ё", "е")
+    text = re.sub(r"[^\w\s-]", " ", text)
+    return " ".join(text.split())
+
+
+@dataclass(frozen=True)
+class Classification:
+    type: str | None
+    confidence: float
+
+
+class KeywordClassifier:
+    """Локальный классификатор по ключевым словам с учётом границ слов и словоформ"""
+
+    def __init__(self):
+        self._patterns = [
+            (doc_type, re.compile(rf"(?<!\w){pattern}(?!\w)"), weight)
+            for doc_type, pattern, weight in _PATTERNS
+        ]
+
+    def classify(self, normalized_prompt: str) -> Classification:
+        scores: dict[str, float] = {}
+        for doc_type, pattern, weight in self._patterns:
+            if weight > scores.get(doc_type, 0.0) and pattern.search(normalized_prompt):
+                scores[doc_type] = weight
+
+        if not scores:
+            return Classification(None, 0.0)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best_type, best = ranked[0]
+        # Упомянуты несколько типов ("не акт, а счёт") — доверие падает на вес конкурента
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return Classification(best_type, round(best - runner_up, 3))
+
+
+class TieredDocumentTypeDetector:
+    """Определение типа документа: сначала локальный классификатор, LLM — только
+    при низкой уверенности. Ответы LLM кэшируются по нормализованному промпту (LRU).
+    """
+
+    DOCUMENT_TYPES = DOCUMENT_TYPES
+
+    def __init__(
+        self,
+        proxy_agent: ProxyAgent | None = None,
+        threshold: float = 0.75,
+        cache_size: int = 1024,
+    ):
+        self.proxy_agent = proxy_agent
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self.classifier = KeywordClassifier()
+        self._cache: OrderedDict[str, str | None] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"total": 0, "local": 0, "cache": 0, "llm": 0}
+
+    @property
+    def offload_ratio(self) -> float:
+        """Доля запросов, обошедшихся без обращения к LLM"""
+        total = self.stats["total"]
+        return (self.stats["local"] + self.stats["cache"]) / total if total else 0.0
+
+    def _count(self, tier: str) -> None:
+        with self._lock:
+            self.stats["total"] += 1
+            self.stats[tier] += 1
+        increment("document_type_detections", tier=tier)
+
+    def _local(self, user_prompt: str) -> tuple[str, Classification, bool, str | None]:
+        """Локальные уровни: (ключ, классификация, найдено ли, тип)"""
+        key = normalize_prompt(user_prompt)
+        result = self.classifier.classify(key)
+        if result.confidence >= self.threshold or self.proxy_agent is None:
+            self._count("local")
+            return key, result, True, result.type
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                doc_type = self._cache[key]
+                self.stats["total"] += 1
+                self.stats["cache"] += 1
+                increment("document_type_detections", tier="cache")
+                return key, result, True, doc_type
+        return key, result, False, None
+
+    def _remember(self, key: str, fallback: Classification, data: dict) -> str | None:
+        self._count("llm")
+        if "error" in data:
+            # Ответ LLM не разобран — лучше локальная догадка, чем ничего; не кэшируем
+            return fallback.type
+
+        doc_type = data.get("type")
+        with self._lock:
+            self._cache[key] = doc_type
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return doc_type
+
+    def detect_document_type(self, user_prompt: str) -> str | None:
+        """Определяет тип документа из пользовательского ввода"""
+        key, result, found, doc_type = self._local(user_prompt)
+        if found:
+            return doc_type
+        return self._remember(key, result, self.proxy_agent.detect_document_type(user_prompt))
+
+    async def adetect_document_type(self, user_prompt: str) -> str | None:
+        key, result, found, doc_type = self._local(user_prompt)
+        if found:
+            return doc_type
+        detected = await self.proxy_agent.adetect_document_type(user_prompt)
+        return self._remember(key, result, detected)
@@ -0,0 +1,248 @@
+"""Извлечение данных документа из свободного текста одним вызовом модели.
+
+Вместо диалога "одно поле — один ход" модель получает сообщение пользователя
+и заполняет строгую схему инструмента record_document_data: заказчик и
+список работ. Поля проверяются моделями (src.models, src.validation);
+переспрашиваются только отсутствующие и не прошедшие проверку. История
+диалога не пересылается: в следующий запрос уходят уже собранные поля.
+"""
+from dataclasses import dataclass, field, fields
+
+from src.exceptions import ValidationError
+from src.models import Customer, WorkItem
+from src.telemetry import LLM_CALL, increment, span
+from src.validation import validate_inn, validate_kpp, validate_ogrn
+
+from .base_agent import LLMBackedAgent
+from .prompts import EXTRACTION_PROMPT, PromptCacheStats, cached_text, extraction_message
+
+EXTRACTION_TOOL_NAME = "record_document_data"
+
+# Поля, без которых документ не собрать: те же, что спрашивает диалог сбора данных
+REQUIRED_FIELDS = ("name", "inn", "ogrn", "address", "signatory", "jobs")
+
+FIELD_TITLES = {
+    "name": "название заказчика",
+    "inn": "ИНН",
+    "kpp": "КПП",
+    "ogrn": "ОГРН",
+    "address": "адрес",
+    "signatory": "подписант",
+    "phone": "телефон",
+    "jobs": "работы (название, количество, цена)",
+    "customer": "реквизиты заказчика",
+}
+
+_CUSTOMER_FIELDS = ("name", "inn", "kpp", "ogrn", "address", "signatory", "phone")
+
+
+def _nullable(schema: dict) -> dict:
+    return {**schema, "type": [schema["type"], "null"]}
+
+
+# Все ключи обязательны, лишние запрещены: неизвестное модель отдаёт как null
+EXTRACTION_TOOL = {
+    "name": EXTRACTION_TOOL_NAME,
+    "description": "Записывает реквизиты заказчика и список работ для акта или счёта",
+    "input_schema": {
+        "type": "object",
+        "additionalProperties": False,
+        "required": ["customer", "jobs"],
+        "properties": {
+            "customer": {
+                "type": "object",
+                "additionalProperties": False,
+                "required": list(_CUSTOMER_FIELDS),
+                "properties": {
+                    "name": _nullable({
+                        "type": "string", "description": "Название организации или ФИО ИП",
+                    }),
+                    "inn": _nullable({"type": "string", "pattern": r"^\d{10}(\d{2})?$"}),
+                    "kpp": _nullable({"type": "string", "pattern": r"^\d{4}[0-9A-Z]{2}\d{3}$"}),
+                    "ogrn": _nullable({"type": "string", "pattern": r"^\d{13}(\d{2})?$"}),
+                    "address": _nullable({"type": "string"}),
+                    "signatory": _nullable({
+                        "type": "string", "description": "Кто подписывает: Фамилия И.О.",
+                    }),
+                    "phone": _nullable({"type": "string"}),
+                },
+            },
+            "jobs": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "required": ["task", "price", "quantity"],
+                    "properties": {
+                        "task": {"type": "string"},
+                        "price": {"type": "integer", "minimum": 0},
+                        "quantity": {"type": "integer", "minimum": 1},
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+def _check_customer_field(name: str, value: str) -> None:
+    if name == "inn":
+        validate_inn(value)
+    elif name == "kpp":
+        validate_kpp(value)
+    elif name == "ogrn":
+        validate_ogrn(value)
+
+
+@dataclass
+class ExtractionState:
+    """Собранные поля документа и расход модели на него.
+
+    Хранится у вызывающего (в сессии, в теле запроса сервиса) и передаётся
+    в следующий extract: сервер ничего между ходами не держит.
+    """
+    customer: dict[str, str] = field(default_factory=dict)
+    jobs: list[dict] = field(default_factory=list)
+    turns: int = 0
+    usage: PromptCacheStats = field(default_factory=PromptCacheStats)
+
+    def merge(self, data: dict) -> None:
+        """Добавляет ответ модели: непустые значения заменяют прежние"""
+        for name, value in (data.get("customer") or {}).items():
+            if name in _CUSTOMER_FIELDS and isinstance(value, str) and value.strip():
+                self.customer[name] = value.strip()
+        jobs = data.get("jobs")
+        if isinstance(jobs, list) and jobs:
+            self.jobs = [job for job in jobs if isinstance(job, dict)]
+
+    def known(self) -> dict:
+        """Собранные поля в том виде, в каком их видит модель в следующем запросе"""
+        known = {}
+        if self.customer:
+            known["customer"] = self.customer
+        if self.jobs:
+            known["jobs"] = self.jobs
+        return known
+
+    @property
+    def missing(self) -> list[str]:
+        return [
+            name for name in REQUIRED_FIELDS
+            if not (self.jobs if name == "jobs" else self.customer.get(name))
+        ]
+
+    @property
+    def invalid(self) -> dict[str, str]:
+        """Поле -> ошибка проверки; отсутствующие поля сюда не попадают"""
+        errors = {}
+        for name, value in self.customer.items():
+            try:
+                _check_customer_field(name, value)
+            except ValidationError as e:
+                errors[name] = str(e)
+        if self.jobs:
+            try:
+                self.work_items()
+            except (TypeError, ValueError) as e:
+                errors["jobs"] = str(e)
+        if not errors and not self.missing:
+            try:
+                self.to_customer()
+            except (TypeError, ValueError) as e:
+                errors["customer"] = str(e)
+        return errors
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing and not self.invalid
+
+    def to_customer(self) -> Customer:
+        inn, kpp = self.customer.get("inn", ""), self.customer.get("kpp", "")
+        slug = f"inn_{inn}" + (f"_{kpp}" if kpp else "")
+        fields = {name: self.customer.get(name, "") for name in _CUSTOMER_FIELDS}
+        return Customer(slug=slug, **fields)
+
+    def work_items(self) -> list[WorkItem]:
+        return [WorkItem(**job) for job in self.jobs]
+
+    def follow_up(self) -> str | None:
+        """Один вопрос обо всех недостающих и неверных полях; None, если всё собрано"""
+        missing, invalid = self.missing, self.invalid
+        if not missing and not invalid:
+            return None
+        parts = []
+        if missing:
+            parts.append("Не хватает: " + ", ".join(FIELD_TITLES[name] for name in missing) + ".")
+        for name, error in invalid.items():
+            parts.append(f"Проверьте {FIELD_TITLES.get(name, name)}: {error}.")
+        return " ".join(parts)
+
+    def to_dict(self) -> dict:
+        return {
+            "customer": self.customer,
+            "jobs": self.jobs,
+            "turns": self.turns,
+            "usage": {f.name: getattr(self.usage, f.name) for f in fields(PromptCacheStats)},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "ExtractionState":
+        data = data or {}
+        usage = PromptCacheStats(**(data.get("usage") or {}))
+        state = cls(turns=int(data.get("turns", 0)), usage=usage)
+        state.merge(data)
+        return state
+
+
+class ExtractionAgent(LLMBackedAgent):
+    """Заполняет ExtractionState из свободного текста: один вызов модели на сообщение"""
+
+    MODEL = "claude-3-5-haiku-latest"
+
+    def _build_extraction_request(self, text: str, state: ExtractionState) -> dict:
+        # Инструмент и system неизменны и кэшируются, меняется только сообщение
+        return {
+            "model": self.MODEL,
+            "max_tokens": 1024,
+            "system": [cached_text(EXTRACTION_PROMPT)],
+            "tools": [EXTRACTION_TOOL],
+            "tool_choice": {"type": "tool", "name": EXTRACTION_TOOL_NAME},
+            "messages": [{"role": "user", "content": extraction_message(text, state.known())}],
+        }
+
+    def _apply_response(self, response, state: ExtractionState) -> ExtractionState:
+        self._record_usage(response)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            state.usage.record_anthropic_usage(usage)
+
+        for block in getattr(response, "content", None) or []:
+            if getattr(block, "type", None) == "tool_use" and block.name == EXTRACTION_TOOL_NAME:
+                state.merge(block.input if isinstance(block.input, dict) else {})
+                break
+        else:
+            increment("extraction_failures")
+
+        if state.complete:
+            # Среднее число ходов на документ — extraction_turns / extraction_completed
+            increment("extraction_completed")
+            increment("extraction_turns", state.turns)
+        return state
+
+    def extract(self, text: str, state: ExtractionState | None = None) -> ExtractionState:
+        """Дополняет state данными из очередного сообщения пользователя"""
+        state = state or ExtractionState()
+        state.turns += 1
+        request = self._build_extraction_request(text, state)
+        with span(LLM_CALL, model=request["model"]):
+            response = self.llm.create(**request)
+        return self._apply_response(response, state)
+
+    async def aextract(self, text: str, state: ExtractionState | None = None) -> ExtractionState:
+        """Асинхронный extract, не блокирующий event loop"""
+        state = state or ExtractionState()
+        state.turns += 1
+        request = self._build_extraction_request(text, state)
+        with span(LLM_CALL, model=request["model"]):
+            response = await self.llm.acreate(**request)
+        return self._apply_response(response, state)
@@ -0,0 +1,40 @@
+from typing import Callable
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
+
+
+def _last_turn(messages: list[BaseMessage]) -> list[BaseMessage]:
+    """Последнее сообщение пользователя и всё после него, с системным в начале"""
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            system = messages[:1] if isinstance(messages[0], SystemMessage) else []
+            return system + messages[index:]
+    return []
+
+
+def history_limiter(max_tokens: int = 4000) -> Callable[[dict], dict]:
+    """pre_model_hook для create_react_agent: отдаёт модели только хвост истории.
+
+    Полная история остаётся в чекпоинте, но в каждый запрос уходит не больше
+    max_tokens (оценка без токенизатора). Обрезка начинается с сообщения
+    пользователя, чтобы не оставить ответ инструмента без вызова. Если даже
+    последний ход пользователя не помещается в лимит, он уходит целиком:
+    иначе модель получила бы запрос без единого сообщения пользователя.
+    """
+
+    def hook(state: dict) -> dict:
+        messages = trim_messages(
+            state["messages"],
+            max_tokens=max_tokens,
+            token_counter=count_tokens_approximately,
+            strategy="last",
+            start_on="human",
+            include_system=True,
+            allow_partial=False,
+        )
+        if not any(isinstance(message, HumanMessage) for message in messages):
+            messages = _last_turn(state["messages"]) or messages
+        return {"llm_input_messages": messages}
+
+    return hook
@@ -1,17 +1,34 @@
-
-from anthropic import Anthropic
 from dotenv import load_dotenv
 
+from src.telemetry import LLM_CALL, record_anthropic_usage, span
+
+from .llm_client import LLMClient, shared_llm_client
+
 load_dotenv()
 
+MODEL = "claude-3-5-haiku-latest"
+
+
 class InvoiceAgent:
-    def __init__(self, client: Anthropic):
-        self.client = client
+    def __init__(self, llm: LLMClient | None = None):
+        self.llm = llm or shared_llm_client()
 
     def generate_document(self, prompt: str) -> str:
-        response = self.client.messages.create(
-            model="claude-3-5-haiku-latest",
-            max_tokens=300,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        with span(LLM_CALL, model=MODEL):
+            response = self.llm.create(
+                model=MODEL,
+                max_tokens=300,
+                messages=[{"role": "user", "content": prompt}]
+            )
+        record_anthropic_usage(MODEL, response.usage)
+        return response.content[0].text
+
+    async def agenerate_document(self, prompt: str) -> str:
+        with span(LLM_CALL, model=MODEL):
+            response = await self.llm.acreate(
+                model=MODEL,
+                max_tokens=300,
+                messages=[{"role": "user", "content": prompt}]
+            )
+        record_anthropic_usage(MODEL, response.usage)
         return response.content[0].text
@@ -0,0 +1,129 @@
+import uuid
+from typing import Any, AsyncIterator, Sequence
+
+from langchain_core.language_models import LanguageModelLike
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import create_react_agent
+
+from src.telemetry import AGENT_TURN, span
+
+from .callbacks import TelemetryCallbackHandler
+from .checkpointer import SqliteCheckpointer
+from .history import history_limiter
+from .prompts import PromptCacheMetrics, PromptCacheStats, collection_system_prompt
+
+
+class LLMAgent:
+    """Агент сбора данных. Диалоги разделяются по thread_id, поэтому один
+    экземпляр обслуживает сколько угодно параллельных разговоров."""
+
+    def __init__(
+        self,
+        model: LanguageModelLike,
+        tools: Sequence[BaseTool],
+        checkpointer: SqliteCheckpointer | None = None,
+        max_history_tokens: int = 4000,
+        system_prompt: SystemMessage | None = None,
+    ):
+        self._model = model
+        self._checkpointer = checkpointer or SqliteCheckpointer()
+        self._agent = create_react_agent(
+            model,
+            tools=tools,
+            prompt=system_prompt or collection_system_prompt(),
+            checkpointer=self._checkpointer,
+            pre_model_hook=history_limiter(max_history_tokens),
+        )
+        self._thread_id = self.new_thread()
+        self.cache_metrics = PromptCacheMetrics()
+        self._telemetry = TelemetryCallbackHandler()
+
+    @staticmethod
+    def new_thread() -> str:
+        """Идентификатор нового диалога"""
+        return uuid.uuid4().hex
+
+    def _config(self, thread_id: str | None) -> RunnableConfig:
+        return {
+            "configurable": {"thread_id": thread_id or self._thread_id},
+            "callbacks": [self._telemetry],
+        }
+
+    def cache_stats(self, thread_id: str | None = None) -> PromptCacheStats:
+        """Кэшированные и некэшированные входные токены диалога"""
+        return self.cache_metrics.for_thread(thread_id or self._thread_id)
+
+    def _record_turn(self, thread_id: str | None, messages: list) -> None:
+        """Учитывает токены ответов модели за последний ход"""
+        stats = self.cache_stats(thread_id)
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                break
+            if isinstance(message, AIMessage):
+                stats.record_usage_metadata(message.usage_metadata)
+
+    def invoke(self, content: str, temperature: float = 0.1, thread_id: str | None = None) -> str:
+        """Отправляет сообщение в чат"""
+        message = {"role": "user", "content": content}
+        with span(AGENT_TURN, thread_id=thread_id or self._thread_id):
+            messages = self._agent.invoke(
+                {"messages": [message], "temperature": temperature},
+                config=self._config(thread_id)
+            )["messages"]
+        self._record_turn(thread_id, messages)
+        return messages[-1].content
+
+    async def ainvoke(
+        self, content: str, temperature: float = 0.1, thread_id: str | None = None
+    ) -> str:
+        """Асинхронно отправляет сообщение в чат, не блокируя event loop"""
+        message = {"role": "user", "content": content}
+        with span(AGENT_TURN, thread_id=thread_id or self._thread_id):
+            result = await self._agent.ainvoke(
+                {"messages": [message], "temperature": temperature},
+                config=self._config(thread_id)
+            )
+        self._record_turn(thread_id, result["messages"])
+        return result["messages"][-1].content
+
+    async def astream(
+        self, content: str, temperature: float = 0.1, thread_id: str | None = None
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """Стримит ответ: ("token", текст) по мере генерации модели
+        и ("progress", событие) от инструментов генерации PDF"""
+        message = {"role": "user", "content": content}
+        with span(AGENT_TURN, thread_id=thread_id or self._thread_id):
+            async for mode, chunk in self._agent.astream(
+                {"messages": [message], "temperature": temperature},
+                config=self._config(thread_id),
+                stream_mode=["messages", "custom"],
+            ):
+                if mode == "custom":
+                    if "progress" in chunk:
+                        yield "progress", chunk["progress"]
+                    continue
+
+                message_chunk, metadata = chunk
+                if metadata.get("langgraph_node") != "agent":
+                    continue
+                if getattr(message_chunk, "usage_metadata", None):
+                    self.cache_stats(thread_id).record_usage_metadata(message_chunk.usage_metadata)
+                text = _chunk_text(message_chunk.content)
+                if text:
+                    yield "token", text
+
+    def finish(self, thread_id: str | None = None) -> None:
+        """Завершает диалог: его состояние будет удалено по TTL"""
+        self._checkpointer.mark_finished(thread_id or self._thread_id)
+
+
+def _chunk_text(content: str | list) -> str:
+    """Текст из чанка: у Anthropic content бывает списком блоков"""
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") for block in content
+        if isinstance(block, dict) and block.get("type") == "text"
+    )
@@ -0,0 +1,452 @@
+"""Общий слой вызовов Anthropic: пул соединений, дедлайны, повторы и лимиты.
+
+Все вызовы модели в процессе (классификатор типа документа, InvoiceAgent,
+ChatAnthropic агента) идут через один LLMClient:
+  - httpx-пул с keep-alive у sync-клиента и у async-клиента каждого event loop;
+  - дедлайн на весь вызов, включая повторы и ожидание лимитов; таймаут
+    одной попытки не больше оставшегося времени;
+  - повторы 429/529/5xx и сетевых ошибок с экспоненциальной задержкой и
+    джиттером (tenacity), retry-after сервера соблюдается;
+  - token bucket на запросы и токены в минуту и ограничение числа
+    одновременных запросов: всплеск пользователей ждёт в очереди, а не
+    получает 429. Стрим занимает слот, пока его читают, а токены
+    пересчитываются по usage из его событий.
+
+Встроенные повторы SDK отключены (max_retries=0), чтобы попытки не
+умножались. Параметры по умолчанию берутся из переменных окружения LLM_*.
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable
+
+import anthropic
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    Retrying,
+    retry_if_exception,
+    stop_after_attempt,
+)
+
+from src.exceptions import LLMDeadlineError
+from src.telemetry import increment
+
+if TYPE_CHECKING:
+    from .chat_model import ManagedChatAnthropic
+
+RETRYABLE_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+# Грубая оценка для лимита TPM до ответа: русский текст — около 3 символов на токен.
+# После ответа оценка заменяется фактическим usage
+CHARS_PER_TOKEN = 3
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Перегрузка, лимиты, 5xx и сетевые ошибки; 400/401/403/404 не повторяются"""
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRYABLE_STATUSES
+    return isinstance(error, anthropic.APIConnectionError)  # в том числе APITimeoutError
+
+
+def _retry_after(error: BaseException | None) -> float | None:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_reason(error: BaseException | None) -> str:
+    if isinstance(error, anthropic.APIStatusError):
+        return str(error.status_code)
+    return type(error).__name__
+
+
+def estimate_tokens(request: dict) -> int:
+    """Оценка токенов запроса: вход по длине JSON плюс max_tokens ответа"""
+    prompt = json.dumps(
+        [request.get("system"), request.get("messages"), request.get("tools")],
+        ensure_ascii=False,
+        default=str,
+    )
+    return len(prompt) // CHARS_PER_TOKEN + int(request.get("max_tokens", 0))
+
+
+class RateLimiter:
+    """Два token bucket'а — запросы и токены в минуту, списываются атомарно вместе.
+
+    burst — ёмкость ведра запросов: сколько запросов уходит разом после простоя
+    (по умолчанию минутный лимит целиком).
+    """
+
+    def __init__(
+        self, requests_per_minute: float, tokens_per_minute: float, burst: float | None = None
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.burst = max(1.0, burst if burst is not None else requests_per_minute)
+        self._requests = self.burst
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.burst, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(
+            self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60
+        )
+
+    def try_acquire(self, tokens: int) -> float:
+        """Списывает запрос и tokens токенов; если не хватает — сколько секунд ждать"""
+        # Запрос больше ёмкости ведра иначе не прошёл бы никогда
+        tokens = min(tokens, self.tokens_per_minute)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0.0
+            return max(
+                (1 - self._requests) * 60 / self.requests_per_minute,
+                (tokens - self._tokens) * 60 / self.tokens_per_minute,
+            )
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Возвращает переоценку (или досписывает недооценку) после ответа"""
+        with self._lock:
+            self._tokens = min(self.tokens_per_minute, self._tokens + estimated - actual)
+
+
+class StreamUsage:
+    """usage стрима: вход приходит в message_start, итог выхода — в message_delta"""
+
+    FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens")
+
+    def __init__(self):
+        self.seen = False
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_creation_input_tokens = 0
+
+    def observe(self, event: Any) -> None:
+        if event.type == "message_start":
+            usage = event.message.usage
+        elif event.type == "message_delta":
+            usage = event.usage
+        else:
+            return
+        self.seen = True
+        for name in self.FIELDS:
+            value = getattr(usage, name, None)
+            if value is not None:
+                setattr(self, name, value)
+
+
+class ManagedStream:
+    """Стрим ответа, который держит слот LLMClient, пока его не дочитают или не закроют.
+
+    По окончании слот освобождается, а списанная оценка токенов заменяется
+    фактическим usage стрима.
+    """
+
+    def __init__(self, stream: Any, finish: Callable[[StreamUsage], None]):
+        self._stream = stream
+        self._finish = finish
+        self._finished = False
+        self.usage = StreamUsage()
+
+    def _done(self) -> None:
+        if not self._finished:
+            self._finished = True
+            self._finish(self.usage)
+
+    def __iter__(self):
+        try:
+            for event in self._stream:
+                self.usage.observe(event)
+                yield event
+        finally:
+            self._done()
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._done()
+
+    def __enter__(self) -> "ManagedStream":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        # Брошенный непрочитанным стрим не должен занять слот навсегда
+        self._done()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+
+class AsyncManagedStream(ManagedStream):
+    """Асинхронный ManagedStream для AsyncStream SDK"""
+
+    async def __aiter__(self):
+        try:
+            async for event in self._stream:
+                self.usage.observe(event)
+                yield event
+        finally:
+            self._done()
+
+    async def close(self) -> None:
+        try:
+            await self._stream.close()
+        finally:
+            self._done()
+
+    async def __aenter__(self) -> "AsyncManagedStream":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+class LLMClient:
+    """Клиент Anthropic с общими пулом соединений, лимитами и политикой повторов"""
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        *,
+        request_timeout: float = 60.0,
+        connect_timeout: float = 5.0,
+        deadline: float = 120.0,
+        max_attempts: int = 5,
+        backoff_initial: float = 0.5,
+        backoff_max: float = 20.0,
+        max_connections: int = 20,
+        max_concurrency: int = 8,
+        requests_per_minute: float = 50,
+        tokens_per_minute: float = 50_000,
+        burst: float | None = None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.request_timeout = request_timeout
+        self.connect_timeout = connect_timeout
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute, burst)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # Соединения async-пула и asyncio.Semaphore привязаны к event loop, а main.py
+        # запускает asyncio.run на каждый ход: у каждого loop свои клиент и семафор
+        self._async_state: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._client: anthropic.Anthropic | None = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "LLMClient":
+        """Клиент с параметрами из ANTHROPIC_* и LLM_* переменных окружения"""
+        env = os.environ
+        return cls(
+            api_key=env.get("ANTHROPIC_API_KEY"),
+            base_url=env.get("ANTHROPIC_BASE_URL"),
+            request_timeout=float(env.get("LLM_REQUEST_TIMEOUT", 60)),
+            deadline=float(env.get("LLM_DEADLINE", 120)),
+            max_attempts=int(env.get("LLM_MAX_ATTEMPTS", 5)),
+            max_concurrency=int(env.get("LLM_MAX_CONCURRENCY", 8)),
+            requests_per_minute=float(env.get("LLM_REQUESTS_PER_MINUTE", 50)),
+            tokens_per_minute=float(env.get("LLM_TOKENS_PER_MINUTE", 50_000)),
+            burst=float(env["LLM_BURST"]) if env.get("LLM_BURST") else None,
+        )
+
+    def _httpx_options(self) -> dict:
+        import httpx
+
+        return {
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=30.0,
+            ),
+            "timeout": httpx.Timeout(self.request_timeout, connect=self.connect_timeout),
+        }
+
+    @property
+    def client(self) -> anthropic.Anthropic:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = anthropic.Anthropic(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        max_retries=0,
+                        http_client=anthropic.DefaultHttpxClient(**self._httpx_options()),
+                    )
+        return self._client
+
+    def _loop_state(self) -> tuple[anthropic.AsyncAnthropic, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        state = self._async_state.get(loop)
+        if state is None:
+            client = anthropic.AsyncAnthropic(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0,
+                http_client=anthropic.DefaultAsyncHttpxClient(**self._httpx_options()),
+            )
+            state = self._async_state[loop] = (client, asyncio.Semaphore(self.max_concurrency))
+        return state
+
+    @property
+    def async_client(self) -> anthropic.AsyncAnthropic:
+        """Async-клиент текущего event loop"""
+        return self._loop_state()[0]
+
+    def _wait(self, retry_state: RetryCallState) -> float:
+        """Full jitter: случайная задержка до initial * 2^попытки, но не меньше retry-after"""
+        attempt = retry_state.attempt_number
+        ceiling = min(self.backoff_max, self.backoff_initial * 2 ** (attempt - 1))
+        delay = random.uniform(0, ceiling)
+        retry_after = _retry_after(retry_state.outcome.exception() if retry_state.outcome else None)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    @staticmethod
+    def _before_sleep(retry_state: RetryCallState) -> None:
+        error = retry_state.outcome.exception() if retry_state.outcome else None
+        increment("retries", reason=_error_reason(error))
+
+    def _retrying_options(self, expires_at: float) -> dict:
+        def stop_at_deadline(retry_state: RetryCallState) -> bool:
+            # Следующая попытка начнётся после сна; если это уже за дедлайном — сдаёмся сейчас
+            return time.monotonic() + (retry_state.upcoming_sleep or 0) >= expires_at
+
+        return {
+            "retry": retry_if_exception(is_retryable),
+            "stop": stop_after_attempt(self.max_attempts) | stop_at_deadline,
+            "wait": self._wait,
+            "before_sleep": self._before_sleep,
+            "reraise": True,
+        }
+
+    @staticmethod
+    def _deadline_exceeded(what: str) -> LLMDeadlineError:
+        increment("llm_deadline_exceeded", stage=what)
+        return LLMDeadlineError(f"LLM call deadline exceeded while {what}")
+
+    def _remaining(self, expires_at: float, what: str) -> float:
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            raise self._deadline_exceeded(what)
+        return remaining
+
+    def _settle(self, estimated: int, usage: Any) -> None:
+        # Чтение из кэша в лимит входных токенов не засчитывается
+        actual = (usage.input_tokens or 0) + (usage.output_tokens or 0) + (
+            getattr(usage, "cache_creation_input_tokens", None) or 0
+        )
+        self.limiter.settle(estimated, actual)
+
+    def _reject(self, estimated: int, release: Callable[[], None]) -> None:
+        """Попытка не получила ответа (429, 529, сетевая ошибка): токены не потрачены"""
+        release()
+        self.limiter.settle(estimated, 0)
+
+    def _accept(self, estimated: int, response: Any, release: Callable[[], None]) -> Any:
+        """Обычный ответ освобождает слот сразу, стрим — когда его дочитают или закроют"""
+        def finish(usage: StreamUsage) -> None:
+            release()
+            if usage.seen:  # стрим закрыли до message_start — остаётся оценка
+                self._settle(estimated, usage)
+
+        if isinstance(response, anthropic.AsyncStream):
+            return AsyncManagedStream(response, finish)
+        if isinstance(response, anthropic.Stream):
+            return ManagedStream(response, finish)
+        release()
+        self._settle(estimated, response.usage)
+        return response
+
+    def create(self, *, deadline: float | None = None, **request) -> Any:
+        """messages.create с лимитами, повторами и дедлайном на весь вызов"""
+        expires_at = time.monotonic() + (deadline or self.deadline)
+        estimated = estimate_tokens(request)
+        for attempt in Retrying(**self._retrying_options(expires_at)):
+            with attempt:
+                while (wait := self.limiter.try_acquire(estimated)) > 0:
+                    # Лимит освободится позже дедлайна — ждать бессмысленно
+                    if wait >= self._remaining(expires_at, "waiting for rate limit"):
+                        raise self._deadline_exceeded("waiting for rate limit")
+                    increment("rate_limit_waits")
+                    time.sleep(wait)
+                slot_timeout = self._remaining(expires_at, "waiting for a free slot")
+                if not self._slots.acquire(timeout=slot_timeout):
+                    raise self._deadline_exceeded("waiting for a free slot")
+                try:
+                    remaining = self._remaining(expires_at, "sending request")
+                    timeout = min(self.request_timeout, remaining)
+                    response = self.client.messages.create(**request, timeout=timeout)
+                except BaseException:
+                    self._reject(estimated, self._slots.release)
+                    raise
+        return self._accept(estimated, response, self._slots.release)
+
+    async def acreate(self, *, deadline: float | None = None, **request) -> Any:
+        """Асинхронный create: ожидание лимитов и повторов не блокирует event loop"""
+        expires_at = time.monotonic() + (deadline or self.deadline)
+        estimated = estimate_tokens(request)
+        client, slots = self._loop_state()
+        async for attempt in AsyncRetrying(**self._retrying_options(expires_at)):
+            with attempt:
+                while (wait := self.limiter.try_acquire(estimated)) > 0:
+                    # Лимит освободится позже дедлайна — ждать бессмысленно
+                    if wait >= self._remaining(expires_at, "waiting for rate limit"):
+                        raise self._deadline_exceeded("waiting for rate limit")
+                    increment("rate_limit_waits")
+                    await asyncio.sleep(wait)
+                try:
+                    await asyncio.wait_for(
+                        slots.acquire(), self._remaining(expires_at, "waiting for a free slot")
+                    )
+                except asyncio.TimeoutError:
+                    raise self._deadline_exceeded("waiting for a free slot") from None
+                try:
+                    remaining = self._remaining(expires_at, "sending request")
+                    timeout = min(self.request_timeout, remaining)
+                    response = await client.messages.create(**request, timeout=timeout)
+                except BaseException:
+                    self._reject(estimated, slots.release)
+                    raise
+        return self._accept(estimated, response, slots.release)
+
+    def chat_model(self, **kwargs) -> "ManagedChatAnthropic":
+        """ChatAnthropic для LangGraph, чьи запросы идут через этот клиент"""
+        from .chat_model import ManagedChatAnthropic
+
+        if self.api_key:
+            kwargs.setdefault("anthropic_api_key", self.api_key)
+        return ManagedChatAnthropic(llm_client=self, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def shared_llm_client() -> LLMClient:
+    """Один клиент на процесс: лимиты и пул соединений общие для всех агентов"""
+    return LLMClient.from_env()
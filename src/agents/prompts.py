@@ -0,0 +1,145 @@
+import json
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from src.models import Organization
+
+if TYPE_CHECKING:
+    from langchain_core.messages import SystemMessage
+
+
+DOCUMENT_TYPES = ["Счёт", "Акт", "Карточка организации"]
+
+# Префиксы ниже не должны зависеть от ввода пользователя: Anthropic кэширует
+# tools + system целиком, и любое изменение в них сбрасывает кэш. Всё
+# переменное (тип документа, ответы пользователя) идёт в сообщениях после.
+
+DETECT_DOCUMENT_TYPE_PROMPT = f"""
+Определи тип документа, который хочет сформировать юзер.
+Пришли ответ в виде json и никак больше.
+Формат ответа: {{"type": "вид документа"}}
+Вместо "вид документа" используй один из: {DOCUMENT_TYPES}
+Если не удалось определить — верни "None".
+Следующее сообщение — промт юзера.
+""".strip()
+
+COLLECTION_INSTRUCTIONS = f"""
+Ты помощник, который готовит документы от имени организации-исполнителя.
+Доступные виды документов: {", ".join(DOCUMENT_TYPES)}.
+В первом сообщении пользователь сообщает, какой документ нужно сгенерировать.
+
+Для счёта и акта сначала спроси ИНН или название заказчика и найди его
+инструментом find_customer. Если заказчик найден, покажи его реквизиты,
+попроси подтвердить и переходи сразу к данным о работах.
+Если не найден, собери данные заказчика поэтапно:
+1. Название организации
+2. ИНН
+3. ОГРН
+4. Адрес
+5. Подписант
+6. Данные о работах (название, количество, цена)
+
+Для карточки организации данные заказчика не нужны.
+После получения всех данных используй соответствующий инструмент.
+Начни с первого вопроса.
+""".strip()
+
+
+EXTRACTION_PROMPT = """
+Ты извлекаешь данные для акта или счёта из сообщения пользователя.
+Вызови инструмент record_document_data ровно один раз.
+Если в запросе есть уже известные данные, верни их вместе с новыми целиком,
+исправив то, что пользователь уточнил.
+Заполняй только то, что явно есть в тексте или в известных данных; чего нет — null.
+Ничего не выдумывай и не подставляй примеры.
+ИНН, КПП и ОГРН — только цифры. Цена — целое число рублей за единицу,
+количество — целое, если не указано — 1.
+""".strip()
+
+
+def cached_text(text: str) -> dict:
+    """Текстовый блок с маркером кэширования: префикс до него включительно кэшируется"""
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def collection_system_prompt(organization: Organization | None = None) -> "SystemMessage":
+    """Неизменный системный промпт диалога сбора данных для одной организации"""
+    from langchain_core.messages import SystemMessage
+
+    blocks = [{"type": "text", "text": COLLECTION_INSTRUCTIONS}]
+    if organization is not None:
+        requisites = json.dumps(asdict(organization), ensure_ascii=False, sort_keys=True)
+        blocks.append({"type": "text", "text": f"Реквизиты организации-исполнителя:\n{requisites}"})
+    blocks[-1] = cached_text(blocks[-1]["text"])
+    return SystemMessage(content=blocks)
+
+
+def extraction_message(text: str, known: dict | None = None) -> str:
+    """Переменная часть запроса извлечения: уже собранные данные и новое сообщение"""
+    if not known:
+        return text
+    return (
+        f"Уже известно:\n{json.dumps(known, ensure_ascii=False, sort_keys=True)}\n\n"
+        f"Сообщение пользователя:\n{text}"
+    )
+
+
+def document_request_message(document_type: str) -> str:
+    """Переменная часть первого хода: выбранный тип документа"""
+    return f"Пользователь хочет сгенерировать: {document_type}"
+
+
+@dataclass
+class PromptCacheStats:
+    """Входные токены диалога: прочитанные из кэша, записанные в кэш и без кэша"""
+    calls: int = 0
+    uncached_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def input_tokens(self) -> int:
+        return (
+            self.uncached_input_tokens
+            + self.cache_read_input_tokens
+            + self.cache_creation_input_tokens
+        )
+
+    @property
+    def cache_hit_ratio(self) -> float:
+        return self.cache_read_input_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    def record_anthropic_usage(self, usage) -> None:
+        """Учитывает response.usage из Anthropic SDK"""
+        self.calls += 1
+        self.uncached_input_tokens += usage.input_tokens or 0
+        self.cache_read_input_tokens += getattr(usage, "cache_read_input_tokens", None) or 0
+        self.cache_creation_input_tokens += getattr(usage, "cache_creation_input_tokens", None) or 0
+        self.output_tokens += usage.output_tokens or 0
+
+    def record_usage_metadata(self, usage_metadata: dict | None) -> None:
+        """Учитывает AIMessage.usage_metadata из ChatAnthropic.
+
+        Там input_tokens уже включает кэшированные токены, их вычитаем.
+        """
+        if not usage_metadata:
+            return
+        details = usage_metadata.get("input_token_details") or {}
+        cache_read = details.get("cache_read") or 0
+        cache_creation = details.get("cache_creation") or 0
+        self.calls += 1
+        self.cache_read_input_tokens += cache_read
+        self.cache_creation_input_tokens += cache_creation
+        uncached = usage_metadata.get("input_tokens", 0) - cache_read - cache_creation
+        self.uncached_input_tokens += max(uncached, 0)
+        self.output_tokens += usage_metadata.get("output_tokens", 0)
+
+
+@dataclass
+class PromptCacheMetrics:
+    """Статистика кэширования промптов по диалогам (thread_id)"""
+    threads: dict[str, PromptCacheStats] = field(default_factory=dict)
+
+    def for_thread(self, thread_id: str) -> PromptCacheStats:
+        return self.threads.setdefault(thread_id, PromptCacheStats())
@@ -0,0 +1,48 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Callable
+
+from langchain_core.tools import StructuredTool
+from langgraph.config import get_stream_writer
+
+from src.debug_tools.progress import ProgressEvent, progress_listener
+from src.telemetry import TOOL_CALL, span
+
+# Генерация PDF блокирующая (typst), поэтому асинхронные вызовы инструментов
+# уходят в отдельный ограниченный пул и не держат event loop
+_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="agent-tool")
+
+
+def to_async_tool(func: Callable[..., str]) -> StructuredTool:
+    """Оборачивает синхронную функцию генератора в инструмент с неблокирующим ainvoke.
+
+    События прогресса генерации уходят в поток custom графа LangGraph,
+    их видно в LLMAgent.astream.
+    """
+
+    @functools.wraps(func)
+    def run_with_progress(**kwargs) -> str:
+        with span(TOOL_CALL, tool=func.__name__):
+            try:
+                writer = get_stream_writer()
+            except RuntimeError:  # вызов вне графа, стримить некуда
+                return func(**kwargs)
+
+            def forward(event: ProgressEvent) -> None:
+                writer({"progress": asdict(event)})
+
+            with progress_listener(forward):
+                return func(**kwargs)
+
+    async def coroutine(**kwargs) -> str:
+        loop = asyncio.get_running_loop()
+        # Контекст копируется, чтобы в потоке был доступен writer текущего запуска графа
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, run_with_progress, **kwargs)
+        return await loop.run_in_executor(_executor, call)
+
+    return StructuredTool.from_function(func=run_with_progress, coroutine=coroutine)
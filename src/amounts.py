@@ -0,0 +1,174 @@
+"""Суммы документов: строки, итог, НДС и сумма прописью в точной десятичной арифметике.
+
+Пропись — порт ru-numbers.typ один в один (проверяется бенчмарком
+benchmarks/amounts_bench.py против typst). Шаблоны получают готовые значения
+в data.totals и больше не считают их при каждой компиляции.
+"""
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+from typing import Iterable
+
+from src.models import WorkItem
+
+KOPECK = Decimal("0.01")
+
+_UNITS = (
+    "ноль", "один", "два", "три", "четыре",
+    "пять", "шесть", "семь", "восемь", "девять",
+    "десять", "одиннадцать", "двенадцать", "тринадцать", "четырнадцать",
+    "пятнадцать", "шестнадцать", "семнадцать", "восемнадцать", "девятнадцать",
+)
+
+_TENS = (
+    "", "", "двадцать", "тридцать", "сорок",
+    "пятьдесят", "шестьдесят", "семьдесят", "восемьдесят", "девяносто",
+)
+
+_HUNDREDS = (
+    "", "сто", "двести", "триста", "четыреста",
+    "пятьсот", "шестьсот", "семьсот", "восемьсот", "девятьсот",
+)
+
+# (1-форма, 2–4-форма, 5+-форма, женский род)
+_SCALES = (
+    ("", "", "", False),
+    ("тысяча", "тысячи", "тысяч", True),
+    ("миллион", "миллиона", "миллионов", False),
+    ("миллиард", "миллиарда", "миллиардов", False),
+)
+
+_FEMININE = {1: "одна", 2: "две"}
+
+RUBLE_FORMS = ("рубль", "рубля", "рублей")
+KOPECK_FORMS = ("копейка", "копейки", "копеек")
+
+
+def plural(n: int, one: str, few: str, many: str) -> str:
+    """Форма слова для числа: 1 рубль, 2 рубля, 5 рублей"""
+    m = n % 100
+    last = n % 10
+    if 11 <= m <= 14:
+        return many
+    if last == 1:
+        return one
+    if 2 <= last <= 4:
+        return few
+    return many
+
+
+def _unit(n: int, fem: bool) -> str:
+    return _FEMININE[n] if fem and n in _FEMININE else _UNITS[n]
+
+
+@lru_cache(maxsize=None)
+def _chunk(n: int, fem: bool) -> str:
+    """Пропись триады 0–999; всего 2000 вариантов, кэшируются все"""
+    words = []
+    if n // 100:
+        words.append(_HUNDREDS[n // 100])
+    rest = n % 100
+    if rest < 20:
+        if rest:
+            words.append(_unit(rest, fem))
+    else:
+        words.append(_TENS[rest // 10])
+        if rest % 10:
+            words.append(_unit(rest % 10, fem))
+    return " ".join(words)
+
+
+@lru_cache(maxsize=None)
+def _scaled_chunk(chunk: int, scale: int) -> str:
+    """Триада вместе с названием разряда: «двадцать одна тысяча»"""
+    one, few, many, fem = _SCALES[scale]
+    words = _chunk(chunk, fem)
+    return words if scale == 0 else f"{words} {plural(chunk, one, few, many)}"
+
+
+@lru_cache(maxsize=65536)
+def ru_words(n: int) -> str:
+    """Целое неотрицательное число прописью (до миллиардов), как ru-words в ru-numbers.typ"""
+    if n < 0:
+        raise ValueError(f"Negative number {n}")
+    if n == 0:
+        return _UNITS[0]
+    if n >= 1000 ** len(_SCALES):
+        raise ValueError(f"Number {n} is too large")
+
+    parts = []
+    scale = 0
+    while n:
+        n, chunk = divmod(n, 1000)
+        if chunk:
+            parts.append(_scaled_chunk(chunk, scale))
+        scale += 1
+    parts.reverse()
+    return " ".join(parts)
+
+
+@lru_cache(maxsize=65536)
+def _rubles_in_words(rubles: int) -> str:
+    words = ru_words(rubles)
+    return f"{words[0].upper()}{words[1:]} {plural(rubles, *RUBLE_FORMS)}"
+
+
+_KOPECKS_IN_WORDS = tuple(
+    f"{kopecks:02d} {plural(kopecks, *KOPECK_FORMS)}" for kopecks in range(100)
+)
+
+
+def _decimal(value: int | float | str | Decimal) -> Decimal:
+    # str(): float не должен тащить в Decimal двоичную погрешность
+    return Decimal(str(value)) if isinstance(value, float) else Decimal(value)
+
+
+def to_money(value: int | float | str | Decimal) -> Decimal:
+    """Сумма в рублях с точностью до копейки"""
+    return _decimal(value).quantize(KOPECK, rounding=ROUND_HALF_UP)
+
+
+def amount_in_words(amount: Decimal) -> str:
+    """Сумма прописью: «Шесть тысяч рублей 50 копеек»"""
+    rubles, kopecks = divmod(int(to_money(amount) * 100), 100)
+    return f"{_rubles_in_words(rubles)} {_KOPECKS_IN_WORDS[kopecks]}"
+
+
+def format_amount(amount: Decimal) -> str:
+    """Сумма для печати: 1 234 567,50 (неразрывные пробелы между разрядами)"""
+    return f"{to_money(amount):,.2f}".replace(",", "\u00a0").replace(".", ",")
+
+
+@dataclass(frozen=True)
+class Totals:
+    """Итоги документа; НДС, если есть, включён в цены"""
+    line_totals: tuple[Decimal, ...]
+    total: Decimal
+    vat_rate: int | None = None
+    vat: Decimal = Decimal("0.00")
+
+    def to_template(self) -> dict:
+        """Значения для шаблона: точные суммы строками, печатный вид и пропись"""
+        return {
+            "lines": [
+                {"amount": str(amount), "amount_text": format_amount(amount)}
+                for amount in self.line_totals
+            ],
+            "count": len(self.line_totals),
+            "total": str(self.total),
+            "total_text": format_amount(self.total),
+            "total_in_words": amount_in_words(self.total),
+            "vat_rate": self.vat_rate,
+            "vat": str(self.vat),
+            "vat_text": format_amount(self.vat) if self.vat_rate is not None else "Без НДС",
+        }
+
+
+def compute_totals(jobs: Iterable[WorkItem], vat_rate: int | None = None) -> Totals:
+    """Суммы строк, итог и НДС в том числе (vat_rate в процентах, None — без НДС)"""
+    line_totals = tuple(to_money(_decimal(job.price) * job.quantity) for job in jobs)
+    total = sum(line_totals, Decimal("0.00"))
+    vat = Decimal("0.00")
+    if vat_rate is not None:
+        vat = to_money(total * vat_rate / (100 + vat_rate))
+    return Totals(line_totals, total, vat_rate, vat)
@@ -0,0 +1,114 @@
+"""Проверка прописи src.amounts против ru-numbers.typ и замер скорости.
+
+1. Сверка: граничные значения (0–2000, окрестности степеней тысячи, 11–14 в
+   каждом разряде) и случайные числа прописываются одной компиляцией typst
+   и сравниваются с ru_words. Любое расхождение — код выхода 1.
+2. Скорость: amount_in_words на миллионах случайных сумм с холодным и тёплым
+   кэшем против времени typst на одно число.
+
+Запуск из каталога src:
+    PYTHONPATH=.. python -m src.benchmarks.amounts_bench --count 1000000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from decimal import Decimal
+
+from src.amounts import _chunk, _rubles_in_words, _scaled_chunk, amount_in_words, ru_words
+from src.debug_tools.typst_backend import TYPST_ROOT, typst
+
+MAX_NUMBER = 999_999_999_999
+
+
+def edge_cases() -> list[int]:
+    numbers = set(range(0, 2001))
+    for power in range(1, 4):
+        base = 1000 ** power
+        for multiplier in (1, 2, 5, 11, 21, 101, 999):
+            for delta in (-1, 0, 1):
+                numbers.add(base * multiplier + delta)
+        for teen in range(10, 20):
+            numbers.add(teen * base)
+            numbers.add(teen * base + teen)
+    numbers.add(MAX_NUMBER)
+    return sorted(number for number in numbers if 0 <= number <= MAX_NUMBER)
+
+
+def typst_words(numbers: list[int], ru_numbers: str) -> tuple[list[str], float]:
+    """Пропись чисел функцией ru-words из typst за одну компиляцию"""
+    source = (
+        f'#import "{ru_numbers}": ru-words\n'
+        '#let numbers = json(bytes(sys.inputs.at("numbers")))\n'
+        "#metadata(numbers.map(ru-words)) <words>\n"
+    ).encode()
+    started = time.perf_counter()
+    compiler = typst.Compiler(source, root=TYPST_ROOT, sys_inputs={"numbers": json.dumps(numbers)})
+    words = json.loads(compiler.query("<words>", field="value", one=True))
+    return words, time.perf_counter() - started
+
+
+def validate(numbers: list[int], ru_numbers: str) -> tuple[int, float]:
+    expected, elapsed = typst_words(numbers, ru_numbers)
+    mismatches = [
+        (number, typst_value, ru_words(number))
+        for number, typst_value in zip(numbers, expected)
+        if ru_words(number) != typst_value
+    ]
+    for number, typst_value, python_value in mismatches[:10]:
+        print(f"  ❌ {number}: typst «{typst_value}», python «{python_value}»")
+    return len(mismatches), elapsed
+
+
+def bench(amounts: list[Decimal]) -> tuple[float, float]:
+    for cached in (_chunk, _scaled_chunk, ru_words, _rubles_in_words):
+        cached.cache_clear()
+    started = time.perf_counter()
+    for amount in amounts:
+        amount_in_words(amount)
+    cold = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for amount in amounts:
+        amount_in_words(amount)
+    warm = time.perf_counter() - started
+    return cold, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--ru-numbers", default="/common/ru-numbers.typ",
+                        help="путь к ru-numbers.typ от корня typst")
+    parser.add_argument("--random", type=int, default=20000, help="случайных чисел для сверки")
+    parser.add_argument("--count", type=int, default=1_000_000, help="сумм для замера скорости")
+    parser.add_argument("--max-rubles", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if typst is None:
+        print("Сверка пропущена: не установлены python-биндинги typst")
+        typst_per_number = None
+    else:
+        numbers = edge_cases() + [rng.randint(0, MAX_NUMBER) for _ in range(args.random)]
+        mismatches, elapsed = validate(numbers, args.ru_numbers)
+        typst_per_number = elapsed / len(numbers)
+        print(f"Сверка с typst: {len(numbers)} чисел, расхождений: {mismatches} "
+              f"(typst: {elapsed:.2f} с, {typst_per_number * 1e6:.1f} мкс на число)")
+        if mismatches:
+            sys.exit(1)
+
+    amounts = [Decimal(rng.randint(0, args.max_rubles * 100)) / 100 for _ in range(args.count)]
+    cold, warm = bench(amounts)
+    print(f"amount_in_words, {args.count} сумм до {args.max_rubles} ₽:")
+    print(f"  холодный кэш: {cold:.2f} с ({cold / args.count * 1e6:.2f} мкс на сумму)")
+    print(f"  тёплый кэш:   {warm:.2f} с ({warm / args.count * 1e6:.2f} мкс на сумму)")
+    if typst_per_number:
+        print(f"  быстрее typst в {typst_per_number / (cold / args.count):.0f} раз (холодный кэш)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""Ходы и токены на готовый документ: диалог сбора данных и извлечение одним вызовом.
+
+Оба способа идут через LLMClient к заглушке benchmarks.mock_anthropic, которая
+отвечает по сценарию:
+  - dialog — LLMAgent с промптом COLLECTION_INSTRUCTIONS: поиск заказчика в
+    справочнике и вопрос на каждое поле, история пересылается каждый ход;
+  - extraction — ExtractionAgent: свободный текст, один вызов инструмента
+    record_document_data на сообщение, уточнение только недостающего.
+
+Токены заглушка считает по длине запроса и ответа (~3 символа на токен),
+одинаково для обоих способов; кэширование промптов не учитывается.
+
+Запуск из каталога src:
+    PYTHONPATH=.. python -m src.benchmarks.extraction_bench
+"""
+import argparse
+import asyncio
+import functools
+import json
+import tempfile
+import time
+
+from src.agents.extraction import EXTRACTION_TOOL_NAME, ExtractionAgent, ExtractionState
+from src.agents.llm_client import LLMClient
+from src.agents.prompts import PromptCacheStats, document_request_message
+from src.benchmarks.mock_anthropic import MockAnthropicServer, tool_use
+from src.debug_tools.debug_docs_generator import DebugGenerator
+
+CUSTOMER = {
+    "name": 'ООО "Ромашка"',
+    "inn": "7707083893",
+    "kpp": "773601001",
+    "ogrn": "1027700132195",
+    "address": "117997, г. Москва, ул. Вавилова, д. 19",
+    "signatory": "Петров П.П.",
+    "phone": None,
+}
+JOBS = [{"task": "Техническое обслуживание ККТ", "price": 600, "quantity": 10}]
+
+# Ответы пользователя в диалоге и вопрос модели после каждого из них
+DIALOG = [
+    (document_request_message("Акт"), "Укажите ИНН или название заказчика."),
+    (CUSTOMER["name"], None),  # модель ищет заказчика в справочнике
+    (CUSTOMER["inn"], "Укажите ОГРН."),
+    (CUSTOMER["ogrn"], "Укажите адрес."),
+    (CUSTOMER["address"], "Кто подписывает акт со стороны заказчика?"),
+    (CUSTOMER["signatory"], "Перечислите работы: название, количество, цена."),
+    ("Техническое обслуживание ККТ, 10 шт. по 600 руб.", None),  # модель вызывает генерацию
+]
+
+# Сценарии извлечения: сообщения пользователя и поля, которые "модель" в них видит
+EXTRACTION_SCENARIOS = {
+    "всё в одном сообщении": [(
+        f"Нужен акт для {CUSTOMER['name']}, ИНН {CUSTOMER['inn']}, КПП {CUSTOMER['kpp']}, "
+        f"ОГРН {CUSTOMER['ogrn']}, адрес {CUSTOMER['address']}, "
+        f"подписывает {CUSTOMER['signatory']}. "
+        "Техническое обслуживание ККТ, 10 шт. по 600 руб.",
+        {
+            "customer": {
+                k: CUSTOMER[k] for k in ("name", "inn", "kpp", "ogrn", "address", "signatory")
+            },
+            "jobs": JOBS,
+        },
+    )],
+    "без адреса и подписанта": [
+        (
+            f"Акт для {CUSTOMER['name']}, ИНН {CUSTOMER['inn']}, ОГРН {CUSTOMER['ogrn']}: "
+            "техобслуживание ККТ, 10 шт. по 600 руб.",
+            {"customer": {k: CUSTOMER[k] for k in ("name", "inn", "ogrn")}, "jobs": JOBS},
+        ),
+        (
+            f"Адрес {CUSTOMER['address']}, подписывает {CUSTOMER['signatory']}",
+            {"customer": {k: CUSTOMER[k] for k in ("address", "signatory")}},
+        ),
+    ],
+    "опечатка в ИНН": [
+        (
+            f"Акт для {CUSTOMER['name']}, ИНН 7707083894, ОГРН {CUSTOMER['ogrn']}, "
+            f"адрес {CUSTOMER['address']}, подписывает {CUSTOMER['signatory']}. "
+            "Техобслуживание ККТ, 10 шт. по 600 руб.",
+            {
+                "customer": {
+                    **{k: CUSTOMER[k] for k in ("name", "ogrn", "address", "signatory")},
+                    "inn": "7707083894",
+                },
+                "jobs": JOBS,
+            },
+        ),
+        (f"Правильный ИНН {CUSTOMER['inn']}", {"customer": {"inn": CUSTOMER["inn"]}}),
+    ],
+}
+
+
+def _user_texts(messages: list[dict]) -> list[str]:
+    """Реплики пользователя без результатов инструментов"""
+    texts = []
+    for message in messages:
+        if message["role"] != "user":
+            continue
+        content = message["content"]
+        if isinstance(content, str):
+            texts.append(content)
+        elif any(block.get("type") == "text" for block in content):
+            texts.append("".join(
+                block.get("text", "") for block in content if block.get("type") == "text"
+            ))
+    return texts
+
+
+def dialog_responder(body: dict) -> list[dict]:
+    """Модель диалога сбора данных: вопрос на каждое поле, затем генерация PDF"""
+    messages = body["messages"]
+    last = messages[-1]["content"]
+    if isinstance(last, list) and any(block.get("type") == "tool_result" for block in last):
+        result = next(block for block in last if block.get("type") == "tool_result")
+        content = result.get("content")
+        if isinstance(content, str):
+            text = content
+        else:
+            text = "".join(block.get("text", "") for block in content)
+        if "PDF" in text:
+            return [{"type": "text", "text": text}]
+        return [{"type": "text", "text": "Заказчик не найден в справочнике. Укажите ИНН."}]
+
+    turn = len(_user_texts(messages)) - 1
+    answer, question = DIALOG[min(turn, len(DIALOG) - 1)]
+    if turn == 1:
+        return [tool_use("find_customer", {"query": answer})]
+    if question is None:
+        customer = {**{k: v for k, v in CUSTOMER.items() if v}, "slug": "romashka"}
+        return [tool_use("generate_pdf_act", {
+            "customer": customer, "jobs": JOBS, "org_slug": "ip_angarhaeva", "org_type": "ip",
+        })]
+    return [{"type": "text", "text": question}]
+
+
+def extraction_responder(body: dict) -> list[dict]:
+    """Модель извлечения: уже известные поля плюс поля, найденные в новом сообщении"""
+    text = body["messages"][-1]["content"]
+    known = {}
+    if text.startswith("Уже известно:\n"):
+        known_json, text = text.removeprefix("Уже известно:\n").split(
+            "\n\nСообщение пользователя:\n", 1
+        )
+        known = json.loads(known_json)
+    customer = {name: None for name in CUSTOMER} | known.get("customer", {})
+    jobs = known.get("jobs", [])
+    for scenario in EXTRACTION_SCENARIOS.values():
+        for message, data in scenario:
+            if message == text:
+                customer |= data.get("customer", {})
+                jobs = data.get("jobs", jobs)
+    return [tool_use(EXTRACTION_TOOL_NAME, {"customer": customer, "jobs": jobs})]
+
+
+def _stub_tool(func, reply: str):
+    """Инструмент с той же схемой, что у настоящего, но без рендеринга PDF"""
+    @functools.wraps(func)
+    def stub(**kwargs) -> str:
+        return reply
+    return stub
+
+
+async def run_dialog(client: LLMClient, state_dir: str) -> dict:
+    from src.agents.checkpointer import SqliteCheckpointer
+    from src.agents.llm_agent import LLMAgent
+    from src.agents.prompts import collection_system_prompt
+    from src.agents.tools import to_async_tool
+    from src.debug_tools.customer_directory import CustomerDirectory
+
+    directory = CustomerDirectory(f"{state_dir}/customers.sqlite3")
+    agent = LLMAgent(
+        client.chat_model(model="claude-3-haiku-20240307", temperature=0.1, max_tokens=2048),
+        tools=[
+            to_async_tool(directory.find_customer),
+            to_async_tool(_stub_tool(
+                DebugGenerator.generate_pdf_act, "✅ PDF акт успешно создан: bench.pdf"
+            )),
+            to_async_tool(_stub_tool(
+                DebugGenerator.generate_pdf_invoice, "✅ PDF счёт успешно создан: bench.pdf"
+            )),
+            to_async_tool(_stub_tool(
+                DebugGenerator.generate_pdf_org_card, "✅ PDF карточка создана: bench.pdf"
+            )),
+        ],
+        checkpointer=SqliteCheckpointer(f"{state_dir}/checkpoints.sqlite3"),
+        system_prompt=collection_system_prompt(),
+    )
+
+    started = time.perf_counter()
+    reply = ""
+    for answer, _ in DIALOG:
+        reply = await agent.ainvoke(answer)
+    if "✅ PDF" not in reply:
+        raise RuntimeError(f"Dialog did not finish: {reply}")
+    elapsed = time.perf_counter() - started
+    return _row("dialog", "поле за ходом", len(DIALOG), agent.cache_stats(), elapsed)
+
+
+async def run_extraction(client: LLMClient, name: str, messages: list[tuple[str, dict]]) -> dict:
+    extractor = ExtractionAgent(client)
+    state = ExtractionState()
+    started = time.perf_counter()
+    for text, _ in messages:
+        state = await extractor.aextract(text, state)
+        if state.complete:
+            break
+    if not state.complete:
+        raise RuntimeError(f"Extraction did not finish: {state.follow_up()}")
+    return _row("extraction", name, state.turns, state.usage, time.perf_counter() - started)
+
+
+def _row(flow: str, scenario: str, turns: int, usage: PromptCacheStats, elapsed: float) -> dict:
+    return {
+        "flow": flow,
+        "scenario": scenario,
+        "turns": turns,
+        "calls": usage.calls,
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "elapsed_s": elapsed,
+    }
+
+
+def print_row(row: dict, baseline: dict | None = None) -> None:
+    saving = ""
+    if baseline is not None:
+        ratio = baseline["input_tokens"] / max(row["input_tokens"], 1)
+        saving = f"  токенов меньше в {ratio:.1f} раза"
+    print(
+        f"  {row['flow']:<10} {row['scenario']:<24} ходов: {row['turns']:<2} "
+        f"вызовов модели: {row['calls']:<2} "
+        f"токены вх/вых: {row['input_tokens']:>6}/{row['output_tokens']:<5} "
+        f"{row['elapsed_s']:6.2f} с{saving}"
+    )
+
+
+async def bench(args) -> None:
+    def mock_client(responder) -> tuple[MockAnthropicServer, LLMClient]:
+        server = MockAnthropicServer(
+            latency=args.latency_ms / 1000, jitter=0.0, responder=responder
+        ).start()
+        return server, LLMClient(api_key="test", base_url=server.base_url)
+
+    print("На один готовый акт:")
+    server, client = mock_client(dialog_responder)
+    with tempfile.TemporaryDirectory() as state_dir:
+        baseline = await run_dialog(client, state_dir)
+    server.shutdown()
+    print_row(baseline)
+
+    server, client = mock_client(extraction_responder)
+    for name, messages in EXTRACTION_SCENARIOS.items():
+        print_row(await run_extraction(client, name, messages), baseline)
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="задержка ответа заглушки")
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Локальные заменители внешних зависимостей для бенчмарков: модель и typst."""
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Минимальный корректный PDF: одна пустая страница
+STUB_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 595 842]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+
+class StubTypstBackend:
+    """Бэкенд без typst: отдаёт заготовленный PDF через delay секунд.
+
+    Отделяет накладные расходы пайплайна (валидация, JSON, кэш, запись файла)
+    от стоимости самой компиляции.
+    """
+
+    name = "stub"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def render(self, template: str, inputs: dict[str, str]) -> bytes:
+        if self.delay:
+            time.sleep(self.delay)
+        return STUB_PDF
+
+    def render_and_query(
+        self, template: str, inputs: dict[str, str], selector: str
+    ) -> tuple[bytes, list]:
+        """PDF и метки пакета common/bundle.typ: документ на страницу и метка конца"""
+        pdf = self.render(template, inputs)
+        documents = len(json.loads(inputs.get("bundle_data", "[]")))
+        marks = [{"index": index, "page": index + 1} for index in range(documents)]
+        return pdf, [*marks, {"index": None, "page": max(documents, 1)}]
+
+
+class NullPdfCache:
+    """Кэш, который всегда промахивается: бенчмарк должен мерить компиляцию"""
+
+    hits = 0
+    misses = 0
+
+    def key(self, template: str, inputs: dict[str, str]) -> str:
+        # Уникальный ключ: планировщик не склеивает одинаковые компиляции бенчмарка
+        return uuid.uuid4().hex
+
+    def get(self, key: str) -> bytes | None:
+        return None
+
+    def put(self, key: str, pdf: bytes) -> None:
+        pass
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Заменитель ChatAnthropic с предсказуемым сценарием и задержкой.
+
+    На сообщение пользователя отвечает вызовом инструмента tool_name с tool_args,
+    на результат инструмента — текстом с этим результатом. Так каждый ход
+    диалога проходит полный цикл агента: модель → инструмент → модель.
+    """
+
+    tool_name: str
+    tool_args: dict[str, Any] = {}
+    latency: float = 0.0
+    input_tokens: int = 1000
+    output_tokens: int = 50
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "ScriptedChatModel":
+        return self
+
+    def _reply(self, messages: list[BaseMessage]) -> AIMessage:
+        usage = {
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.input_tokens + self.output_tokens,
+        }
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            content = f"Готово: {last.content}"
+            return AIMessage(content=content, id=uuid.uuid4().hex, usage_metadata=usage)
+        if not isinstance(last, HumanMessage):
+            content = "Уточните, пожалуйста."
+            return AIMessage(content=content, id=uuid.uuid4().hex, usage_metadata=usage)
+        return AIMessage(
+            content="",
+            id=uuid.uuid4().hex,
+            tool_calls=[{"name": self.tool_name, "args": self.tool_args, "id": uuid.uuid4().hex}],
+            usage_metadata=usage,
+        )
+
+    def _generate(
+        self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any
+    ) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    async def _agenerate(
+        self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any
+    ) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
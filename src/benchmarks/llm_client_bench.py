@@ -0,0 +1,123 @@
+"""Всплеск параллельных вызовов модели против заглушки с 429/529: SDK как есть и LLMClient.
+
+Заглушка (benchmarks.mock_anthropic) поднимается в этом же процессе с
+серверным лимитом запросов в минуту и случайными отказами. Сравниваются:
+  - AsyncAnthropic — SDK как есть: 2 встроенных повтора, без лимитов;
+  - LLMClient — управляемый путь: token bucket ниже серверного лимита, ограничение
+    параллельности, повторы с джиттером и дедлайн на вызов.
+
+Запуск из каталога src:
+    PYTHONPATH=.. python -m src.benchmarks.llm_client_bench --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+import anthropic
+
+from src.agents.llm_client import LLMClient
+from src.benchmarks.mock_anthropic import MockAnthropicServer
+from src.benchmarks.pipeline_bench import print_result, summarize
+from src.telemetry import telemetry
+
+REQUEST = {
+    "model": "claude-3-5-haiku-latest",
+    "max_tokens": 50,
+    "messages": [{"role": "user", "content": "Нужен акт за сентябрь"}],
+}
+
+
+async def burst(create, requests: int, concurrency: int) -> tuple[list[float], list[str], float]:
+    """requests вызовов, не больше concurrency одновременно; тайминги успешных и ошибки"""
+    gate = asyncio.Semaphore(concurrency)
+    timings: list[float] = []
+    errors: list[str] = []
+
+    async def one() -> None:
+        async with gate:
+            started = time.perf_counter()
+            try:
+                await create(**REQUEST)
+                timings.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(type(e).__name__)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return timings, errors, time.perf_counter() - started
+
+
+def run(name: str, create, server: MockAnthropicServer, args) -> dict:
+    """Всплеск через create; name (AsyncAnthropic или LLMClient) печатается в каждой строке"""
+    server.stats = type(server.stats)()
+    retries_before = telemetry.counter("retries")
+    timings, errors, wall = asyncio.run(burst(create, args.requests, args.concurrency))
+    result = summarize(
+        "llm", name, f"{name} {args.requests}x{args.concurrency}", timings or [0.0], wall,
+        errors=len(errors),
+        retries=telemetry.counter("retries") - retries_before,
+        server=server.stats.as_dict(),
+    )
+    print_result(result)
+    stats = result["server"]
+    print(f"    {name}, сервер: запросов {stats['requests']}, 429: {stats['rate_limited']}, "
+          f"529: {stats['overloaded']}, пик параллельности {stats['peak_in_flight']}; "
+          f"повторов LLMClient: {result['retries']:g}"
+          + (f"; ошибки: {', '.join(sorted(set(errors)))}" if errors else ""))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--rate-529", type=float, default=0.05)
+    parser.add_argument("--server-rpm", type=float, default=1200,
+                        help="лимит заглушки, запросов в минуту")
+    parser.add_argument("--server-burst", type=float, default=20)
+    parser.add_argument("--client-rpm", type=float, default=1080,
+                        help="лимит LLMClient, чуть ниже серверного")
+    parser.add_argument("--client-burst", type=float, default=10)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--deadline", type=float, default=60.0)
+    args = parser.parse_args()
+
+    def mock_server() -> MockAnthropicServer:
+        # Каждому клиенту — свежая заглушка с полным ведром лимита
+        return MockAnthropicServer(
+            latency=args.latency_ms / 1000,
+            rate_529=args.rate_529,
+            server_rpm=args.server_rpm,
+            server_burst=args.server_burst,
+            retry_after=0.5,
+            seed=1,
+        ).start()
+
+    print(f"Заглушка: лимит {args.server_rpm:g}/мин (ведро {args.server_burst:g}), "
+          f"529: {args.rate_529:.0%}, "
+          f"задержка {args.latency_ms:g} мс")
+
+    server = mock_server()
+    sdk = anthropic.AsyncAnthropic(api_key="test", base_url=server.base_url)
+    run("AsyncAnthropic", sdk.messages.create, server, args)
+    server.shutdown()
+
+    server = mock_server()
+    client = LLMClient(
+        api_key="test",
+        base_url=server.base_url,
+        deadline=args.deadline,
+        max_concurrency=args.max_concurrency,
+        requests_per_minute=args.client_rpm,
+        tokens_per_minute=10_000_000,
+        burst=args.client_burst,
+    )
+    run("LLMClient", client.acreate, server, args)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
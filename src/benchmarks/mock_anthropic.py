@@ -0,0 +1,285 @@
+"""Локальная заглушка Messages API Anthropic с задержкой и ошибками.
+
+Отвечает на POST /v1/messages (обычный ответ и SSE-стрим) с заданной
+задержкой, случайными 429 (с retry-after) и 529 overloaded, а при
+--server-rpm ещё и честно отказывает 429 сверх лимита запросов в минуту
+(token bucket ёмкостью --server-burst, как у настоящего API).
+Так LLMClient, ProxyAgent и агент можно гонять под нагрузкой без сети и ключа.
+Ответ по умолчанию — текст --reply; бенчмарки передают responder, который по
+телу запроса возвращает блоки content, в том числе вызовы инструментов.
+
+Запуск из каталога src:
+    PYTHONPATH=.. python -m src.benchmarks.mock_anthropic --port 8099 --rate-429 0.1 --rate-529 0.05
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8099 ANTHROPIC_API_KEY=test \
+        PYTHONPATH=.. python -m src.service
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+# Тело запроса Messages API -> блоки content ответа
+Responder = Callable[[dict], list[dict]]
+
+
+@dataclass
+class MockStats:
+    requests: int = 0
+    ok: int = 0
+    rate_limited: int = 0
+    overloaded: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def as_dict(self) -> dict:
+        return {key: value for key, value in vars(self).items() if not key.startswith("_")}
+
+
+class MockAnthropicServer(ThreadingHTTPServer):
+    """HTTP-сервер заглушки; параметры отказов можно менять на ходу"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        latency: float = 0.05,
+        jitter: float = 0.5,
+        rate_429: float = 0.0,
+        rate_529: float = 0.0,
+        retry_after: float = 1.0,
+        server_rpm: float | None = None,
+        server_burst: float | None = None,
+        reply: str = '{"type": "Акт"}',
+        responder: Responder | None = None,
+        seed: int | None = None,
+    ):
+        super().__init__((host, port), MockHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.rate_529 = rate_529
+        self.retry_after = retry_after
+        self.server_rpm = server_rpm
+        self.server_burst = server_burst or (server_rpm / 60 if server_rpm else 0)
+        self.reply = reply
+        self.responder = responder
+        self.stats = MockStats()
+        self._random = random.Random(seed)
+        self._allowance = self.server_burst
+        self._updated = time.monotonic()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockAnthropicServer":
+        threading.Thread(target=self.serve_forever, name="mock-anthropic", daemon=True).start()
+        return self
+
+    def content(self, body: dict) -> list[dict]:
+        if self.responder is not None:
+            return self.responder(body)
+        return [{"type": "text", "text": self.reply}]
+
+    def decide(self) -> tuple[int, float]:
+        """Статус ответа и задержка до него"""
+        with self.stats._lock:
+            over_limit = False
+            if self.server_rpm is not None:
+                now = time.monotonic()
+                refilled = (now - self._updated) * self.server_rpm / 60
+                self._allowance = min(self.server_burst, self._allowance + refilled)
+                self._updated = now
+                over_limit = self._allowance < 1
+                if not over_limit:
+                    self._allowance -= 1
+            roll = self._random.random()
+            delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+            if over_limit or roll < self.rate_429:
+                return 429, 0.0
+            return (529 if roll < self.rate_429 + self.rate_529 else 200), delay
+
+
+def tool_use(name: str, arguments: dict) -> dict:
+    """Блок вызова инструмента для responder"""
+    return {
+        "type": "tool_use",
+        "id": f"toolu_{uuid.uuid4().hex[:24]}",
+        "name": name,
+        "input": arguments,
+    }
+
+
+def _message(body: dict, content: list[dict]) -> dict:
+    # Токены оцениваем по длине всего, что модель читает и пишет: ~3 символа на токен
+    prompt = json.dumps(
+        [body.get("tools"), body.get("system"), body.get("messages")], ensure_ascii=False
+    )
+    output = json.dumps(content, ensure_ascii=False)
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "mock"),
+        "content": content,
+        "stop_reason": (
+            "tool_use" if any(block["type"] == "tool_use" for block in content) else "end_turn"
+        ),
+        "stop_sequence": None,
+        "usage": {"input_tokens": len(prompt) // 3, "output_tokens": max(1, len(output) // 3)},
+    }
+
+
+def _block_events(index: int, block: dict) -> list[tuple[str, dict]]:
+    if block["type"] == "tool_use":
+        start = {**block, "input": {}}
+        partial_json = json.dumps(block["input"], ensure_ascii=False)
+        deltas = [{"type": "input_json_delta", "partial_json": partial_json}]
+    else:
+        start = {"type": "text", "text": ""}
+        text = block["text"]
+        deltas = [{"type": "text_delta", "text": text[i:i + 8]} for i in range(0, len(text), 8)]
+    return [
+        ("content_block_start", {
+            "type": "content_block_start", "index": index, "content_block": start,
+        }),
+        *(("content_block_delta", {"type": "content_block_delta", "index": index, "delta": delta})
+          for delta in deltas),
+        ("content_block_stop", {"type": "content_block_stop", "index": index}),
+    ]
+
+
+def _sse_events(message: dict) -> list[tuple[str, dict]]:
+    usage = message["usage"]
+    return [
+        ("message_start", {"type": "message_start", "message": {
+            **message, "content": [], "stop_reason": None, "usage": {**usage, "output_tokens": 1},
+        }}),
+        *(
+            event
+            for index, block in enumerate(message["content"])
+            for event in _block_events(index, block)
+        ),
+        ("message_delta", {"type": "message_delta",
+                           "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                           "usage": {"output_tokens": usage["output_tokens"]}}),
+        ("message_stop", {"type": "message_stop"}),
+    ]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server: MockAnthropicServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+        if self.path.rstrip("/") != "/v1/messages":
+            self._send_json(404, {"type": "error", "error": {
+                "type": "not_found_error", "message": self.path,
+            }})
+            return
+
+        stats = self.server.stats
+        status, delay = self.server.decide()
+        with stats._lock:
+            stats.requests += 1
+            stats.in_flight += 1
+            stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        try:
+            time.sleep(delay)
+            if status == 429:
+                with stats._lock:
+                    stats.rate_limited += 1
+                self._send_json(429, {"type": "error", "error": {
+                    "type": "rate_limit_error",
+                    "message": "Number of requests has exceeded your rate limit",
+                }}, {"retry-after": f"{self.server.retry_after:g}"})
+            elif status == 529:
+                with stats._lock:
+                    stats.overloaded += 1
+                self._send_json(529, {"type": "error", "error": {
+                    "type": "overloaded_error", "message": "Overloaded",
+                }})
+            else:
+                with stats._lock:
+                    stats.ok += 1
+                message = _message(body, self.server.content(body))
+                if body.get("stream"):
+                    self._stream(message)
+                else:
+                    self._send_json(200, message)
+        finally:
+            with stats._lock:
+                stats.in_flight -= 1
+
+    def _stream(self, message: dict) -> None:
+        data = b"".join(
+            f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode()
+            for event, payload in _sse_events(message)
+        )
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="доля случайных 429")
+    parser.add_argument("--rate-529", type=float, default=0.0, help="доля случайных 529 overloaded")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--server-rpm", type=float, default=None,
+                        help="лимит запросов в минуту на стороне сервера")
+    parser.add_argument("--server-burst", type=float, default=None,
+                        help="ёмкость ведра, по умолчанию секунда лимита")
+    parser.add_argument("--reply", default='{"type": "Акт"}', help="текст ответа модели")
+    args = parser.parse_args()
+
+    server = MockAnthropicServer(
+        args.host, args.port,
+        latency=args.latency_ms / 1000,
+        rate_429=args.rate_429,
+        rate_529=args.rate_529,
+        retry_after=args.retry_after,
+        server_rpm=args.server_rpm,
+        server_burst=args.server_burst,
+        reply=args.reply,
+    )
+    print(f"Заглушка Anthropic: {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{server.stats.as_dict()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Память и сериализация моделей на батчах работ: slots + orjson против прежнего пути.
+
+Прежний путь воспроизводится здесь же: обычный датакласс без __slots__ и
+проверок, asdict для каждой работы и json.dumps из стандартной библиотеки.
+Новый — src.models (slots, проверка в __post_init__) и serialize_inputs на orjson.
+
+Запуск из каталога src:
+    PYTHONPATH=.. python -m src.benchmarks.models_bench --sizes 10000,50000
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+
+from src.benchmarks.pipeline_bench import sample_customer
+from src.debug_tools.typst_backend import serialize_inputs
+from src.models import WorkItem
+
+
+@dataclass
+class LegacyWorkItem:
+    """WorkItem до перехода на slots и проверки полей"""
+    task: str
+    price: int
+    quantity: int = 1
+
+
+def build(cls, size: int) -> list:
+    return [
+        cls(f"Техническое обслуживание ККТ, позиция {i + 1}", 600 + i % 50, i % 10 + 1)
+        for i in range(size)
+    ]
+
+
+def measure_memory(cls, size: int) -> int:
+    """Байты, занятые списком из size работ"""
+    gc.collect()
+    tracemalloc.start()
+    items = build(cls, size)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return current
+
+
+def best_of(func, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def legacy_serialize(customer, jobs: list) -> str:
+    payload = {"customer": asdict(customer), "jobs": list(map(lambda j: asdict(j), jobs))}
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def legacy_serialize_indented(customer, jobs: list) -> str:
+    payload = {"customer": asdict(customer), "jobs": list(map(lambda j: asdict(j), jobs))}
+    return json.dumps(payload, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", default="10000,50000", help="размеры батчей работ через запятую")
+    parser.add_argument("--runs", type=int, default=5, help="повторов, берётся лучший")
+    args = parser.parse_args()
+
+    customer = sample_customer(0)
+    for size in (int(size) for size in args.sizes.split(",") if size):
+        print(f"\n{size} работ:")
+        legacy_bytes = measure_memory(LegacyWorkItem, size)
+        slotted_bytes = measure_memory(WorkItem, size)
+        print(f"  память:        {legacy_bytes / 2**20:7.2f} → {slotted_bytes / 2**20:7.2f} МиБ "
+              f"({slotted_bytes / legacy_bytes - 1:+.0%}, {slotted_bytes / size:.0f} Б на работу)")
+
+        legacy_item, item = build(LegacyWorkItem, 1)[0], build(WorkItem, 1)[0]
+        legacy_object = sys.getsizeof(legacy_item) + sys.getsizeof(legacy_item.__dict__)
+        print(f"  сам объект:    {legacy_object} → {sys.getsizeof(item)} Б "
+              f"(остальное — строки наименований)")
+
+        legacy_build = best_of(lambda: build(LegacyWorkItem, size), args.runs)
+        slotted_build = best_of(lambda: build(WorkItem, size), args.runs)
+        print(f"  создание:      {legacy_build * 1000:7.2f} → {slotted_build * 1000:7.2f} мс "
+              f"(с проверкой полей)")
+
+        legacy_jobs, jobs = build(LegacyWorkItem, size), build(WorkItem, size)
+        if json.loads(legacy_serialize(customer, legacy_jobs)) != json.loads(
+            serialize_inputs({"data": {"customer": customer, "jobs": jobs}})["data"]
+        ):
+            raise SystemExit("❌ orjson и json дают разные данные")
+
+        candidates = {
+            "asdict + json.dumps(indent=2)": (
+                lambda: legacy_serialize_indented(customer, legacy_jobs)
+            ),
+            "asdict + json.dumps": lambda: legacy_serialize(customer, legacy_jobs),
+            "orjson (serialize_inputs)": (
+                lambda: serialize_inputs({"data": {"customer": customer, "jobs": jobs}})
+            ),
+        }
+        timings = {name: best_of(func, args.runs) for name, func in candidates.items()}
+        baseline = timings["asdict + json.dumps"]
+        for name, elapsed in timings.items():
+            print(f"  {name:<31} {elapsed * 1000:8.2f} мс  "
+                  f"(×{baseline / elapsed:.1f} к json.dumps)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""Сквозной бенчмарк пайплайна документов: этапы, батчи и диалоги с агентом.
+
+Для каждого бэкенда typst (stub — без компиляции, subprocess/resident — настоящий
+typst) измеряет:
+  - этапы одного документа: загрузка профиля, сериализация JSON, компиляция
+    и render_pdf целиком;
+  - батчи из 1/10/100/1000 документов через BatchGenerator;
+  - параллельные диалоги LLMAgent с локальной моделью-заменителем.
+
+Кэш PDF отключается, чтобы каждый документ компилировался. Результаты
+сохраняются в JSON; --compare печатает изменение p50 относительно прошлого прогона.
+
+Запуск из каталога src:
+    PYTHONPATH=.. python -m src.benchmarks.pipeline_bench --backends stub,subprocess
+    PYTHONPATH=.. python -m src.benchmarks.pipeline_bench --compare output/bench/pipeline-<...>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from src.benchmarks.fakes import NullPdfCache, ScriptedChatModel, StubTypstBackend
+from src.debug_tools.batch import BatchGenerator, DocumentJob
+from src.debug_tools.debug_docs_generator import (
+    DOCUMENT_TYPES,
+    ORG_CARD,
+    DebugGenerator,
+    shared_runtime,
+)
+from src.debug_tools.org_registry import OrganizationRegistry
+from src.debug_tools.typst_backend import SubprocessTypstBackend, create_backend, serialize_inputs
+from src.exceptions import DocsGeneratorError
+from src.models import Customer, WorkItem
+
+
+def summarize(
+    suite: str, backend: str, name: str, timings: list[float], wall: float | None = None, **extra
+) -> dict:
+    """Сводка по замерам в секундах: p50/p95/среднее в мс и пропускная способность"""
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    wall = wall if wall is not None else sum(timings)
+    return {
+        "suite": suite,
+        "backend": backend,
+        "name": name,
+        "runs": len(timings),
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": p95 * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "throughput_per_s": len(timings) / wall if wall else 0.0,
+        **extra,
+    }
+
+
+def print_result(result: dict) -> None:
+    print(
+        f"  {result['suite']:<7} {result['name']:<22} n={result['runs']:<5} "
+        f"p50: {result['p50_ms']:8.2f} мс  p95: {result['p95_ms']:8.2f} мс  "
+        f"{result['throughput_per_s']:8.1f}/с"
+        + (f"  ошибок: {result['errors']}" if result.get("errors") else "")
+    )
+
+
+def sample_customer(index: int) -> Customer:
+    return Customer(
+        name=f'ООО "Заказчик {index}"',
+        slug=f"customer_{index}",
+        inn="0323347497",
+        ogrn="1030300123457",
+        kpp="032301001",
+        address="670031, Бурятия Респ, Улан-Удэ г, Широких-Полянского ул, дом № 50",
+        signatory="Иванов И.И.",
+    )
+
+
+def sample_jobs(count: int = 5) -> list[WorkItem]:
+    return [
+        WorkItem(
+            task=f"Техническое обслуживание ККТ, позиция {i + 1}",
+            price=600 + i * 10,
+            quantity=i + 1,
+        )
+        for i in range(count)
+    ]
+
+
+def timed(func, *args) -> float:
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def bench_single(
+    backend: str, doc_type: str, org_slug: str, org_type: str, runs: int
+) -> list[dict]:
+    """Этапы одного документа по отдельности и render_pdf целиком"""
+    customer, jobs = sample_customer(0), sample_jobs()
+    _, template, payloads = DebugGenerator._prepare(doc_type, customer, jobs, org_slug, org_type)
+    inputs = serialize_inputs(payloads)
+    shared_runtime().backend.render(template, inputs)  # прогрев
+
+    stages = {
+        "profile_load_cold": lambda: OrganizationRegistry().get(org_slug, org_type),
+        "profile_load_warm": lambda: DebugGenerator.load_organization_from_file(org_slug, org_type),
+        "prepare": lambda: DebugGenerator._prepare(doc_type, customer, jobs, org_slug, org_type),
+        "serialize": lambda: serialize_inputs(payloads),
+        "compile": lambda: shared_runtime().backend.render(template, inputs),
+        "render_pdf": lambda: DebugGenerator.render_pdf(
+            doc_type, customer, jobs, org_slug, org_type
+        ),
+    }
+    return [
+        summarize("single", backend, name, [timed(stage) for _ in range(runs)])
+        for name, stage in stages.items()
+    ]
+
+
+def bench_batches(
+    backend: str,
+    doc_type: str,
+    org_slug: str,
+    org_type: str,
+    sizes: list[int],
+    workers: int | None,
+    output_dir: str,
+) -> list[dict]:
+    """Батчи документов через BatchGenerator: задержка на документ и документы в секунду"""
+    results = []
+    jobs = sample_jobs()
+    for size in sizes:
+        generator = BatchGenerator(max_workers=workers, output_dir=output_dir)
+        batch = [
+            DocumentJob(doc_type, sample_customer(i), jobs, org_slug, org_type)
+            for i in range(size)
+        ]
+        started = time.perf_counter()
+        documents = list(generator.generate(batch))
+        wall = time.perf_counter() - started
+
+        errors = [result.error for result in documents if not result.ok]
+        if errors:
+            first = f"{type(errors[0]).__name__}: {errors[0]}"
+            print(f"  ⚠️  батч {size}: {len(errors)} ошибок, первая: {first}")
+        results.append(summarize(
+            "batch", backend, f"batch_{size}", [result.elapsed for result in documents], wall,
+            errors=len(errors), wall_s=wall, workers=generator.max_workers,
+        ))
+    return results
+
+
+async def _dialog(agent, turns: int) -> list[float]:
+    thread_id = agent.new_thread()
+    timings = []
+    for turn in range(turns):
+        started = time.perf_counter()
+        await agent.ainvoke(f"Сформируй карточку организации, ход {turn + 1}", thread_id=thread_id)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def bench_dialogs(
+    backend: str,
+    org_slug: str,
+    org_type: str,
+    concurrency: list[int],
+    turns: int,
+    model_latency: float,
+    state_dir: str,
+) -> list[dict]:
+    """Параллельные диалоги: каждый ход — модель, инструмент генерации PDF и снова модель"""
+    from src.agents.checkpointer import SqliteCheckpointer
+    from src.agents.llm_agent import LLMAgent
+    from src.agents.tools import to_async_tool
+
+    model = ScriptedChatModel(
+        tool_name=DebugGenerator.generate_pdf_org_card.__name__,
+        tool_args={"org_slug": org_slug, "org_type": org_type},
+        latency=model_latency,
+    )
+    agent = LLMAgent(
+        model,
+        tools=[
+            to_async_tool(DebugGenerator.generate_pdf_act),
+            to_async_tool(DebugGenerator.generate_pdf_invoice),
+            to_async_tool(DebugGenerator.generate_pdf_org_card),
+        ],
+        checkpointer=SqliteCheckpointer(f"{state_dir}/checkpoints-{backend}.sqlite3"),
+    )
+
+    async def run(dialogs: int) -> tuple[list[float], float]:
+        started = time.perf_counter()
+        per_dialog = await asyncio.gather(*(_dialog(agent, turns) for _ in range(dialogs)))
+        wall = time.perf_counter() - started
+        return [timing for timings in per_dialog for timing in timings], wall
+
+    asyncio.run(run(1))  # прогрев: граф, пул потоков инструментов, SQLite
+    results = []
+    for dialogs in concurrency:
+        timings, wall = asyncio.run(run(dialogs))
+        results.append(summarize(
+            "dialog", backend, f"dialogs_{dialogs}x{turns}", timings, wall,
+            wall_s=wall, model_latency_ms=model_latency * 1000,
+        ))
+    return results
+
+
+def compare(results: list[dict], previous_path: str) -> None:
+    previous = {
+        (result["suite"], result["backend"], result["name"]): result
+        for result in json.loads(Path(previous_path).read_text(encoding="utf-8"))["results"]
+    }
+    print(f"\nСравнение p50 с {previous_path}:")
+    for result in results:
+        before = previous.get((result["suite"], result["backend"], result["name"]))
+        if before is None or not before["p50_ms"]:
+            continue
+        change = (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"]
+        print(f"  {result['backend']:<10} {result['name']:<22} "
+              f"{before['p50_ms']:8.2f} → {result['p50_ms']:8.2f} мс ({change:+.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--org-slug", default="ip_angarhaeva")
+    parser.add_argument("--org-type", default="ip")
+    parser.add_argument("--doc-type", default=ORG_CARD, choices=DOCUMENT_TYPES)
+    parser.add_argument("--backends", default="stub,subprocess",
+                        help="через запятую: stub, subprocess, resident, resident-pool")
+    parser.add_argument("--stub-delay-ms", type=float, default=0.0)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--batch-sizes", default="1,10,100,1000")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--dialogs", default="1,10,50", help="число параллельных диалогов через запятую"
+    )
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--model-latency-ms", type=float, default=50.0)
+    parser.add_argument("--skip", default="", help="пропустить наборы: single, batch, dialog")
+    parser.add_argument(
+        "--output", default=None, help="JSON с результатами, по умолчанию output/bench/"
+    )
+    parser.add_argument("--compare", default=None, help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    skip = set(filter(None, args.skip.split(",")))
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",") if size]
+    concurrency = [int(dialogs) for dialogs in args.dialogs.split(",") if dialogs]
+
+    runtime = shared_runtime()
+    runtime.cache = NullPdfCache()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="pipeline-bench-") as work_dir:
+        for backend_name in filter(None, args.backends.split(",")):
+            if backend_name == StubTypstBackend.name:
+                runtime.backend = StubTypstBackend(args.stub_delay_ms / 1000)
+            elif backend_name == SubprocessTypstBackend.name and shutil.which("typst") is None:
+                print(f"{backend_name}: пропущено, не найден исполняемый файл typst")
+                continue
+            else:
+                try:
+                    runtime.backend = create_backend(backend_name)
+                except ImportError as e:
+                    print(f"{backend_name}: пропущено, {e}")
+                    continue
+            # Пробная компиляция шаблонов зависит от бэкенда
+            runtime.templates.reload()
+            print(f"\nБэкенд: {backend_name}")
+
+            suite_results = []
+            try:
+                runtime.templates.get(args.doc_type, args.org_slug, args.org_type)
+            except DocsGeneratorError as e:
+                # Без пригодного шаблона наборы single и batch мерили бы только ошибки
+                print(f"  single, batch: пропущено, {e}")
+                skip_documents = {"single", "batch"}
+            else:
+                skip_documents = set()
+            if "single" not in skip | skip_documents:
+                suite_results += bench_single(
+                    backend_name, args.doc_type, args.org_slug, args.org_type, args.runs
+                )
+            if "batch" not in skip | skip_documents:
+                suite_results += bench_batches(
+                    backend_name, args.doc_type, args.org_slug, args.org_type,
+                    batch_sizes, args.workers, f"{work_dir}/batch",
+                )
+            if "dialog" not in skip:
+                suite_results += bench_dialogs(
+                    backend_name, args.org_slug, args.org_type,
+                    concurrency, args.turns, args.model_latency_ms / 1000, work_dir,
+                )
+            for result in suite_results:
+                print_result(result)
+            results += suite_results
+
+    started_at = datetime.now()
+    output = Path(args.output or f"output/bench/pipeline-{started_at:%Y%m%d-%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "meta": {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nРезультаты сохранены: {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Планировщик компиляций: задержка интерактивных запросов во время пакета и склейка дублей.
+
+Два замера, каждый без планировщика (компиляция сразу в потоке вызывающего,
+как раньше) и через GenerationScheduler:
+  - interactive — пока BatchGenerator собирает пакет актов, пользователь по
+    одному запрашивает документы; мерится задержка его запросов;
+  - duplicates — N потоков одновременно просят одну и ту же карточку
+    организации; считается, сколько раз запускалась компиляция typst.
+
+Запуск из каталога src (нужны профиль организации и шаблоны):
+    PYTHONPATH=.. python -m src.benchmarks.scheduler_bench --batch 300 --batch-workers 4
+"""
+import argparse
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from src.benchmarks.fakes import NullPdfCache
+from src.benchmarks.pipeline_bench import print_result, sample_customer, sample_jobs, summarize
+from src.debug_tools.batch import BatchGenerator, DocumentJob
+from src.debug_tools.debug_docs_generator import ACT, ORG_CARD, DebugGenerator, shared_runtime
+from src.debug_tools.pdf_cache import PdfCache
+from src.debug_tools.scheduler import GenerationScheduler
+from src.debug_tools.typst_backend import create_backend
+
+
+class InlineScheduler:
+    """Прежнее поведение: каждая компиляция сразу и в потоке вызывающего"""
+
+    def submit(self, key, func, priority=None) -> Future:
+        future: Future = Future()
+        future.set_result(func())
+        return future
+
+
+class CountingBackend:
+    """Бэкенд-обёртка, считающая запуски компиляции"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self.renders = 0
+        self._lock = threading.Lock()
+
+    def render(self, template: str, inputs: dict[str, str]) -> bytes:
+        with self._lock:
+            self.renders += 1
+        return self.backend.render(template, inputs)
+
+
+def bench_interactive(mode: str, args) -> dict:
+    """Задержка одиночных запросов, пока в фоне идёт пакет"""
+    jobs = sample_jobs()
+    batch = [
+        DocumentJob(ACT, sample_customer(100_000 + i), jobs, args.org_slug, args.org_type)
+        for i in range(args.batch)
+    ]
+    with tempfile.TemporaryDirectory(prefix="scheduler-bench-") as output_dir:
+        generator = BatchGenerator(max_workers=args.batch_workers, output_dir=output_dir)
+        background = threading.Thread(target=generator.generate_all, args=(batch,))
+        background.start()
+        time.sleep(args.pause)  # пакет успевает занять очередь
+
+        timings = []
+        index = 0
+        while background.is_alive() and index < args.interactive:
+            started = time.perf_counter()
+            DebugGenerator.render_pdf(
+                ACT, sample_customer(index), jobs, args.org_slug, args.org_type
+            )
+            timings.append(time.perf_counter() - started)
+            index += 1
+            time.sleep(args.pause)
+        background.join()
+    return summarize("interactive", shared_runtime().backend.name, mode, timings or [0.0])
+
+
+def bench_idle(args) -> dict:
+    """Те же одиночные запросы без фоновой нагрузки: нижняя граница задержки"""
+    jobs = sample_jobs()
+    timings = []
+    for index in range(min(args.interactive, 20)):
+        started = time.perf_counter()
+        DebugGenerator.render_pdf(ACT, sample_customer(index), jobs, args.org_slug, args.org_type)
+        timings.append(time.perf_counter() - started)
+    return summarize("interactive", shared_runtime().backend.name, "idle", timings)
+
+
+def bench_duplicates(mode: str, args) -> dict:
+    """N одновременных одинаковых запросов карточки при пустом кэше"""
+    runtime = shared_runtime()
+    counting = CountingBackend(runtime.backend)
+    backend, cache = runtime.backend, runtime.cache
+    runtime.backend = counting
+    try:
+        with tempfile.TemporaryDirectory(prefix="scheduler-bench-cache-") as cache_dir:
+            runtime.cache = PdfCache(cache_dir)
+            barrier = threading.Barrier(args.duplicates)
+
+            def request() -> float:
+                barrier.wait()
+                started = time.perf_counter()
+                DebugGenerator.render_pdf(ORG_CARD, None, [], args.org_slug, args.org_type)
+                return time.perf_counter() - started
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.duplicates) as pool:
+                timings = list(pool.map(lambda _: request(), range(args.duplicates)))
+            wall = time.perf_counter() - started
+    finally:
+        runtime.backend, runtime.cache = backend, cache
+    return summarize("dedup", backend.name, mode, timings, wall, compiles=counting.renders)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--org-slug", default="ip_angarhaeva")
+    parser.add_argument("--org-type", default="ip")
+    parser.add_argument("--backend", default=None,
+                        help="бэкенд typst, по умолчанию как у генератора")
+    parser.add_argument("--batch", type=int, default=300, help="документов в фоновом пакете")
+    parser.add_argument("--batch-workers", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="компиляций одновременно в планировщике")
+    parser.add_argument("--interactive", type=int, default=30,
+                        help="одиночных запросов во время пакета")
+    parser.add_argument("--pause", type=float, default=0.05,
+                        help="пауза между одиночными запросами, с")
+    parser.add_argument("--duplicates", type=int, default=16,
+                        help="одновременных одинаковых запросов")
+    args = parser.parse_args()
+
+    runtime = shared_runtime()
+    runtime.backend = create_backend(args.backend)
+    runtime.cache = NullPdfCache()
+    runtime.templates.validate_all()
+    print(f"Бэкенд: {runtime.backend.name}, "
+          f"пакет: {args.batch} актов в {args.batch_workers} потоков")
+
+    print_result(bench_idle(args))
+    schedulers = {
+        "inline": InlineScheduler,
+        "scheduler": lambda: GenerationScheduler(args.workers),
+    }
+    for mode, make_scheduler in schedulers.items():
+        runtime.scheduler = make_scheduler()
+        print_result(bench_interactive(mode, args))
+    for mode, make_scheduler in schedulers.items():
+        runtime.scheduler = make_scheduler()
+        result = bench_duplicates(mode, args)
+        print_result(result)
+        print(f"    компиляций typst на {args.duplicates} одинаковых запросов: "
+              f"{result['compiles']}")
+
+
+if __name__ == "__main__":
+    main()
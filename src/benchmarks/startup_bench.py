@@ -0,0 +1,95 @@
+"""Время холодного старта CLI по `python -X importtime` с бюджетом.
+
+Импорт main не должен тянуть стек агента (LangChain, LangGraph, SDK Anthropic):
+он загружается только при старте диалога. Скрипт завершается с кодом 1, если
+медиана времени импорта main превышает бюджет или загружен запрещённый модуль.
+
+Запуск из каталога src:
+    PYTHONPATH=.. python -m src.benchmarks.startup_bench --budget-ms 300
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Модули, которые допустимо импортировать только при старте диалога с агентом
+LAZY_MODULES = ("anthropic", "langchain_core", "langchain_anthropic", "langgraph")
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(module: str) -> tuple[int, dict[str, int], set[str]]:
+    """Один холодный импорт в отдельном процессе.
+
+    Возвращает суммарное время импорта модуля (мкс), собственное время
+    каждого загруженного модуля и множество загруженных модулей.
+    """
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    total = 0
+    self_times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, name = match.groups()
+        self_times[name] = self_times.get(name, 0) + int(self_us)
+        if name == module:
+            total = int(cumulative_us)
+    return total, self_times, set(self_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="src.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=300.0)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    totals = []
+    self_times: dict[str, int] = {}
+    loaded: set[str] = set()
+    for _ in range(args.runs):
+        total, run_self_times, run_loaded = measure(args.module)
+        totals.append(total / 1000)
+        self_times = run_self_times
+        loaded |= run_loaded
+
+    median = statistics.median(totals)
+    print(f"import {args.module}: медиана {median:.1f} мс, мин {min(totals):.1f} мс, "
+          f"макс {max(totals):.1f} мс ({args.runs} запусков, бюджет {args.budget_ms:.0f} мс)")
+
+    print("\nСамые дорогие модули (собственное время, последний запуск):")
+    slowest = sorted(self_times.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    for name, self_us in slowest:
+        print(f"  {self_us / 1000:8.1f} мс  {name}")
+
+    eager = sorted(
+        name for name in loaded
+        if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)
+    )
+    failed = False
+    if eager:
+        failed = True
+        print(f"\n❌ При старте загружены модули стека агента: {', '.join(eager[:10])}"
+              f"{' ...' if len(eager) > 10 else ''}")
+    if median > args.budget_ms:
+        failed = True
+        print(f"\n❌ Бюджет старта превышен: {median:.1f} мс > {args.budget_ms:.0f} мс")
+
+    if failed:
+        sys.exit(1)
+    print("\n✅ Старт в пределах бюджета")
+
+
+if __name__ == "__main__":
+    main()
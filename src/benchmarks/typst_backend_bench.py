@@ -0,0 +1,143 @@
+"""Сравнение задержки на документ: холодный subprocess против резидентного typst.
+
+Для резидентного бэкенда проверяется, отпускают ли биндинги GIL на время
+компиляции: сколько её простоял соседний поток Python со sleep(1 мс) и во
+сколько раз --threads потоков быстрее одного. typst 0.13 GIL держит, поэтому
+параллельно компилирует только resident-pool (пул процессов); его ускорение
+печатается рядом и на многоядерной машине должно расти с числом потоков.
+
+Запуск из каталога src (пути к шаблонам относительные):
+    PYTHONPATH=.. python -m src.benchmarks.typst_backend_bench --runs 20
+"""
+import argparse
+import os
+import shutil
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+
+from src.debug_tools.debug_docs_generator import DebugGenerator
+from src.debug_tools.typst_backend import (
+    ProcessPoolTypstBackend,
+    ResidentTypstBackend,
+    SubprocessTypstBackend,
+    serialize_inputs,
+    typst,
+)
+
+
+def bench_backend(backend, template: str, payloads: dict[str, dict], runs: int) -> list[float]:
+    timings = []
+    inputs = serialize_inputs(payloads)
+    for _ in range(runs):
+        started = time.perf_counter()
+        backend.render(template, inputs)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def blocked_share(backend, template: str, payloads: dict[str, dict], runs: int) -> float:
+    """Доля компиляции, которую соседний поток Python простоял без GIL.
+
+    Поток просыпается каждую миллисекунду; берётся самый длинный промежуток
+    без его пробуждений внутри компиляции. Если биндинги держат GIL всю
+    компиляцию, промежуток равен ей целиком (доля около 1), если отпускают —
+    это несколько миллисекунд. От числа ядер не зависит.
+    """
+    inputs = serialize_inputs(payloads)
+    backend.render(template, inputs)
+    stop = threading.Event()
+    wakeups: list[float] = []
+
+    def sleeper() -> None:
+        while not stop.is_set():
+            time.sleep(0.001)
+            wakeups.append(time.perf_counter())
+
+    thread = threading.Thread(target=sleeper)
+    thread.start()
+    intervals = []
+    try:
+        for _ in range(runs):
+            time.sleep(0.005)
+            started = time.perf_counter()
+            backend.render(template, inputs)
+            intervals.append((started, time.perf_counter()))
+    finally:
+        stop.set()
+        thread.join()
+
+    shares = []
+    for started, ended in intervals:
+        points = [started, *(at for at in wakeups if started < at < ended), ended]
+        longest = max(later - earlier for earlier, later in zip(points, points[1:]))
+        shares.append(longest / (ended - started))
+    return statistics.fmean(shares)
+
+
+def thread_speedup(
+    backend, template: str, payloads: dict[str, dict], runs: int, threads: int
+) -> float:
+    """Во сколько раз threads потоков быстрее компилируют runs документов, чем один поток"""
+    inputs = serialize_inputs(payloads)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        # Прогрев: у пула процессов каждый воркер загружает шрифты сам
+        list(pool.map(lambda _: backend.render(template, inputs), range(threads * 2)))
+        started = time.perf_counter()
+        for _ in range(runs):
+            backend.render(template, inputs)
+        sequential = time.perf_counter() - started
+        started = time.perf_counter()
+        list(pool.map(lambda _: backend.render(template, inputs), range(runs)))
+        parallel = time.perf_counter() - started
+    return sequential / parallel
+
+
+def report(name: str, timings: list[float]) -> None:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{name:<22} первый: {timings[0] * 1000:8.1f} мс  "
+        f"p50: {statistics.median(timings) * 1000:8.1f} мс  "
+        f"p95: {p95 * 1000:8.1f} мс  "
+        f"среднее: {statistics.fmean(timings) * 1000:8.1f} мс"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--org-slug", default="ip_angarhaeva")
+    parser.add_argument("--org-type", default="ip")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    organization = DebugGenerator.load_organization_from_file(args.org_slug, args.org_type)
+    template = f"typst/{organization.org_type}/{organization.slug}/org_card.typ"
+    payloads = {"org_data": asdict(organization)}
+
+    if shutil.which("typst") is None:
+        print("subprocess: пропущено, не найден исполняемый файл typst")
+    else:
+        cold = bench_backend(SubprocessTypstBackend(), template, payloads, args.runs)
+        report("subprocess (cold)", cold)
+
+    if typst is None:
+        print("resident: пропущено, не установлены python-биндинги typst")
+        return
+    resident = ResidentTypstBackend()
+    report("resident (warm)", bench_backend(resident, template, payloads, args.runs))
+
+    share = blocked_share(resident, template, payloads, args.runs)
+    print(f"соседний поток Python стоял {share:.0%} компиляции "
+          f"({'GIL отпускается' if share < 0.75 else 'GIL удерживается'})")
+    for backend in (resident, ProcessPoolTypstBackend(args.threads)):
+        speedup = thread_speedup(backend, template, payloads, args.runs * 4, args.threads)
+        print(f"{backend.name}: ускорение в {args.threads} потоков "
+              f"(ядер: {os.cpu_count()}): {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
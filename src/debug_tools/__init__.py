@@ -1 +1,4 @@
-from .debug_docs_generator import DebugGenerator
\ No newline at end of file
+from src.debug_tools.batch import BatchGenerator, BundleResult, DocumentJob, DocumentResult
+from src.debug_tools.debug_docs_generator import DebugGenerator
+
+__all__ = ["BatchGenerator", "BundleResult", "DebugGenerator", "DocumentJob", "DocumentResult"]
@@ -0,0 +1,175 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from src.debug_tools.debug_docs_generator import ORG_CARD, DebugGenerator
+from src.debug_tools.progress import ProgressCallback
+from src.debug_tools.scheduler import BATCH, generation_priority
+from src.models import Customer, WorkItem
+
+
+@dataclass(frozen=True)
+class DocumentJob:
+    """Задание на генерацию одного документа в батче"""
+    doc_type: str
+    customer: Customer | None
+    jobs: list[WorkItem] = field(default_factory=list)
+    org_slug: str = "ip_angarhaeva"
+    org_type: str = "ip"
+    output_path: str | None = None
+
+
+@dataclass
+class DocumentResult:
+    """Результат генерации: путь к PDF или ошибка"""
+    job: DocumentJob
+    output_path: str | None = None
+    error: Exception | None = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class BundleResult:
+    """Результат сборки пакета: общий PDF с индексом страниц или ошибка"""
+    doc_type: str
+    org_slug: str
+    org_type: str
+    jobs: list[DocumentJob]
+    output_path: str | None = None
+    error: Exception | None = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def index_path(self) -> str | None:
+        return str(Path(self.output_path).with_suffix(".json")) if self.output_path else None
+
+
+class BatchGenerator:
+    """Параллельная генерация документов пулом потоков.
+
+    Потоки typst не запускают: компилирует отдельный процесс — typst CLI
+    у subprocess или воркер пула у resident-pool (см. create_backend), а поток
+    лишь ждёт его, отпустив GIL. В одном процессе (resident) биндинги typst
+    GIL держат, и компиляции идут по очереди. Все компиляции идут через
+    общий планировщик (shared_runtime) с приоритетом BATCH: их не больше его
+    max_workers, и они уступают интерактивным запросам.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        output_dir: str = "output/batch",
+        on_progress: ProgressCallback | None = None,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.output_dir = output_dir
+        self.on_progress = on_progress
+
+    def _output_path(self, run_id: str, index: int, job: DocumentJob) -> str:
+        if job.output_path:
+            return job.output_path
+        name = job.org_slug
+        if job.customer is not None and job.doc_type != ORG_CARD:
+            name = job.customer.slug
+        return (
+            f"{self.output_dir}/{run_id}/{job.org_type}/{job.org_slug}/"
+            f"{index:05d}_{job.doc_type}_{name}.pdf"
+        )
+
+    def _run(self, job: DocumentJob, output_path: str) -> DocumentResult:
+        started = time.perf_counter()
+        try:
+            with generation_priority(BATCH):
+                path = DebugGenerator.render_document(
+                    job.doc_type,
+                    job.customer,
+                    job.jobs,
+                    job.org_slug,
+                    job.org_type,
+                    output_path,
+                    self.on_progress,
+                )
+            return DocumentResult(job, path, elapsed=time.perf_counter() - started)
+        except Exception as e:
+            return DocumentResult(job, error=e, elapsed=time.perf_counter() - started)
+
+    def generate(self, jobs: Iterable[DocumentJob]) -> Iterator[DocumentResult]:
+        """Запускает задания и отдаёт результаты по мере готовности"""
+        run_id = uuid.uuid4().hex[:12]
+        targets = ((job, self._output_path(run_id, index, job)) for index, job in enumerate(jobs))
+        for _, result in self.generate_to(targets):
+            yield result
+
+    def generate_to(
+        self, targets: Iterable[tuple[DocumentJob, str]]
+    ) -> Iterator[tuple[str, DocumentResult]]:
+        """Генерирует каждое задание в заданный путь; отдаёт (путь, результат) по мере готовности.
+
+        Путь возвращается и при ошибке, когда у результата нет output_path.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="typst") as pool:
+            futures = {
+                pool.submit(self._run, job, output_path): output_path
+                for job, output_path in targets
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def generate_all(self, jobs: Iterable[DocumentJob]) -> list[DocumentResult]:
+        return list(self.generate(jobs))
+
+    def _run_bundle(self, bundle: BundleResult, output_path: str) -> BundleResult:
+        started = time.perf_counter()
+        try:
+            with generation_priority(BATCH):
+                bundle.output_path = DebugGenerator.render_bundle_document(
+                    bundle.doc_type,
+                    [(job.customer, job.jobs) for job in bundle.jobs],
+                    bundle.org_slug,
+                    bundle.org_type,
+                    output_path,
+                    self.on_progress,
+                )
+        except Exception as e:
+            bundle.error = e
+        bundle.elapsed = time.perf_counter() - started
+        return bundle
+
+    def generate_bundles(self, jobs: Iterable[DocumentJob]) -> Iterator[BundleResult]:
+        """Склеивает задания одного вида и одной организации в общий PDF.
+
+        Каждая группа (вид документа, организация) собирается одной компиляцией
+        typst; группы рендерятся параллельно. Рядом с PDF лежит индекс страниц
+        по заказчикам. Карточки организации в пакеты не входят.
+        """
+        run_id = uuid.uuid4().hex[:12]
+        groups: dict[tuple[str, str, str], BundleResult] = {}
+        for job in jobs:
+            key = (job.doc_type, job.org_type, job.org_slug)
+            if key not in groups:
+                groups[key] = BundleResult(job.doc_type, job.org_slug, job.org_type, [])
+            groups[key].jobs.append(job)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="typst") as pool:
+            futures = [
+                pool.submit(
+                    self._run_bundle,
+                    bundle,
+                    f"{self.output_dir}/{run_id}/{bundle.org_type}/{bundle.org_slug}/{bundle.doc_type}_bundle.pdf",
+                )
+                for bundle in groups.values()
+            ]
+            for future in as_completed(futures):
+                yield future.result()
@@ -0,0 +1,287 @@
+"""Локальный справочник заказчиков в SQLite.
+
+Заказчики загружаются пачкой из выгрузок CSV/JSON и ищутся по одному
+упоминанию: ИНН, slug или названию. Агенту хватает одного вызова
+инструмента вместо опроса реквизитов по полю за ход.
+
+Загрузка и поиск из командной строки (из каталога src):
+    PYTHONPATH=.. python -m src.debug_tools.customer_directory import customers.csv
+    PYTHONPATH=.. python -m src.debug_tools.customer_directory find 0323347497
+"""
+import argparse
+import csv
+import json
+import re
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from sqlalchemy import (
+    Column,
+    Index,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    event,
+    func,
+    insert,
+    select,
+)
+
+from src.exceptions import CustomerDirectoryError
+from src.models import Bank, Customer
+
+# Рядом с чекпоинтами агента, вне дерева исходников: реквизиты заказчиков не попадут в git
+CUSTOMERS_PATH = Path("output/.state/customers.sqlite3")
+
+metadata_obj = MetaData()
+
+customers_table = Table(
+    "customers", metadata_obj,
+    Column("slug", String, primary_key=True),
+    Column("inn", String, nullable=False),
+    Column("kpp", String, nullable=False, default=""),
+    Column("name", String, nullable=False),
+    Column("name_key", String, nullable=False),
+    Column("ogrn", String, nullable=False, default=""),
+    Column("address", String, nullable=False, default=""),
+    Column("signatory", String, nullable=False, default=""),
+    Column("phone", String, nullable=False, default=""),
+    Column("bank", String, nullable=True),
+    # Обособленные подразделения делят ИНН и различаются КПП
+    Index("ix_customers_inn_kpp", "inn", "kpp", unique=True),
+    Index("ix_customers_name_key", "name_key"),
+)
+
+# Заголовки выгрузок 1С/Контура -> поля Customer
+COLUMN_ALIASES = {
+    "наименование": "name",
+    "название": "name",
+    "контрагент": "name",
+    "инн": "inn",
+    "кпп": "kpp",
+    "огрн": "ogrn",
+    "огрнип": "ogrn",
+    "адрес": "address",
+    "юридический адрес": "address",
+    "подписант": "signatory",
+    "руководитель": "signatory",
+    "телефон": "phone",
+    "банк": "bank_name",
+    "бик": "bank_bic",
+    "корр. счёт": "bank_correspondent_account",
+    "корр. счет": "bank_correspondent_account",
+}
+
+_LEGAL_FORMS = {
+    "ооо", "оао", "зао", "пао", "ао", "ип", "мау", "мбу", "мку", "гбу", "гау", "фгбу", "муп", "гуп",
+    "нко", "ано",
+}
+_INN = re.compile(r"\d{10}|\d{12}")
+_NON_WORD = re.compile(r"[^\w]+")
+_MAX_FOUND = 5
+
+
+def normalize_name(name: str) -> str:
+    """Ключ поиска по названию: без регистра, кавычек и организационно-правовой формы"""
+    words = _NON_WORD.sub(" ", name.lower().replace("ё", "е")).split()
+    return " ".join(word for word in words if word not in _LEGAL_FORMS)
+
+
+@dataclass
+class ImportReport:
+    """Итог загрузки: сколько записей сохранено и какие пропущены.
+
+    skipped — (номер записи с 1, причина); у CSV заголовок не считается,
+    так что это не номер строки файла.
+    """
+    imported: int = 0
+    skipped: list[tuple[int, str]] = field(default_factory=list)
+
+
+def _clean(value) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def _customer_from_record(record: dict) -> Customer:
+    """Customer из строки выгрузки; ключи — поля Customer или заголовки из COLUMN_ALIASES.
+
+    Название и реквизиты проверяет сама модель, ошибка — ValidationError.
+    """
+    values = {}
+    for key, value in record.items():
+        if key is None:  # лишние ячейки строки CSV
+            continue
+        key = key.strip()
+        values[COLUMN_ALIASES.get(key.lower(), key)] = value
+
+    bank = values.pop("bank", None)
+    bank_values = {f.name: _clean(values.pop(f"bank_{f.name}", None)) for f in fields(Bank)}
+    if isinstance(bank, dict):
+        bank_values.update({key: _clean(value) for key, value in bank.items()})
+    values = {f.name: _clean(values.get(f.name)) for f in fields(Customer) if f.name != "bank"}
+
+    if not values["slug"]:
+        values["slug"] = f"inn_{values['inn']}" + (f"_{values['kpp']}" if values["kpp"] else "")
+    if bank_values["bic"]:
+        values["bank"] = Bank(**{**bank_values, "inn": bank_values["inn"] or None})
+    return Customer(**values)
+
+
+def read_records(path: str | Path) -> Iterator[dict]:
+    """Записи выгрузки: CSV (разделитель , или ;) или JSON — список либо {"customers": [...]}"""
+    path = Path(path)
+    try:
+        if path.suffix.lower() == ".json":
+            data = json.loads(path.read_text(encoding="utf-8"))
+            records = data.get("customers") if isinstance(data, dict) else data
+            if not isinstance(records, list):
+                raise CustomerDirectoryError(f"{path}: expected list of customers")
+            yield from records
+        elif path.suffix.lower() == ".csv":
+            with open(path, "r", encoding="utf-8-sig", newline="") as csv_file:
+                dialect = csv.Sniffer().sniff(csv_file.read(4096), delimiters=",;\t")
+                csv_file.seek(0)
+                yield from csv.DictReader(csv_file, dialect=dialect)
+        else:
+            raise CustomerDirectoryError(f"{path}: unsupported format, expected .csv or .json")
+    except (OSError, json.JSONDecodeError, csv.Error) as e:
+        raise CustomerDirectoryError(f"Failed read customers {path}") from e
+
+
+class CustomerDirectory:
+    """Справочник заказчиков с индексами по ИНН, slug и нормализованному названию"""
+
+    def __init__(self, path: str | Path = CUSTOMERS_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        event.listen(self.engine, "connect", self._on_connect)
+        metadata_obj.create_all(self.engine)
+
+    @staticmethod
+    def _on_connect(dbapi_connection, _) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    @staticmethod
+    def _row(customer: Customer) -> dict:
+        row = asdict(customer)
+        row["bank"] = json.dumps(row["bank"], ensure_ascii=False) if customer.bank else None
+        row["name_key"] = normalize_name(customer.name)
+        return row
+
+    @staticmethod
+    def _customer(row) -> Customer:
+        values = {f.name: getattr(row, f.name) for f in fields(Customer)}
+        values["bank"] = Bank(**json.loads(row.bank)) if row.bank else None
+        return Customer(**values)
+
+    def add(self, customers: Iterable[Customer]) -> int:
+        """Добавляет или обновляет заказчиков одной транзакцией, возвращает их число.
+
+        Запись с тем же slug или той же парой ИНН/КПП заменяется.
+        """
+        rows = [self._row(customer) for customer in customers]
+        if rows:
+            with self.engine.begin() as conn:
+                conn.execute(insert(customers_table).prefix_with("OR REPLACE"), rows)
+        return len(rows)
+
+    def import_records(self, records: Iterable[dict], batch_size: int = 1000) -> ImportReport:
+        """Загружает записи пачками; записи с неверными реквизитами пропускаются"""
+        report = ImportReport()
+        batch = []
+        for number, record in enumerate(records, start=1):
+            try:
+                if not isinstance(record, dict):
+                    raise ValueError("expected object")
+                batch.append(_customer_from_record(record))
+            except (ValueError, TypeError) as e:
+                report.skipped.append((number, str(e)))
+                continue
+            if len(batch) >= batch_size:
+                report.imported += self.add(batch)
+                batch = []
+        report.imported += self.add(batch)
+        return report
+
+    def import_file(self, path: str | Path) -> ImportReport:
+        """Загружает выгрузку CSV или JSON"""
+        return self.import_records(read_records(path))
+
+    def get(self, slug: str) -> Customer | None:
+        with self.engine.connect() as conn:
+            query = select(customers_table).where(customers_table.c.slug == slug)
+            row = conn.execute(query).first()
+        return self._customer(row) if row else None
+
+    def find(self, query: str, limit: int = _MAX_FOUND) -> list[Customer]:
+        """Заказчики по одному упоминанию.
+
+        ИНН ищется точно, затем slug, затем нормализованное название —
+        сначала полное совпадение, потом по началу названия.
+        """
+        query = query.strip()
+        c = customers_table.c
+        if _INN.fullmatch(query):
+            conditions = [c.inn == query]
+        else:
+            key = normalize_name(query)
+            conditions = [c.slug == query]
+            if key:
+                # Диапазон вместо LIKE, чтобы SQLite шёл по индексу name_key
+                prefix = (c.name_key >= key) & (c.name_key < key + "\uffff")
+                conditions += [c.name_key == key, prefix]
+
+        with self.engine.connect() as conn:
+            for condition in conditions:
+                query = select(customers_table).where(condition)
+                rows = conn.execute(query.order_by(c.name_key, c.slug).limit(limit)).all()
+                if rows:
+                    return [self._customer(row) for row in rows]
+        return []
+
+    def find_customer(self, query: str) -> str:
+        """Ищет заказчика в справочнике по ИНН, slug или названию.
+        Возвращает реквизиты найденных заказчиков в JSON или сообщение, что никого нет."""
+        found = self.find(query)
+        if not found:
+            return f"Заказчик «{query}» в справочнике не найден, уточните реквизиты у пользователя"
+        return json.dumps([asdict(customer) for customer in found], ensure_ascii=False)
+
+    def count(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(customers_table)).scalar_one()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", default=CUSTOMERS_PATH, help="файл справочника SQLite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="загрузить выгрузки CSV/JSON")
+    import_parser.add_argument("files", nargs="+")
+    find_parser = commands.add_parser("find", help="найти заказчика по ИНН, slug или названию")
+    find_parser.add_argument("query")
+    args = parser.parse_args()
+
+    directory = CustomerDirectory(args.db)
+    if args.command == "import":
+        for path in args.files:
+            report = directory.import_file(path)
+            print(f"{path}: загружено {report.imported}, пропущено {len(report.skipped)}")
+            for number, reason in report.skipped[:20]:
+                print(f"  запись {number}: {reason}")
+        print(f"Заказчиков в справочнике: {directory.count()}")
+    else:
+        for customer in directory.find(args.query):
+            kpp = f", КПП {customer.kpp}" if customer.kpp else ""
+            print(f"{customer.slug}: {customer.name}, ИНН {customer.inn}{kpp}")
+
+
+if __name__ == "__main__":
+    main()
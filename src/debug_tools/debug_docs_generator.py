@@ -1,167 +1,362 @@
-import os.path
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-import json
-from dataclasses import asdict
-import subprocess
-import tempfile
-import uuid
-
-from src.models import Bank, Customer, WorkItem, Organization
+from typing import Any
+
+import orjson
+import xxhash
+
+from src.amounts import compute_totals
+from src.debug_tools.org_registry import OrganizationRegistry
+from src.debug_tools.pdf_cache import PdfCache, file_digest, template_files, write_atomic
+from src.debug_tools.progress import (
+    CACHE_HIT,
+    COMPILE_STARTED,
+    JSON_WRITTEN,
+    PDF_READY,
+    VALIDATED,
+    ProgressCallback,
+    emit,
+    progress_listener,
+)
+from src.debug_tools.scheduler import GenerationScheduler
+from src.debug_tools.template_registry import SAMPLE_CUSTOMER, SAMPLE_JOBS, TemplateRegistry
+from src.debug_tools.typst_backend import TYPST_ROOT, create_backend, serialize_inputs
 from src.exceptions import DocsGeneratorError
-from src.utils import check_required_typst_files
+from src.models import Customer, Organization, WorkItem
+from src.telemetry import DOCUMENT, JSON_SERIALIZE, PROFILE_LOAD, TYPST_COMPILE, increment, span
+
+ACT = "act"
+INVOICE = "invoice"
+ORG_CARD = "org_card"
+DOCUMENT_TYPES = (ACT, INVOICE, ORG_CARD)
+
+BUNDLE_TEMPLATE = "typst/common/bundle.typ"
+BUNDLE_SELECTOR = "<bundle-document>"
+
+
+def bundle_index(marks: list[dict], documents: list[tuple[Customer, list[WorkItem]]]) -> list[dict]:
+    """Постраничный индекс пакета по меткам common/bundle.typ.
+
+    Каждый документ начинается с новой страницы, поэтому он заканчивается
+    страницей перед началом следующего; последняя метка (index = none)
+    указывает на последнюю страницу пакета.
+    """
+    marks = sorted(marks, key=lambda mark: mark["page"])
+    index = []
+    for mark, next_mark in zip(marks, marks[1:]):
+        if mark["index"] is None:
+            continue
+        customer, jobs = documents[mark["index"]]
+        last_page = next_mark["page"] if next_mark["index"] is None else next_mark["page"] - 1
+        index.append({
+            "index": mark["index"],
+            "customer": customer.slug,
+            "name": customer.name,
+            "inn": customer.inn,
+            "jobs": len(jobs),
+            "first_page": mark["page"],
+            "last_page": last_page,
+        })
+    return index
+
+
+@dataclass
+class GenerationRuntime:
+    """Общие для процесса бэкенд typst, кэш PDF, планировщик и реестры.
+
+    Бенчмарки подменяют поля на ходу (другой бэкенд, кэш без записи).
+    """
+    backend: Any
+    cache: PdfCache
+    scheduler: GenerationScheduler
+    organizations: OrganizationRegistry
+    templates: TemplateRegistry
+
+
+@lru_cache(maxsize=None)
+def shared_runtime() -> GenerationRuntime:
+    """Один набор на процесс: создаётся при первой генерации, а не при импорте модуля"""
+    return GenerationRuntime(
+        backend=create_backend(),
+        cache=PdfCache(),
+        scheduler=GenerationScheduler(),
+        organizations=OrganizationRegistry(),
+        templates=TemplateRegistry(
+            DOCUMENT_TYPES,
+            check=DebugGenerator.dry_run,
+            fingerprint=DebugGenerator.dry_run_fingerprint,
+        ),
+    )
+
 
 class DebugGenerator:
     @staticmethod
-    def save_req_file(organization: Organization, filename: str, json_data: dict):
+    def load_organization_from_file(org_slug, org_type) -> Organization:
+        return shared_runtime().organizations.get(org_slug, org_type)
 
-        output_dir = Path(__file__).parent.parent / f"typst/{organization.org_type}/{organization.slug}/templates_json"
-        output_dir.mkdir(exist_ok=True)
+    @staticmethod
+    def default_output_path(
+        organization: Organization, doc_type: str, customer: Customer | None = None
+    ) -> str:
+        """Постоянный путь к PDF: output/<org_type>/<slug>/<doc_type>[_<заказчик>].pdf
 
-        path = output_dir / filename
+        Повторный запрос того же документа перезаписывает файл (атомарно, см.
+        write_atomic), а не копит в output/ одинаковые копии.
+        """
+        name = doc_type if customer is None else f"{doc_type}_{customer.slug}"
+        return f"output/{organization.org_type}/{organization.slug}/{name}.pdf"
 
-        with open(path, "w", encoding='utf-8') as f:
-            json.dump(json_data, f, ensure_ascii=False, indent=2)
+    @staticmethod
+    def compile_typst(template: str, payloads: dict[str, Any]) -> bytes:
+        """Компилирует шаблон текущим бэкендом и возвращает PDF.
+
+        payloads передаются в sys.inputs шаблона как JSON-строки, без временных
+        файлов. Если такой же PDF уже собирался из тех же исходников и данных,
+        он берётся из кэша. Компиляция идёт через планировщик: одинаковые
+        одновременные запросы (тот же ключ кэша) делят одну компиляцию, а
+        интерактивные обгоняют пакетные (см. debug_tools.scheduler).
+        """
+        with span(JSON_SERIALIZE):
+            inputs = serialize_inputs(payloads)
+        emit(JSON_WRITTEN, size=sum(len(value) for value in inputs.values()))
+
+        runtime = shared_runtime()
+        key = runtime.cache.key(template, inputs)
+        pdf = runtime.cache.get(key)
+        if pdf is not None:
+            increment("pdf_cache_hits")
+            emit(CACHE_HIT)
+            return pdf
+        increment("pdf_cache_misses")
+
+        def compile_pdf() -> bytes:
+            with span(TYPST_COMPILE, backend=runtime.backend.name, template=template):
+                pdf = runtime.backend.render(template, inputs)
+            runtime.cache.put(key, pdf)
+            return pdf
+
+        emit(COMPILE_STARTED, template=template)
+        return runtime.scheduler.submit(key, compile_pdf).result()
 
-        return str(path)
+    @staticmethod
+    def _prepare(
+        doc_type: str,
+        customer: Customer | None,
+        jobs: list[WorkItem],
+        org_slug: str,
+        org_type: str,
+    ) -> tuple[Organization, str, dict[str, Any]]:
+        """Проверяет запрос и собирает шаблон и данные для него"""
+        if doc_type not in DOCUMENT_TYPES:
+            raise DocsGeneratorError(f"Unknown document type {doc_type}")
+
+        with span(PROFILE_LOAD):
+            organization = DebugGenerator.load_organization_from_file(org_slug, org_type)
+        template = shared_runtime().templates.get(
+            doc_type, organization.slug, organization.org_type
+        )
+
+        json_data = DebugGenerator._document_data(doc_type, organization, customer, jobs)
+        emit(VALIDATED, organization=f"{org_type}/{org_slug}")
+
+        return organization, template, {DebugGenerator._input_name(doc_type): json_data}
 
     @staticmethod
-    def load_organization_from_file(org_slug, org_type):
-        try:
-            path = Path(__file__).parent.parent / "config/org_profiles.json"
-            with open(path, "r", encoding="utf-8") as org_file:
-                data = json.load(org_file)
-
-            requisites = data[org_type][org_slug]
-            return Organization(
-                org_type=requisites["org_type"],
-                slug=requisites["slug"],
-                name=requisites["name"],
-                full_name=requisites["full_name"],
-                address=requisites["address"],
-                inn=requisites["inn"],
-                kpp=requisites.get("kpp"),
-                ogrn=requisites.get("ogrn"),
-                okpo=requisites.get("okpo"),
-                okato=requisites.get("okato"),
-                okogu=requisites.get("okogu"),
-                okved=requisites.get("okved"),
-                account=requisites["account"],
-                signatory=requisites["signatory"],
-                accountant=requisites.get("accountant"),
-                work_phone=requisites["work_phone"],
-                mobile_phone=requisites.get("mobile_phone"),
-                email=requisites["email"],
-                bank=Bank(
-                    name=requisites["bank"]["name"],
-                    bic=requisites["bank"]["bic"],
-                    inn=requisites["bank"]["inn"],
-                    address=requisites["bank"]["address"],
-                    correspondent_account=requisites["bank"]["correspondent_account"]
-                )
-            )
-        except (FileNotFoundError, PermissionError, json.JSONDecodeError, KeyError, TypeError) as e:
-            raise DocsGeneratorError(f"Failed get organization {org_name}") from e
+    def _input_name(doc_type: str) -> str:
+        return "org_data" if doc_type == ORG_CARD else f"{doc_type}_data"
+
+    @staticmethod
+    def dry_run(doc_type: str, org_slug: str, org_type: str, template: str) -> None:
+        """Пробная компиляция шаблона с образцом данных, мимо кэша PDF.
 
+        Вызывается реестром шаблонов один раз на шаблон: битый шаблон или
+        профиль отсеиваются до того, как документ запросит пользователь.
+        """
+        organization = DebugGenerator.load_organization_from_file(org_slug, org_type)
+        json_data = DebugGenerator._document_data(
+            doc_type, organization, SAMPLE_CUSTOMER, SAMPLE_JOBS
+        )
+        inputs = serialize_inputs({DebugGenerator._input_name(doc_type): json_data})
+        backend = shared_runtime().backend
+        with span(TYPST_COMPILE, backend=backend.name, template=template, dry_run=True):
+            backend.render(template, inputs)
 
     @staticmethod
-    def generate_pdf_act(customer: Customer, jobs: list[WorkItem], org_slug: str, org_type: str) -> str:
-        """Генерирует PDF-акт (версия для отладки)"""
+    def dry_run_fingerprint(doc_type: str, org_slug: str, org_type: str, template: str) -> str:
+        """Отпечаток всего, от чего зависит dry_run: исходники шаблона и профиль организации"""
+        h = xxhash.xxh3_128()
+        try:
+            h.update(orjson.dumps(DebugGenerator.load_organization_from_file(org_slug, org_type)))
+        except DocsGeneratorError as e:
+            h.update(str(e).encode())
+        for path in template_files(template):
+            h.update(path.as_posix().encode())
+            h.update(file_digest(path).encode())
+        return h.hexdigest()
 
-        act_json = {
-            "customer": asdict(customer),
-            "jobs": list(map(lambda j: asdict(j), jobs))
+    @staticmethod
+    def _document_data(
+        doc_type: str, organization: Organization, customer: Customer | None, jobs: list[WorkItem]
+    ) -> dict | Organization:
+        """Данные одного документа в том виде, в каком их читает шаблон.
+
+        Итоги, НДС по ставке из профиля организации и сумма прописью считаются
+        здесь (src.amounts) и лежат в totals, шаблону остаётся их вывести.
+        Модели не переводятся в словари: orjson сериализует датаклассы сам
+        (serialize_inputs).
+        """
+        if doc_type == ORG_CARD:
+            return organization
+        return {
+            "customer": customer,
+            "jobs": jobs,
+            "totals": compute_totals(jobs, organization.vat_rate).to_template(),
         }
 
-        organization = DebugGenerator.load_organization_from_file("ip_angarhaeva")
-
-        print(f"[ОТЛАДКА] Создаем act_temp.json с данными:")
-        print(json.dumps(act_json, ensure_ascii=False, indent=2))
+    @staticmethod
+    def render_pdf(
+        doc_type: str,
+        customer: Customer | None,
+        jobs: list[WorkItem],
+        org_slug: str,
+        org_type: str,
+        on_progress: ProgressCallback | None = None,
+    ) -> bytes:
+        """Рендерит документ и возвращает PDF в памяти, ничего не записывая на диск"""
+        with progress_listener(on_progress, doc_type), span(
+            DOCUMENT, doc_type=doc_type, org=f"{org_type}/{org_slug}"
+        ):
+            _, template, payloads = DebugGenerator._prepare(
+                doc_type, customer, jobs, org_slug, org_type
+            )
+            pdf = DebugGenerator.compile_typst(template, payloads)
+            emit(PDF_READY, size=len(pdf))
+            return pdf
 
-        file_name = "act_temp.json"
-        DebugGenerator.save_req_file("act_temp.json", act_json)
+    @staticmethod
+    def render_document(
+        doc_type: str,
+        customer: Customer | None,
+        jobs: list[WorkItem],
+        org_slug: str,
+        org_type: str,
+        output_path: str | None = None,
+        on_progress: ProgressCallback | None = None,
+    ) -> str:
+        """Рендерит документ заданного типа в PDF-файл и возвращает путь к нему.
+
+        on_progress получает события этапов (см. debug_tools.progress); если не
+        передан, события уходят подписчику из окружающего progress_listener.
+        """
+        with progress_listener(on_progress, doc_type), span(
+            DOCUMENT, doc_type=doc_type, org=f"{org_type}/{org_slug}"
+        ):
+            organization, template, payloads = DebugGenerator._prepare(
+                doc_type, customer, jobs, org_slug, org_type
+            )
+            output_path = output_path or DebugGenerator.default_output_path(
+                organization, doc_type, customer
+            )
+            pdf = DebugGenerator.compile_typst(template, payloads)
 
-        print(f"[ОТЛАДКА] Файл act.json сохранен")
+            # Два запроса с одним output_path не оставят недописанный файл
+            write_atomic(output_path, pdf)
+            emit(PDF_READY, output_path=output_path)
+            return output_path
 
-        command = [
-            "typst",
-            "compile",
-            "--root", "./typst",
-            "--font-path", "typst/fonts",
-            "typst/act.typ",
-            "output/act.pdf"
-        ]
-        print(f"[ОТЛАДКА] Выполняем команду: {' '.join(command)}")
+    @staticmethod
+    def render_bundle(
+        doc_type: str,
+        documents: list[tuple[Customer, list[WorkItem]]],
+        org_slug: str,
+        org_type: str,
+        on_progress: ProgressCallback | None = None,
+    ) -> tuple[bytes, list[dict]]:
+        """Рендерит документы нескольких заказчиков одной компиляцией typst.
+
+        Каждый заказчик — отдельный вызов шаблона с новой страницы. Запуск typst,
+        загрузка шрифтов и разбор шаблона делаются один раз на весь пакет.
+        Возвращает общий PDF и индекс страниц по заказчикам (см. bundle_index).
+        """
+        if doc_type == ORG_CARD:
+            raise DocsGeneratorError("Org card does not depend on customers and is not bundled")
+        if not documents:
+            raise DocsGeneratorError("Bundle has no documents")
+
+        with progress_listener(on_progress, doc_type), span(
+            DOCUMENT, doc_type=doc_type, org=f"{org_type}/{org_slug}", documents=len(documents)
+        ):
+            organization, template, _ = DebugGenerator._prepare(
+                doc_type, *documents[0], org_slug, org_type
+            )
+            with span(JSON_SERIALIZE):
+                inputs = serialize_inputs({"bundle_data": [
+                    DebugGenerator._document_data(doc_type, organization, customer, jobs)
+                    for customer, jobs in documents
+                ]})
+            inputs["bundle_template"] = "/" + Path(template).relative_to(TYPST_ROOT).as_posix()
+            emit(JSON_WRITTEN, size=len(inputs["bundle_data"]))
+
+            runtime = shared_runtime()
+
+            def compile_bundle() -> tuple[bytes, list]:
+                backend = runtime.backend
+                with span(TYPST_COMPILE, backend=backend.name, template=BUNDLE_TEMPLATE):
+                    return backend.render_and_query(BUNDLE_TEMPLATE, inputs, BUNDLE_SELECTOR)
+
+            emit(COMPILE_STARTED, template=template)
+            # Пакеты не кэшируются, поэтому и не склеиваются: ключ None
+            pdf, marks = runtime.scheduler.submit(None, compile_bundle).result()
+            emit(PDF_READY, size=len(pdf))
+            return pdf, bundle_index(marks, documents)
 
-        result = subprocess.run(command, capture_output=True, text=True)
+    @staticmethod
+    def render_bundle_document(
+        doc_type: str,
+        documents: list[tuple[Customer, list[WorkItem]]],
+        org_slug: str,
+        org_type: str,
+        output_path: str | None = None,
+        on_progress: ProgressCallback | None = None,
+    ) -> str:
+        """Рендерит пакет в один PDF и кладёт рядом индекс страниц <имя>.json"""
+        pdf, index = DebugGenerator.render_bundle(
+            doc_type, documents, org_slug, org_type, on_progress
+        )
+        if output_path is None:
+            organization = DebugGenerator.load_organization_from_file(org_slug, org_type)
+            output_path = DebugGenerator.default_output_path(organization, f"{doc_type}_bundle")
+
+        write_atomic(output_path, pdf)
+        index_json = orjson.dumps(index, option=orjson.OPT_INDENT_2)
+        write_atomic(Path(output_path).with_suffix(".json"), index_json)
+        return output_path
 
-        print(f"[ОТЛАДКА] Возвращенный код: {result.returncode}")
-        print(f"[ОТЛАДКА] Stdout: {result.stdout}")
-        print(f"[ОТЛАДКА] Stderr: {result.stderr}")
+    @staticmethod
+    def generate_pdf_act(
+        customer: Customer, jobs: list[WorkItem], org_slug: str, org_type: str
+    ) -> str:
+        """Генерирует PDF-акт (версия для отладки)"""
 
-        if result.returncode != 0:
-            raise subprocess.CalledProcessError(result.returncode, command, result.stdout, result.stderr)
+        print(f"[ОТЛАДКА] Создаем акт для {customer.name}, работ: {len(jobs)}")
 
-        return "✅ PDF акт успешно создан: typst/act.pdf"
+        output_path = DebugGenerator.render_document(ACT, customer, jobs, org_slug, org_type)
+        return f"✅ PDF акт успешно создан: {output_path}"
 
     @staticmethod
     def generate_pdf_org_card(org_slug, org_type) -> str:
         """Генерирует PDF-карточку организации (версия для отладки)"""
 
         organization = DebugGenerator.load_organization_from_file(org_slug, org_type)
-        base_dir = f"typst/{organization.org_type}/{organization.slug}"
-        check_required_typst_files(base_dir)
-
-        temp_json_name = f"org_{uuid.uuid4().hex}.json"
-        temp_json_path = Path(base_dir) / temp_json_name
-
-        with open(temp_json_path, "w", encoding="utf-8") as temp_file:
-            json.dump(asdict(organization), temp_file, ensure_ascii=False, indent=2)
-
-        try:
-            output_dir = Path(f"output/{organization.org_type}/{organization.slug}")
-            output_dir.mkdir(parents=True, exist_ok=True)
-
-            command = [
-                "typst",
-                "compile",
-                "--root", "./typst",
-                "--font-path", "typst/fonts",
-                "--input", f"org_data={temp_json_name}",
-                f"{base_dir}/org_card.typ",
-                f"{output_dir}/org_card.pdf"
-            ]
-
-            result = subprocess.run(command, capture_output=True, text=True)
-            print(result.stdout)
-            print()
-            print(result.stderr)
-            if result.returncode != 0:
-                raise subprocess.CalledProcessError(result.returncode, command, result.stdout, result.stderr)
-
-            return f"✅ PDF карточка организации {organization.name} создана: {output_dir}/org_card.pdf"
-        finally:
-            if os.path.exists(temp_json_path):
-                os.unlink(temp_json_path)
-
+        output_path = DebugGenerator.render_document(ORG_CARD, None, [], org_slug, org_type)
+        return f"✅ PDF карточка организации {organization.name} создана: {output_path}"
 
     @staticmethod
-    def generate_pdf_invoice(customer: Customer, jobs: list[WorkItem]) -> str:
+    def generate_pdf_invoice(
+        customer: Customer, jobs: list[WorkItem], org_slug: str, org_type: str
+    ) -> str:
         """Генерирует PDF-счёт (версия для отладки)"""
 
-        invoice_json = {
-            "customer": asdict(customer),
-            "jobs": list(map(lambda j: asdict(j), jobs))
-        }
-
-        DebugGenerator.save_req_file("invoice_temp.json", invoice_json)
-
-        command = [
-            "typst",
-            "compile",
-            "--root", "./typst",
-            "--font-path", "typst/fonts",
-            "typst/invoice.typ",
-            f"output/invoice.pdf"
-        ]
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
-        return "✅ PDF счёт успешно создан: typst/invoice.pdf"
\ No newline at end of file
+        output_path = DebugGenerator.render_document(INVOICE, customer, jobs, org_slug, org_type)
+        return f"✅ PDF счёт успешно создан: {output_path}"
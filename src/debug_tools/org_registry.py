@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+import types
+from dataclasses import fields
+from pathlib import Path
+from typing import Union, get_args, get_origin
+
+from src.exceptions import DocsGeneratorError, ValidationError
+from src.models import Bank, Organization
+
+ORG_PROFILES_PATH = Path(__file__).parent.parent / "config/org_profiles.json"
+
+
+def _is_optional(annotation) -> bool:
+    return get_origin(annotation) in (Union, types.UnionType) and type(None) in get_args(annotation)
+
+
+def _build(cls, data: dict, where: str):
+    """Собирает frozen-датакласс из словаря, сверяя ключи с его полями"""
+    if not isinstance(data, dict):
+        raise DocsGeneratorError(f"{where}: expected object, got {type(data).__name__}")
+
+    known = {f.name for f in fields(cls)}
+    unknown = set(data) - known
+    if unknown:
+        raise DocsGeneratorError(f"{where}: unknown fields {', '.join(sorted(unknown))}")
+
+    kwargs = {}
+    for f in fields(cls):
+        value = data.get(f.name)
+        if value is None and not _is_optional(f.type):
+            raise DocsGeneratorError(f"{where}: missing required field {f.name}")
+        if f.type is Bank:
+            value = _build(Bank, value, f"{where}.bank")
+        kwargs[f.name] = value
+    try:
+        return cls(**kwargs)
+    except ValidationError as e:
+        raise DocsGeneratorError(f"{where}: {e}") from None
+
+
+class OrganizationRegistry:
+    """Профили организаций из config/org_profiles.json, загруженные в память.
+
+    Все профили разбираются и проверяются один раз, дальше поиск по
+    (org_type, slug) — обращение к словарю. Файл перечитывается, только
+    если изменился его mtime; stat делается не чаще раза в check_interval секунд.
+    """
+
+    def __init__(self, path: str | Path = ORG_PROFILES_PATH, check_interval: float = 1.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._profiles: dict[tuple[str, str], Organization] = {}
+        self._mtime_ns: int | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[tuple[str, str], Organization]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as org_file:
+                data = json.load(org_file)
+        except (FileNotFoundError, PermissionError, json.JSONDecodeError) as e:
+            raise DocsGeneratorError(f"Failed load organization profiles {self.path}") from e
+
+        if not isinstance(data, dict):
+            raise DocsGeneratorError(f"{self.path}: expected object of org types")
+
+        profiles = {}
+        for org_type, orgs in data.items():
+            if not isinstance(orgs, dict):
+                raise DocsGeneratorError(
+                    f"{self.path}: {org_type}: expected object of organizations"
+                )
+            for org_slug, requisites in orgs.items():
+                organization = _build(Organization, requisites, f"{org_type}/{org_slug}")
+                if (organization.org_type, organization.slug) != (org_type, org_slug):
+                    declared = f"{organization.org_type}/{organization.slug}"
+                    raise DocsGeneratorError(f"{org_type}/{org_slug}: profile declares {declared}")
+                profiles[(org_type, org_slug)] = organization
+        return profiles
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self._mtime_ns is not None and now - self._checked_at < self.check_interval:
+            return
+
+        with self._lock:
+            if self._mtime_ns is not None and now - self._checked_at < self.check_interval:
+                return
+            try:
+                mtime_ns = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                raise DocsGeneratorError(f"Failed load organization profiles {self.path}") from e
+
+            if mtime_ns != self._mtime_ns:
+                self._profiles = self._load()
+                self._mtime_ns = mtime_ns
+            self._checked_at = now
+
+    def get(self, org_slug: str, org_type: str) -> Organization:
+        """Возвращает профиль организации"""
+        self._refresh()
+        try:
+            return self._profiles[(org_type, org_slug)]
+        except KeyError:
+            raise DocsGeneratorError(f"Failed get organization {org_type}/{org_slug}") from None
+
+    def all(self) -> list[Organization]:
+        self._refresh()
+        return list(self._profiles.values())
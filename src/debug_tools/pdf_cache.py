@@ -0,0 +1,216 @@
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+
+import xxhash
+
+from src.debug_tools.typst_backend import FONT_PATH, TYPST_ROOT
+
+# Импорты с путём-литералом; вычисляемые пути (как в common/bundle.typ) не отслеживаются
+_TYPST_IMPORT = re.compile(r'#(?:import|include)\s+"([^"]+\.typ)"')
+
+# Путь -> ((путь, mtime_ns, размер), хэш содержимого или импорты): неизменённые файлы не
+# перечитываются, а новая версия файла вытесняет запись о старой, так что записей не
+# больше, чем файлов шаблонов
+_file_digests: dict[str, tuple[tuple[str, int, int], str]] = {}
+_file_imports: dict[str, tuple[tuple[str, int, int], list[Path]]] = {}
+
+# Отпечаток шрифтов пересчитывается, если изменился каталог шрифтов (добавили, удалили или
+# переименовали файл), и не реже раза в FONTS_RECHECK секунд — на случай замены файла на месте
+FONTS_RECHECK = 60.0
+# (mtime_ns каталога, время расчёта, отпечаток)
+_fonts_digest: tuple[int, float, str] | None = None
+
+
+def write_atomic(path: str | Path, data: bytes) -> None:
+    """Пишет файл через временный рядом и os.replace.
+
+    Читатель видит старый или новый файл целиком.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    try:
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def _stamp(path: Path) -> tuple[str, int, int]:
+    stat = path.stat()
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+def file_digest(path: Path) -> str:
+    """xxh3-хэш содержимого файла, запомненный по mtime и размеру"""
+    stamp = _stamp(path)
+    cached = _file_digests.get(stamp[0])
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    digest = xxhash.xxh3_128_hexdigest(path.read_bytes())
+    _file_digests[stamp[0]] = (stamp, digest)
+    return digest
+
+
+def _imports(path: Path) -> list[Path]:
+    stamp = _stamp(path)
+    cached = _file_imports.get(stamp[0])
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    imports = []
+    for target in _TYPST_IMPORT.findall(path.read_text(encoding="utf-8")):
+        # "/..." — от корня проекта typst (общие модули в /common), иначе относительно файла
+        base = Path(TYPST_ROOT) if target.startswith("/") else path.parent
+        imports.append(Path(os.path.normpath(base / target.lstrip("/"))))
+    _file_imports[stamp[0]] = (stamp, imports)
+    return imports
+
+
+def template_files(template: str) -> list[Path]:
+    """Шаблон и все .typ, которые он импортирует или включает, транзитивно.
+
+    Правка act.typ не трогает счета, а правка общего common/ru-numbers.typ —
+    все документы всех организаций, что его импортируют.
+    """
+    found: dict[Path, None] = {}
+    pending = [Path(template)]
+    while pending:
+        path = pending.pop()
+        if path in found or not path.is_file():
+            continue
+        found[path] = None
+        pending.extend(_imports(path))
+    return sorted(found)
+
+
+def fonts_digest() -> str:
+    """Отпечаток шрифтов: они тяжёлые, поэтому достаточно имени, размера и времени изменения.
+
+    Каталог обходится заново, только если изменилось его mtime или прошло
+    FONTS_RECHECK секунд; иначе это один stat на ключ кэша.
+    """
+    global _fonts_digest
+    fonts_dir = Path(FONT_PATH)
+    try:
+        dir_mtime = fonts_dir.stat().st_mtime_ns
+    except FileNotFoundError:
+        dir_mtime = 0
+    now = time.monotonic()
+    cached = _fonts_digest
+    if cached is not None and cached[0] == dir_mtime and now - cached[1] < FONTS_RECHECK:
+        return cached[2]
+
+    h = xxhash.xxh3_128()
+    if fonts_dir.is_dir():
+        for path in sorted(p for p in fonts_dir.rglob("*") if p.is_file()):
+            stat = path.stat()
+            h.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    digest = h.hexdigest()
+    _fonts_digest = (dir_mtime, now, digest)
+    return digest
+
+
+class PdfCache:
+    """Дисковый кэш PDF, адресуемый хэшем исходников шаблона и входных данных.
+
+    В ключ входят шаблон и импортируемые им .typ (общий common/ru-numbers.typ),
+    список шрифтов и канонический JSON. Правка шаблона одной организации меняет
+    ключи только её документов, старые записи уходят при вытеснении.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "output/.cache/pdf",
+        max_bytes: int = 512 * 1024 * 1024,
+        max_age: float = 30 * 24 * 3600,
+        evict_every: int = 32,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    def _sources_hash(self, template: str) -> str:
+        h = xxhash.xxh3_128()
+        template_path = Path(template)
+        h.update(template_path.name.encode())
+        for path in template_files(template):
+            h.update(path.name.encode())
+            h.update(file_digest(path).encode())
+        h.update(fonts_digest().encode())
+        return h.hexdigest()
+
+    def key(self, template: str, inputs: dict[str, str]) -> str:
+        """Ключ кэша для компиляции шаблона с заданными sys.inputs (канонический JSON)"""
+        h = xxhash.xxh3_128()
+        h.update(self._sources_hash(template).encode())
+        for name in sorted(inputs):
+            h.update(name.encode("utf-8") + b"\0" + inputs[name].encode("utf-8") + b"\0")
+        # Шаблоны печатают дату формирования, поэтому запись живёт в пределах дня
+        h.update(date.today().isoformat().encode())
+        return h.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pdf"
+
+    def get(self, key: str) -> bytes | None:
+        """Возвращает PDF из кэша или None при промахе"""
+        entry = self._entry_path(key)
+        try:
+            pdf = entry.read_bytes()
+            os.utime(entry)  # время доступа для вытеснения давно не используемых
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return pdf
+
+    def put(self, key: str, pdf: bytes) -> None:
+        """Сохраняет готовый PDF в кэш"""
+        write_atomic(self._entry_path(key), pdf)
+
+        with self._lock:
+            self._puts += 1
+            evict = self._puts % self.evict_every == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Удаляет устаревшие записи и самые давние сверх лимита размера"""
+        if not self.cache_dir.is_dir():
+            return 0
+
+        now = time.time()
+        entries = []
+        removed = 0
+        for path in self.cache_dir.glob("*/*.pdf"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,61 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+VALIDATED = "validated"
+JSON_WRITTEN = "json_written"
+COMPILE_STARTED = "compile_started"
+CACHE_HIT = "cache_hit"
+PDF_READY = "pdf_ready"
+
+STAGE_TITLES = {
+    VALIDATED: "данные проверены",
+    JSON_WRITTEN: "JSON сформирован",
+    COMPILE_STARTED: "компиляция typst запущена",
+    CACHE_HIT: "PDF взят из кэша",
+    PDF_READY: "PDF готов",
+}
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    """Этап генерации документа"""
+    stage: str
+    doc_type: str | None = None
+    detail: dict = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def title(self) -> str:
+        return STAGE_TITLES.get(self.stage, self.stage)
+
+
+ProgressCallback = Callable[[ProgressEvent], None]
+
+_listener: ContextVar[ProgressCallback | None] = ContextVar("progress_listener", default=None)
+_doc_type: ContextVar[str | None] = ContextVar("progress_doc_type", default=None)
+
+
+@contextmanager
+def progress_listener(
+    callback: ProgressCallback | None, doc_type: str | None = None
+) -> Iterator[None]:
+    """Подписывает callback на события генерации внутри блока with"""
+    listener_token = _listener.set(callback) if callback is not None else None
+    doc_type_token = _doc_type.set(doc_type) if doc_type is not None else None
+    try:
+        yield
+    finally:
+        if doc_type_token is not None:
+            _doc_type.reset(doc_type_token)
+        if listener_token is not None:
+            _listener.reset(listener_token)
+
+
+def emit(stage: str, **detail) -> None:
+    """Сообщает о достижении этапа текущему подписчику, если он есть"""
+    callback = _listener.get()
+    if callback is not None:
+        callback(ProgressEvent(stage, _doc_type.get(), detail))
@@ -0,0 +1,306 @@
+"""Инкрементальная пересборка документов по манифесту зависимостей.
+
+Для каждого собранного PDF манифест хранит отпечатки всего, из чего он
+собран: шаблона и импортируемых им файлов (ru-numbers.typ и т.п.), шрифтов,
+профиля организации и данных документа (заказчик, работы, итоги). При
+повторном запуске пересобираются только документы, у которых что-то из
+этого изменилось или пропал сам PDF; остальные пропускаются с отчётом.
+
+Пересборка из командной строки (из каталога src):
+    PYTHONPATH=.. python -m src.debug_tools.rebuild jobs.json
+    PYTHONPATH=.. python -m src.debug_tools.rebuild jobs.json --dry-run
+
+jobs.json — список заданий вида {"doc_type", "customer", "jobs", "org_slug",
+"org_type", "output_path"}; поля как у DocumentJob, заказчик и работы — как
+у Customer и WorkItem.
+"""
+import argparse
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+import orjson
+import xxhash
+
+from src.debug_tools.batch import BatchGenerator, DocumentJob, DocumentResult
+from src.debug_tools.debug_docs_generator import ORG_CARD, DebugGenerator
+from src.debug_tools.pdf_cache import file_digest, fonts_digest, template_files, write_atomic
+from src.debug_tools.progress import ProgressCallback
+from src.debug_tools.typst_backend import serialize_inputs
+from src.exceptions import DocsGeneratorError
+from src.models import Bank, Customer, WorkItem
+from src.telemetry import increment
+
+MANIFEST_VERSION = 1
+FONTS = "fonts"
+ORGANIZATION = "organization"
+DATA = "data"
+OUTPUT = "output"
+
+DEPENDENCY_TITLES = {FONTS: "шрифты", ORGANIZATION: "профиль организации", DATA: "данные документа"}
+
+
+def _digest(data: bytes | str) -> str:
+    return xxhash.xxh3_128_hexdigest(data)
+
+
+def dependencies(job: DocumentJob) -> dict[str, str]:
+    """Отпечатки всех входов документа: файлы шаблона, шрифты, профиль организации и данные.
+
+    Дата формирования в отпечаток не входит: иначе каждый новый день
+    пересобирал бы весь месяц заново.
+    """
+    organization, template, payloads = DebugGenerator._prepare(
+        job.doc_type, job.customer, job.jobs, job.org_slug, job.org_type
+    )
+    inputs = serialize_inputs(payloads)
+    deps = {f"template:{path.as_posix()}": file_digest(path) for path in template_files(template)}
+    deps[FONTS] = fonts_digest()
+    deps[ORGANIZATION] = _digest(orjson.dumps(organization))
+    deps[DATA] = _digest(b"\0".join(f"{name}={inputs[name]}".encode() for name in sorted(inputs)))
+    return deps
+
+
+def _output_stamp(path: str) -> str | None:
+    """Размер и mtime готового PDF: ловит удалённые и перезаписанные вручную файлы"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def stale_reasons(
+    recorded: dict[str, str] | None, deps: dict[str, str], output_path: str
+) -> list[str]:
+    """Почему документ нужно пересобрать; пустой список — PDF актуален"""
+    if recorded is None:
+        return ["нет в манифесте"]
+    stamp = _output_stamp(output_path)
+    if stamp is None:
+        return ["нет PDF"]
+
+    reasons = []
+    for name in sorted((deps.keys() | recorded.keys()) - {OUTPUT}):
+        if recorded.get(name) != deps.get(name):
+            title = DEPENDENCY_TITLES.get(name) or name.removeprefix("template:")
+            reasons.append(f"изменено: {title}")
+    if recorded.get(OUTPUT) != stamp:
+        reasons.append("PDF изменён вне сборки")
+    return reasons
+
+
+class BuildManifest:
+    """Манифест сборки: путь к PDF -> отпечатки его входов (см. dependencies).
+
+    Лежит JSON-файлом рядом с результатами и сохраняется атомарно: прерванная
+    сборка оставляет прежний манифест, а не обрезанный.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.entries: dict[str, dict[str, str]] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        try:
+            data = orjson.loads(self.path.read_bytes())
+        except FileNotFoundError:
+            return
+        except orjson.JSONDecodeError as e:
+            raise DocsGeneratorError(f"Broken build manifest {self.path}") from e
+        # Манифест другого формата — как пустой: всё пересоберётся
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            self.entries = data.get("outputs", {})
+
+    def save(self) -> None:
+        with self._lock:
+            data = {"version": MANIFEST_VERSION, "outputs": self.entries}
+            option = orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+            write_atomic(self.path, orjson.dumps(data, option=option))
+
+    def get(self, output_path: str) -> dict[str, str] | None:
+        with self._lock:
+            return self.entries.get(output_path)
+
+    def record(self, output_path: str, deps: dict[str, str]) -> None:
+        with self._lock:
+            self.entries[output_path] = {**deps, OUTPUT: _output_stamp(output_path)}
+
+    def forget(self, output_path: str) -> None:
+        with self._lock:
+            self.entries.pop(output_path, None)
+
+
+@dataclass
+class RebuildReport:
+    """Итог пересборки: собранные документы, пути пропущенных как актуальные и ошибки"""
+    built: list[DocumentResult] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    failed: list[DocumentResult] = field(default_factory=list)
+    # путь к PDF -> причины пересборки
+    reasons: dict[str, list[str]] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+class IncrementalBuilder:
+    """Пересобирает только устаревшие документы, параллельно, через BatchGenerator.
+
+    Пути к PDF должны быть стабильны между запусками, поэтому вместо
+    run_id батча используется <output_dir>/<org_type>/<slug>/<doc_type>_<заказчик>.pdf
+    (или output_path задания); повторы в одном запуске получают суффикс _2, _3...
+    """
+
+    def __init__(
+        self,
+        output_dir: str = "output/build",
+        manifest_path: str | None = None,
+        max_workers: int | None = None,
+        on_progress: ProgressCallback | None = None,
+    ):
+        self.output_dir = output_dir
+        self.manifest = BuildManifest(manifest_path or f"{output_dir}/manifest.json")
+        self.batch = BatchGenerator(
+            max_workers=max_workers, output_dir=output_dir, on_progress=on_progress
+        )
+
+    def _output_paths(self, jobs: list[DocumentJob]) -> list[str]:
+        paths = []
+        seen: dict[str, int] = {}
+        for job in jobs:
+            path = job.output_path
+            if path is None:
+                by_customer = job.customer is not None and job.doc_type != ORG_CARD
+                name = job.customer.slug if by_customer else job.org_slug
+                path = f"{self.output_dir}/{job.org_type}/{job.org_slug}/{job.doc_type}_{name}.pdf"
+            seen[path] = seen.get(path, 0) + 1
+            if seen[path] > 1:
+                path = path.removesuffix(".pdf") + f"_{seen[path]}.pdf"
+            paths.append(path)
+        return paths
+
+    def rebuild(
+        self, jobs: Iterable[DocumentJob], force: bool = False, dry_run: bool = False
+    ) -> RebuildReport:
+        """Сверяет задания с манифестом и собирает устаревшие.
+
+        dry_run только считает, что собирать.
+        """
+        started = time.perf_counter()
+        jobs = list(jobs)
+        report = RebuildReport()
+
+        stale: list[tuple[DocumentJob, str, dict[str, str]]] = []
+        for job, output_path in zip(jobs, self._output_paths(jobs)):
+            try:
+                deps = dependencies(job)
+            except Exception as e:
+                report.failed.append(DocumentResult(job, error=e))
+                continue
+            if force:
+                reasons = ["принудительно"]
+            else:
+                reasons = stale_reasons(self.manifest.get(output_path), deps, output_path)
+            if reasons:
+                report.reasons[output_path] = reasons
+                stale.append((job, output_path, deps))
+            else:
+                report.skipped.append(output_path)
+        increment("rebuild_skipped", len(report.skipped))
+
+        if dry_run or not stale:
+            report.elapsed = time.perf_counter() - started
+            return report
+
+        deps_by_path = {output_path: deps for _, output_path, deps in stale}
+        targets = [(job, output_path) for job, output_path, _ in stale]
+        for output_path, result in self.batch.generate_to(targets):
+            if result.ok:
+                self.manifest.record(output_path, deps_by_path[output_path])
+                report.built.append(result)
+            else:
+                self.manifest.forget(output_path)
+                report.failed.append(result)
+        self.manifest.save()
+        increment("rebuild_built", len(report.built))
+
+        report.elapsed = time.perf_counter() - started
+        return report
+
+
+def read_jobs(path: str | Path) -> list[DocumentJob]:
+    """Задания из JSON-файла: список объектов с полями DocumentJob"""
+    data = orjson.loads(Path(path).read_bytes())
+    if not isinstance(data, list):
+        raise DocsGeneratorError(f"{path}: expected list of jobs")
+
+    jobs = []
+    for number, item in enumerate(data, 1):
+        try:
+            customer = item.get("customer")
+            if customer is not None:
+                bank = customer.get("bank")
+                customer = Customer(**{**customer, "bank": Bank(**bank) if bank else None})
+            jobs.append(DocumentJob(
+                doc_type=item["doc_type"],
+                customer=customer,
+                jobs=[WorkItem(**work) for work in item.get("jobs", [])],
+                **{
+                    key: item[key]
+                    for key in ("org_slug", "org_type", "output_path")
+                    if key in item
+                },
+            ))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise DocsGeneratorError(f"{path}: job {number}: {e}") from e
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("jobs", help="JSON со списком заданий")
+    parser.add_argument("--output-dir", default="output/build")
+    parser.add_argument("--manifest", default=None, help="по умолчанию <output-dir>/manifest.json")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="пересобрать всё")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="только показать, что будет пересобрано")
+    parser.add_argument("--verbose", "-v", action="store_true",
+                        help="перечислить пропущенные документы")
+    args = parser.parse_args()
+
+    builder = IncrementalBuilder(args.output_dir, args.manifest, args.workers)
+    report = builder.rebuild(read_jobs(args.jobs), force=args.force, dry_run=args.dry_run)
+
+    if args.dry_run:
+        for output_path, reasons in sorted(report.reasons.items()):
+            print(f"к сборке: {output_path} ({'; '.join(reasons)})")
+    for result in sorted(report.built, key=lambda result: result.output_path):
+        print(f"собран: {result.output_path} ({'; '.join(report.reasons[result.output_path])})")
+    if args.verbose:
+        for output_path in sorted(report.skipped):
+            print(f"пропущен: {output_path}")
+    for result in report.failed:
+        job = result.job
+        print(f"ошибка: {job.doc_type} {job.org_type}/{job.org_slug}: {result.error}")
+
+    planned = len(report.reasons) if args.dry_run else len(report.built)
+    print(
+        f"{'К сборке' if args.dry_run else 'Собрано'}: {planned}, "
+        f"пропущено как актуальные: {len(report.skipped)}, "
+        f"ошибок: {len(report.failed)}, {report.elapsed:.2f} с"
+    )
+    raise SystemExit(0 if report.ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import contextvars
+import functools
+import heapq
+import itertools
+import os
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, TypeVar
+
+from src.telemetry import increment
+
+T = TypeVar("T")
+
+# Меньше — раньше: документ, которого ждёт человек, обгоняет пакетную генерацию
+INTERACTIVE = 0
+BATCH = 10
+
+_priority: ContextVar[int] = ContextVar("generation_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def generation_priority(priority: int) -> Iterator[None]:
+    """Приоритет компиляций typst, запущенных внутри блока (BatchGenerator ставит BATCH)"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+class GenerationScheduler:
+    """Очередь компиляций typst с приоритетами и склейкой одинаковых запросов.
+
+    Одновременно работает не больше max_workers компиляций. Запросы с тем же
+    ключом (ключ кэша PDF), пока первый ещё в очереди или компилируется,
+    получают его Future: одна компиляция и один результат на всех. Очередь
+    упорядочена по приоритету, а при max_workers > 1 один воркер берёт только
+    интерактивные запросы, так что месячный пакет не задерживает CLI.
+    """
+
+    def __init__(self, max_workers: int | None = None, reserve_interactive: bool = True):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.reserve_interactive = reserve_interactive and self.max_workers > 1
+        # (приоритет, номер, ключ, функция, Future)
+        self._heap: list[tuple[int, int, str | None, Callable, Future]] = []
+        self._in_flight: dict[str, tuple[int, Future]] = {}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._started = False
+
+    def _start(self) -> None:
+        for index in range(self.max_workers):
+            reserved = self.reserve_interactive and index == 0
+            threading.Thread(
+                target=self._work, args=(reserved,), name=f"typst-scheduler-{index}", daemon=True
+            ).start()
+        self._started = True
+
+    def submit(
+        self, key: str | None, func: Callable[[], T], priority: int | None = None
+    ) -> "Future[T]":
+        """Ставит компиляцию в очередь; None вместо ключа — без склейки.
+
+        func выполняется в контексте вызывающего (телеметрия, прогресс).
+        """
+        priority = current_priority() if priority is None else priority
+        context = contextvars.copy_context()
+        with self._condition:
+            if not self._started:
+                self._start()
+            entry = self._in_flight.get(key) if key is not None else None
+            if entry is not None and not entry[1].cancelled():
+                queued_priority, future = entry
+                increment("generation_deduplicated")
+                if priority < queued_priority and not future.running():
+                    # Ждущий срочнее: та же задача встаёт в очередь ещё раз с его приоритетом
+                    self._in_flight[key] = (priority, future)
+                    self._push(priority, key, func, future, context)
+                return future
+
+            future: Future = Future()
+            if key is not None:
+                self._in_flight[key] = (priority, future)
+            self._push(priority, key, func, future, context)
+            return future
+
+    def _push(
+        self, priority: int, key: str | None, func: Callable, future: Future, context
+    ) -> None:
+        task = functools.partial(context.run, func)
+        heapq.heappush(self._heap, (priority, next(self._counter), key, task, future))
+        self._condition.notify_all()
+
+    def _take(self, reserved: bool):
+        """Следующая задача для воркера; None — подходящих нет"""
+        while self._heap:
+            priority, _, key, func, future = self._heap[0]
+            if future.running() or future.done():  # дубль, поднятый в приоритете, уже взят
+                heapq.heappop(self._heap)
+                continue
+            if reserved and priority > INTERACTIVE:
+                return None
+            heapq.heappop(self._heap)
+            future.set_running_or_notify_cancel()
+            return key, func, future
+        return None
+
+    def _work(self, reserved: bool) -> None:
+        while True:
+            with self._condition:
+                task = self._take(reserved)
+                while task is None:
+                    self._condition.wait()
+                    task = self._take(reserved)
+            key, func, future = task
+            try:
+                future.set_result(func())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                if key is not None:
+                    with self._condition:
+                        if self._in_flight.get(key, (None, None))[1] is future:
+                            del self._in_flight[key]
+
+    @property
+    def depth(self) -> int:
+        """Сколько компиляций ждёт в очереди; поднятый в приоритете дубль считается один раз"""
+        with self._condition:
+            return len({
+                id(future)
+                for *_, future in self._heap
+                if not (future.running() or future.done())
+            })
@@ -0,0 +1,201 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable
+
+from src.debug_tools.typst_backend import INPUTS_DIR, TYPST_ROOT
+from src.exceptions import DocsGeneratorError
+from src.models import Bank, Customer, WorkItem
+
+# Каталоги корня typst, которые не являются <org_type>: общие модули, шрифты
+# и временные данные CLI-бэкенда
+SHARED_DIRS = ("common", "fonts", INPUTS_DIR)
+
+# Образец данных для пробной компиляции: все поля заполнены, чтобы шаблон
+# прошёл по всем веткам, которые видит настоящий документ
+SAMPLE_CUSTOMER = Customer(
+    name='МАУ "СС"',
+    slug="mau_ss",
+    inn="0323347497",
+    ogrn="1030300123457",
+    kpp="032301001",
+    address="670031, Бурятия Респ, Улан-Удэ г, Широких-Полянского ул, дом № 50",
+    signatory="Иванов И.И.",
+    phone="8-983-458-24-95",
+    bank=Bank(
+        name="ПАО Сбербанк",
+        bic="044525225",
+        inn="7707083893",
+        address="117997, г. Москва, ул. Вавилова, д. 19",
+        correspondent_account="30101810400000000225",
+    ),
+)
+SAMPLE_JOBS = [
+    WorkItem(
+        'Техническое обслуживание ККТ и оборудования на 1 месяц. Пакет "СЕРВИС Lite"', 600, 10
+    ),
+    WorkItem("Замена фискального накопителя", 12500),
+]
+
+# (вид документа, slug, org_type, путь к шаблону) -> None или исключение
+TemplateCheck = Callable[[str, str, str, str], None]
+# (вид документа, slug, org_type, путь к шаблону) -> отпечаток всего, от чего зависит проверка
+TemplateFingerprint = Callable[[str, str, str, str], str]
+
+
+@dataclass
+class TemplateSet:
+    """Шаблоны одной организации: пригодные по виду документа и причины непригодных.
+
+    У не прошедших проверку запомнен путь (paths) и отпечаток на момент проверки.
+    """
+    org_type: str
+    slug: str
+    templates: dict[str, str] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
+    paths: dict[str, str] = field(default_factory=dict)
+    fingerprints: dict[str, str] = field(default_factory=dict)
+    validated: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class TemplateRegistry:
+    """Наборы шаблонов typst/<org_type>/<slug>/, найденные и проверенные один раз.
+
+    Каталоги обходятся при первом обращении, каждый шаблон пробно компилируется
+    с образцом данных (check) при первом запросе к организации или сразу для
+    всех в validate_all при старте сервиса. Дальше путь к шаблону — обращение
+    к словарю, а битый шаблон отклоняется без компиляции. Общие модули
+    (ru-numbers.typ) лежат в typst/common и импортируются как "/common/...".
+
+    Отметка о битом шаблоне привязана к отпечатку (fingerprint) его исходников
+    и профиля организации: если они изменились, шаблон проверяется заново при
+    следующем запросе. Новые и удалённые файлы шаблонов видит только reload().
+    """
+
+    def __init__(
+        self,
+        doc_types: Iterable[str],
+        check: TemplateCheck,
+        root: str = TYPST_ROOT,
+        fingerprint: TemplateFingerprint | None = None,
+    ):
+        self.doc_types = tuple(doc_types)
+        self.check = check
+        self.fingerprint = fingerprint
+        self.root = Path(root)
+        self._sets: dict[tuple[str, str], TemplateSet] | None = None
+        self._lock = threading.Lock()
+
+    def _discover(self) -> dict[tuple[str, str], TemplateSet]:
+        sets = {}
+        if not self.root.is_dir():
+            return sets
+        for type_dir in sorted(self.root.iterdir()):
+            if not type_dir.is_dir() or type_dir.name in SHARED_DIRS:
+                continue
+            for org_dir in sorted(path for path in type_dir.iterdir() if path.is_dir()):
+                template_set = TemplateSet(type_dir.name, org_dir.name)
+                for doc_type in self.doc_types:
+                    path = org_dir / f"{doc_type}.typ"
+                    if path.is_file():
+                        template_set.templates[doc_type] = path.as_posix()
+                    else:
+                        template_set.errors[doc_type] = f"missing {path.as_posix()}"
+                sets[(type_dir.name, org_dir.name)] = template_set
+        return sets
+
+    def _template_sets(self) -> dict[tuple[str, str], TemplateSet]:
+        sets = self._sets
+        if sets is None:
+            with self._lock:
+                if self._sets is None:
+                    self._sets = self._discover()
+                sets = self._sets
+        return sets
+
+    def _validate(self, template_set: TemplateSet) -> None:
+        if template_set.validated:
+            return
+        with template_set.lock:
+            if template_set.validated:
+                return
+            for doc_type, template in list(template_set.templates.items()):
+                self._check(template_set, doc_type, template)
+            template_set.validated = True
+
+    def _fingerprint(self, template_set: TemplateSet, doc_type: str, template: str) -> str:
+        if self.fingerprint is None:
+            return ""
+        return self.fingerprint(doc_type, template_set.slug, template_set.org_type, template)
+
+    def _check(self, template_set: TemplateSet, doc_type: str, template: str) -> None:
+        """Пробная компиляция одного шаблона; вызывается под template_set.lock"""
+        try:
+            self.check(doc_type, template_set.slug, template_set.org_type, template)
+        except Exception as e:
+            template_set.errors[doc_type] = f"{type(e).__name__}: {e}"
+            template_set.templates.pop(doc_type, None)
+            template_set.paths[doc_type] = template
+            template_set.fingerprints[doc_type] = self._fingerprint(
+                template_set, doc_type, template
+            )
+        else:
+            template_set.templates[doc_type] = template
+            template_set.errors.pop(doc_type, None)
+            template_set.paths.pop(doc_type, None)
+            template_set.fingerprints.pop(doc_type, None)
+
+    def _recheck_broken(self, template_set: TemplateSet, doc_type: str) -> None:
+        """Проверяет битый шаблон заново, если изменились его исходники или профиль"""
+        def stale() -> str | None:
+            template = template_set.paths.get(doc_type)
+            if template is None or self.fingerprint is None:
+                return None
+            current = self._fingerprint(template_set, doc_type, template)
+            return template if current != template_set.fingerprints.get(doc_type) else None
+
+        if stale() is None:
+            return
+        with template_set.lock:
+            # Пока ждали блокировку, шаблон мог перепроверить другой поток
+            template = stale()
+            if template is not None:
+                self._check(template_set, doc_type, template)
+
+    def validate_all(self, max_workers: int | None = None) -> dict[str, str]:
+        """Пробно компилирует шаблоны всех организаций; возвращает непригодные (см. broken)"""
+        sets = list(self._template_sets().values())
+        # Организации проверяются параллельно, шаблоны одной — последовательно
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="typst-check") as pool:
+            list(pool.map(self._validate, sets))
+        return self.broken()
+
+    def broken(self) -> dict[str, str]:
+        """<org_type>/<slug>/<вид документа> -> причина, по которой шаблон не используется"""
+        return {
+            f"{template_set.org_type}/{template_set.slug}/{doc_type}": error
+            for template_set in self._template_sets().values()
+            for doc_type, error in template_set.errors.items()
+        }
+
+    def get(self, doc_type: str, org_slug: str, org_type: str) -> str:
+        """Путь к проверенному шаблону документа организации"""
+        template_set = self._template_sets().get((org_type, org_slug))
+        if template_set is None:
+            raise DocsGeneratorError(f"No templates for organization {org_type}/{org_slug}")
+        self._validate(template_set)
+        self._recheck_broken(template_set, doc_type)
+        template = template_set.templates.get(doc_type)
+        if template is None:
+            reason = template_set.errors.get(doc_type, "unknown document type")
+            raise DocsGeneratorError(
+                f"Template {doc_type} of {org_type}/{org_slug} is unusable: {reason}"
+            )
+        return template
+
+    def reload(self) -> None:
+        """Забывает найденные шаблоны и результаты проверки"""
+        with self._lock:
+            self._sets = None
@@ -0,0 +1,219 @@
+import multiprocessing
+import os
+import subprocess
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+import orjson
+
+try:
+    import typst
+except ImportError:  # биндинги необязательны, без них работаем через CLI
+    typst = None
+
+
+TYPST_ROOT = "./typst"
+FONT_PATH = "typst/fonts"
+
+# Linux ограничивает длину одного аргумента командной строки (MAX_ARG_STRLEN)
+MAX_CLI_INPUT_BYTES = 128 * 1024 - 1024
+# Каталог под корнем typst для данных, не поместившихся в аргументы CLI
+INPUTS_DIR = ".inputs"
+
+
+def serialize_inputs(payloads: dict[str, Any]) -> dict[str, str]:
+    """JSON для sys.inputs: компактный и канонический, шаблон читает его через json(bytes(...)).
+
+    orjson сериализует датаклассы моделей напрямую, без промежуточного asdict;
+    поля датаклассов идут в порядке объявления, ключи словарей сортируются.
+    """
+    return {
+        key: orjson.dumps(json_data, option=orjson.OPT_SORT_KEYS).decode()
+        for key, json_data in payloads.items()
+    }
+
+
+class SubprocessTypstBackend:
+    """Холодный путь: отдельный процесс `typst compile` на каждый PDF.
+
+    Данные передаются прямо в аргументах --input, PDF читается из stdout,
+    так что на диск обычно ничего не пишется. Данные больше MAX_CLI_INPUT_BYTES
+    (пакеты документов) уходят во временный JSON-файл, а шаблон получает путь
+    к нему в <key>_file и читает его через input-json из common/inputs.typ.
+    """
+
+    name = "subprocess"
+
+    @staticmethod
+    @contextmanager
+    def _common_args(inputs: dict[str, str]) -> Iterator[list[str]]:
+        args = ["--root", TYPST_ROOT, "--font-path", FONT_PATH]
+        files = []
+        try:
+            for key, value in inputs.items():
+                argument = f"{key}={value}"
+                if len(argument.encode("utf-8")) <= MAX_CLI_INPUT_BYTES:
+                    args += ["--input", argument]
+                    continue
+                # Уникальное имя: параллельные компиляции не перетирают друг друга
+                name = f"{INPUTS_DIR}/{key}_{uuid.uuid4().hex}.json"
+                path = Path(TYPST_ROOT, name)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(value, encoding="utf-8")
+                files.append(path)
+                args += ["--input", f"{key}_file=/{name}"]
+            yield args
+        finally:
+            for path in files:
+                path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _run(command: list[str]) -> bytes:
+        result = subprocess.run(command, capture_output=True)
+        if result.returncode != 0:
+            stderr = result.stderr.decode("utf-8", errors="replace")
+            print(f"[ОТЛАДКА] Stderr: {stderr}")
+            raise subprocess.CalledProcessError(result.returncode, command, result.stdout, stderr)
+        return result.stdout
+
+    def render(self, template: str, inputs: dict[str, str]) -> bytes:
+        with self._common_args(inputs) as args:
+            return self._run(["typst", "compile", "--format", "pdf", *args, template, "-"])
+
+    def render_and_query(
+        self, template: str, inputs: dict[str, str], selector: str
+    ) -> tuple[bytes, list]:
+        """PDF и значения metadata-элементов по селектору; CLI компилирует документ дважды"""
+        with self._common_args(inputs) as args:
+            pdf = self._run(["typst", "compile", "--format", "pdf", *args, template, "-"])
+            values = self._run(["typst", "query", *args, template, selector, "--field", "value"])
+        return pdf, orjson.loads(values)
+
+
+class ResidentTypstBackend:
+    """Тёплый путь: компиляция внутри процесса через python-биндинги typst.
+
+    Нет запуска процесса, а разобранные шаблоны и ru-numbers.typ остаются
+    в памяти между документами: typst мемоизирует парсинг и вычисление модулей
+    на весь процесс, и очередной документ пересчитывает только новые данные.
+    Биндинги фиксируют sys.inputs при создании Compiler, поэтому Compiler
+    создаётся на каждый документ. GIL биндинги не отпускают ни при создании
+    Compiler, ни при компиляции (см. benchmarks.typst_backend_bench), так что
+    потоки одного процесса компилируют по очереди — для параллельной работы
+    есть ProcessPoolTypstBackend.
+    """
+
+    name = "resident"
+
+    def __init__(self, ignore_system_fonts: bool = False):
+        if typst is None:
+            raise ImportError("typst python bindings are not installed")
+        self.ignore_system_fonts = ignore_system_fonts
+
+    def _compiler(self, template: str, inputs: dict[str, str]) -> "typst.Compiler":
+        return typst.Compiler(
+            template,
+            root=TYPST_ROOT,
+            font_paths=[FONT_PATH],
+            ignore_system_fonts=self.ignore_system_fonts,
+            sys_inputs=inputs,
+        )
+
+    def render(self, template: str, inputs: dict[str, str]) -> bytes:
+        return self._compiler(template, inputs).compile(format="pdf")
+
+    def render_and_query(
+        self, template: str, inputs: dict[str, str], selector: str
+    ) -> tuple[bytes, list]:
+        """PDF и значения metadata-элементов по селектору.
+
+        Запрос берёт вёрстку из той же компиляции.
+        """
+        compiler = self._compiler(template, inputs)
+        pdf = compiler.compile(format="pdf")
+        return pdf, orjson.loads(compiler.query(selector, field="value"))
+
+
+_worker_backend: ResidentTypstBackend | None = None
+
+
+def _init_worker(ignore_system_fonts: bool) -> None:
+    global _worker_backend
+    _worker_backend = ResidentTypstBackend(ignore_system_fonts)
+
+
+def _worker_render(template: str, inputs: dict[str, str]) -> bytes:
+    return _worker_backend.render(template, inputs)
+
+
+def _worker_render_and_query(
+    template: str, inputs: dict[str, str], selector: str
+) -> tuple[bytes, list]:
+    return _worker_backend.render_and_query(template, inputs, selector)
+
+
+class ProcessPoolTypstBackend:
+    """Резидентный typst в пуле процессов: компиляции идут параллельно.
+
+    В каждом процессе пула свой ResidentTypstBackend с тёплой мемоизацией
+    typst, а поток планировщика только ждёт результата, отпустив GIL.
+    Пул создаётся при первой компиляции; процессы стартуют через spawn,
+    потому что форк процесса с потоками планировщика небезопасен.
+    """
+
+    name = "resident-pool"
+
+    def __init__(self, processes: int | None = None, ignore_system_fonts: bool = False):
+        if typst is None:
+            raise ImportError("typst python bindings are not installed")
+        self.processes = processes or os.cpu_count() or 1
+        self.ignore_system_fonts = ignore_system_fonts
+        self._pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.processes,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(self.ignore_system_fonts,),
+                    )
+        return self._pool
+
+    def render(self, template: str, inputs: dict[str, str]) -> bytes:
+        return self.pool.submit(_worker_render, template, inputs).result()
+
+    def render_and_query(
+        self, template: str, inputs: dict[str, str], selector: str
+    ) -> tuple[bytes, list]:
+        """PDF и значения metadata-элементов по селектору из одной компиляции"""
+        return self.pool.submit(_worker_render_and_query, template, inputs, selector).result()
+
+
+def create_backend(kind: str | None = None):
+    """Создаёт бэкенд компиляции; без явного выбора — по биндингам typst и числу ядер.
+
+    С биндингами на многоядерной машине это resident-pool, на одном ядре —
+    resident (пул процессов там ничего не ускорит), без биндингов — subprocess.
+    Выбор можно зафиксировать переменной окружения TYPST_BACKEND.
+    """
+    kind = kind or os.getenv("TYPST_BACKEND")
+    if kind == SubprocessTypstBackend.name:
+        return SubprocessTypstBackend()
+    if kind == ResidentTypstBackend.name:
+        return ResidentTypstBackend()
+    if kind == ProcessPoolTypstBackend.name:
+        return ProcessPoolTypstBackend()
+    if typst is None:
+        return SubprocessTypstBackend()
+    if (os.cpu_count() or 1) > 1:
+        return ProcessPoolTypstBackend()
+    return ResidentTypstBackend()
@@ -3,3 +3,14 @@ class KonturAgentError(Exception):
 
 class DocsGeneratorError(KonturAgentError):
     pass
+
+class CustomerDirectoryError(KonturAgentError):
+    pass
+
+class ValidationError(KonturAgentError, ValueError):
+    """Неверные реквизиты или данные документа"""
+    pass
+
+class LLMDeadlineError(KonturAgentError, TimeoutError):
+    """Вызов модели не уложился в отведённое время с учётом повторов и ожидания лимитов"""
+    pass
@@ -1,81 +1,126 @@
-from dataclasses import dataclass, asdict
-import json
-import os
-import subprocess
-import traceback
-from typing import Sequence
-import uuid
-from pathlib import Path
+import logging
+from typing import TYPE_CHECKING
 
 from dotenv import find_dotenv, load_dotenv
-from langchain_core.language_models import LanguageModelLike
-from langchain_core.runnables import RunnableConfig
-from langchain_core.tools import BaseTool, tool
-from langchain_anthropic import ChatAnthropic
-from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import InMemorySaver
 
-from debug_tools import DebugGenerator
-from models import Bank, Customer, WorkItem
+from src.agents.base_agent import ProxyAgent
+from src.agents.document_type import TieredDocumentTypeDetector
+from src.debug_tools import BatchGenerator, DebugGenerator, DocumentJob
+from src.debug_tools.progress import STAGE_TITLES, ProgressEvent, progress_listener
+from src.models import Customer, WorkItem
+from src.telemetry import sinks_from_env, telemetry
+
+if TYPE_CHECKING:
+    from src.agents.llm_agent import LLMAgent
+    from src.debug_tools.customer_directory import CustomerDirectory
+
+# LangChain, LangGraph, клиент модели и справочник заказчиков нужны только для
+# диалога с агентом и импортируются в create_agent: путь карточки организации их не загружает
 
 load_dotenv(find_dotenv())
+telemetry.sinks = sinks_from_env()
+logging.basicConfig(format="\033[90m[%(name)s] %(message)s\033[0m")
+logging.getLogger("telemetry").setLevel(logging.INFO)
+
 
+def print_agent_response(llm_response: str) -> None:
+    print(f"\033[35m{llm_response}\033[0m")
 
-class DocumentTypeDetector:
-    DOCUMENT_TYPES = ["Счёт", "Акт", "Карточка организации"]
 
-    def detect_document_type(self, user_input: str) -> str:
-        """Определяет тип документа из пользовательского ввода"""
-        user_lower = user_input.lower()
+def print_progress(event: ProgressEvent | dict) -> None:
+    stage = event.stage if isinstance(event, ProgressEvent) else event["stage"]
+    print(f"\033[90m  … {STAGE_TITLES.get(stage, stage)}\033[0m", flush=True)
 
-        if any(word in user_lower for word in ["акт", "act"]):
-            return "Акт"
-        elif any(word in user_lower for word in ["счёт", "счет", "invoice"]):
-            return "Счёт"
-        elif any(word in user_lower for word in ["карточка", "реквизиты", "карт"]):
-            return "Карточка организации"
+
+async def stream_agent_response(
+    agent: "LLMAgent", content: str, thread_id: str | None = None
+) -> str:
+    """Печатает ответ агента по мере генерации и возвращает его целиком"""
+    parts = []
+    print("\033[35m", end="", flush=True)
+    async for kind, payload in agent.astream(content, thread_id=thread_id):
+        if kind == "token":
+            parts.append(payload)
+            print(payload, end="", flush=True)
         else:
-            return None
+            print("\033[0m")
+            print_progress(payload)
+            print("\033[35m", end="", flush=True)
+    print("\033[0m")
+    return "".join(parts)
 
 
-class LLMAgent:
-    def __init__(self, model: LanguageModelLike, tools: Sequence[BaseTool]):
-        self._model = model
-        self._agent = create_react_agent(model, tools=tools, checkpointer=InMemorySaver())
-        self._config: RunnableConfig = {"configurable": {"thread_id": uuid.uuid4().hex}}
+def get_user_prompt() -> str:
+    return input("\nВы: ")
 
-    def invoke(self, content: str, temperature: float = 0.1) -> str:
-        """Отправляет сообщение в чат"""
-        message = {"role": "user", "content": content}
-        return self._agent.invoke(
-            {"messages": [message], "temperature": temperature},
-            config=self._config
-        )["messages"][-1].content
 
+def run_batch(jobs: list[DocumentJob], merge: bool = False) -> None:
+    """Генерирует несколько документов параллельно и печатает результаты по мере готовности.
 
-def print_agent_response(llm_response: str) -> None:
-    print(f"\033[35m{llm_response}\033[0m")
+    С merge=True документы одного вида склеиваются в один PDF с индексом страниц.
+    """
+    generator = BatchGenerator()
+    print(f"[ОТЛАДКА] Пакетная генерация: {len(jobs)} док., воркеров: {generator.max_workers}")
+
+    if merge:
+        for bundle in generator.generate_bundles(jobs):
+            if bundle.ok:
+                print(f"✅ {bundle.doc_type}: {len(bundle.jobs)} док. в {bundle.output_path} "
+                      f"(индекс: {bundle.index_path}, {bundle.elapsed:.2f} с)")
+            else:
+                print(f"❌ {bundle.doc_type}: {type(bundle.error).__name__}: {bundle.error}")
+        return
 
+    failed = 0
+    for result in generator.generate(jobs):
+        if result.ok:
+            print(f"✅ {result.job.doc_type}: {result.output_path} ({result.elapsed:.2f} с)")
+        else:
+            failed += 1
+            print(f"❌ {result.job.doc_type}: {type(result.error).__name__}: {result.error}")
 
-def get_user_prompt() -> str:
-    return input("\nВы: ")
+    print(f"Готово: {len(jobs) - failed} из {len(jobs)}")
 
 
-def main():
+def create_agent(
+    org_slug: str, org_type: str, directory: "CustomerDirectory | None" = None
+) -> "LLMAgent":
+    """Создаёт агента сбора данных; тяжёлые зависимости импортируются только здесь.
 
-    model = ChatAnthropic(
+    Постоянные заказчики находятся в справочнике directory одним вызовом инструмента.
+    """
+    from src.agents.llm_agent import LLMAgent
+    from src.agents.llm_client import shared_llm_client
+    from src.agents.prompts import collection_system_prompt
+    from src.agents.tools import to_async_tool
+    from src.debug_tools.customer_directory import CustomerDirectory
+
+    # Запросы агента идут через общий клиент: пул соединений, повторы, лимиты
+    model = shared_llm_client().chat_model(
         model="claude-3-haiku-20240307",
         temperature=0.1,
         max_tokens=2048,
-        anthropic_api_key=os.getenv('ANTHROPIC_API_KEY')
     )
 
-    detector = DocumentTypeDetector()
-    agent = LLMAgent(model, tools=[
-        DebugGenerator.generate_pdf_act,
-        DebugGenerator.generate_pdf_invoice,
-        DebugGenerator.generate_pdf_org_card
-    ])
+    directory = directory or CustomerDirectory()
+    # Реквизиты организации входят в неизменный префикс промпта и кэшируются
+    return LLMAgent(model, tools=[
+        to_async_tool(directory.find_customer),
+        to_async_tool(DebugGenerator.generate_pdf_act),
+        to_async_tool(DebugGenerator.generate_pdf_invoice),
+        to_async_tool(DebugGenerator.generate_pdf_org_card)
+    ], system_prompt=collection_system_prompt(
+        DebugGenerator.load_organization_from_file(org_slug, org_type)
+    ))
+
+
+def main():
+
+    # Локальный классификатор отвечает сам, Claude спрашиваем только при низкой уверенности.
+    # Общий клиент Anthropic создаётся при первом обращении к LLM
+    detector = TieredDocumentTypeDetector(ProxyAgent())
+    org_slug = "ip_angarhaeva"
+    org_type = "ip"
 
     print("🚀 Генератор PDF документов для ИП Ангархаева (РЕЖИМ ОТЛАДКИ)")
     print("=" * 50)
@@ -84,8 +129,6 @@ def main():
     # first_question = "Добрый день! Какой документ хотите сформировать?"
     # print(f"Assistant: {first_question}")
     # user_input = input("Вы: ")
-    org_slug = "ip_angarhaeva"
-    org_type = "ip"
     user_input = "карточка"  # ОТЛАДКА: захардкожено
     print(f"[ОТЛАДКА] Пользователь ввел: {user_input}")
 
@@ -100,25 +143,31 @@ def main():
             print(f"[ОТЛАДКА] Переспрос, пользователь ввел: {user_input}")
 
     print(f"✅ Определен тип документа: {document_type}")
+    print(f"[ОТЛАДКА] Без обращения к LLM: {detector.offload_ratio:.0%} запросов "
+          f"({detector.stats})")
 
     if document_type == "Карточка организации":
         print("Создаю карточку организации...")
-        result = DebugGenerator.generate_pdf_org_card(org_slug , org_type)
+        with progress_listener(print_progress):
+            result = DebugGenerator.generate_pdf_org_card(org_slug , org_type)
         print(f"Assistant: {result}")
         return
 
 
     print("\n[ОТЛАДКА] Создаем тестовые данные...")
 
-    test_customer = Customer(
-        name='МАУ "СС"',
-        inn="0323347497",
-        ogrn="1030300123456",
-        kpp="032301001",
-        address="670031, Бурятия Респ, Улан-Удэ г, Широких-Полянского ул, дом № 50",
-        work_phone="8-983-458-24-95",
-        signatory="Иванов И.И."
-    )
+    test_customers = [
+        Customer(
+            name='МАУ "СС"',
+            slug="mau_ss",
+            inn="0323347497",
+            ogrn="1030300123457",
+            kpp="032301001",
+            address="670031, Бурятия Респ, Улан-Удэ г, Широких-Полянского ул, дом № 50",
+            phone="8-983-458-24-95",
+            signatory="Иванов И.И."
+        )
+    ]
 
     test_jobs = [
         WorkItem(
@@ -128,24 +177,37 @@ def main():
         )
     ]
 
-    print(f"[ОТЛАДКА] Тестовый заказчик: {test_customer.name}")
+    print(f"[ОТЛАДКА] Тестовые заказчики: {len(test_customers)} шт")
     print(f"[ОТЛАДКА] Тестовые работы: {len(test_jobs)} шт")
 
+    if len(test_customers) > 1:
+        doc_type = "act" if document_type == "Акт" else "invoice"
+        # Бухгалтерия печатает документы за месяц разом: один PDF на весь пакет
+        run_batch([
+            DocumentJob(doc_type, customer, test_jobs, org_slug, org_type)
+            for customer in test_customers
+        ], merge=True)
+        return
+
+    test_customer = test_customers[0]
 
     try:
-        if document_type == "Акт":
-            print("\n[ОТЛАДКА] Вызываем debug_generate_pdf_act...")
-            result = DebugGenerator.generate_pdf_act(
-                customer=test_customer,
-                jobs=test_jobs,
-                org_slug=org_slug,
-                org_type=org_type
-            )
-            print(f"[ОТЛАДКА] Результат: {result}")
-        elif document_type == "Счёт":
-            print("\n[ОТЛАДКА] Вызываем debug_generate_pdf_invoice...")
-            result = DebugGenerator.generate_pdf_invoice(test_customer, test_jobs)
-            print(f"[ОТЛАДКА] Результат: {result}")
+        with progress_listener(print_progress):
+            if document_type == "Акт":
+                print("\n[ОТЛАДКА] Вызываем debug_generate_pdf_act...")
+                result = DebugGenerator.generate_pdf_act(
+                    customer=test_customer,
+                    jobs=test_jobs,
+                    org_slug=org_slug,
+                    org_type=org_type
+                )
+                print(f"[ОТЛАДКА] Результат: {result}")
+            elif document_type == "Счёт":
+                print("\n[ОТЛАДКА] Вызываем debug_generate_pdf_invoice...")
+                result = DebugGenerator.generate_pdf_invoice(
+                    test_customer, test_jobs, org_slug, org_type
+                )
+                print(f"[ОТЛАДКА] Результат: {result}")
     except Exception as e:
         print(f"[ОТЛАДКА] ОШИБКА: {type(e).__name__}: {e}")
         import traceback
@@ -154,32 +216,23 @@ def main():
 
 
     """
-    system_prompt = f'''
-    Пользователь хочет сгенерировать: {document_type}
-
-    Твоя задача собрать данные заказчика поэтапно:
-    1. Название организации  
-    2. ИНН
-    3. ОГРН
-    4. Адрес
-    5. Подписант
-    6. Данные о работах (название, количество, цена)
-
-    После получения всех данных используй соответствующий инструмент.
-    Начни с первого вопроса.
-    '''
-
-    agent_response = agent.invoke(content=system_prompt)
+    agent = create_agent(org_slug, org_type)
+    agent_response = asyncio.run(
+        stream_agent_response(agent, document_request_message(document_type))
+    )
 
     while True:
-        print_agent_response(agent_response)
         user_input = get_user_prompt()
 
         if user_input.lower() in ['выход', 'quit', 'exit']:
+            stats = agent.cache_stats()
+            print(f"[ОТЛАДКА] Входные токены: из кэша {stats.cache_read_input_tokens}, "
+                  f"без кэша {stats.uncached_input_tokens}, "
+                  f"запись в кэш {stats.cache_creation_input_tokens}")
             print("👋 Досвидания!")
             break
 
-        agent_response = agent.invoke(user_input)
+        agent_response = asyncio.run(stream_agent_response(agent, user_input))
 
         if "✅ PDF" in agent_response:
             print("\n🎉 Документ готов!")
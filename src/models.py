@@ -1,6 +1,20 @@
 from dataclasses import dataclass
 
-@dataclass(frozen=True)
+from src.exceptions import ValidationError
+from src.validation import (
+    validate_account,
+    validate_bic,
+    validate_correspondent_account,
+    validate_inn,
+    validate_kpp,
+    validate_ogrn,
+)
+
+# slots=True: без __dict__ у каждого экземпляра, в батчах это десятки тысяч объектов.
+# Реквизиты проверяются в __post_init__, так что неверный ИНН или счёт не доходит до typst
+
+
+@dataclass(frozen=True, slots=True)
 class Bank:
     """Банковские реквизиты заказчика"""
     name: str
@@ -9,8 +23,15 @@ class Bank:
     address: str
     correspondent_account: str
 
+    def __post_init__(self):
+        validate_bic(self.bic)
+        if self.inn:
+            validate_inn(self.inn)
+        if self.correspondent_account:
+            validate_correspondent_account(self.correspondent_account, self.bic)
+
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Organization:
     org_type: str
     name: str
@@ -34,8 +55,23 @@ class Organization:
 
     bank: Bank
 
+    # Ставка НДС в процентах, который входит в цены; None — без НДС (УСН, патент)
+    vat_rate: int | None = None
 
-@dataclass(frozen=True)
+    def __post_init__(self):
+        validate_inn(self.inn)
+        if self.kpp:
+            validate_kpp(self.kpp)
+        if self.ogrn:
+            validate_ogrn(self.ogrn)
+        validate_account(self.account, self.bank.bic)
+        if self.vat_rate is not None and (
+            type(self.vat_rate) is not int or not 0 <= self.vat_rate <= 100
+        ):
+            raise ValidationError(f"VAT rate {self.vat_rate!r}: expected percent 0..100")
+
+
+@dataclass(frozen=True, slots=True)
 class Customer:
     """Заказчик"""
     name: str
@@ -48,10 +84,34 @@ class Customer:
     kpp: str = ""
     bank: Bank | None = None
 
+    def __post_init__(self):
+        if not self.name:
+            raise ValidationError("Customer name is empty")
+        validate_inn(self.inn)
+        if self.kpp:
+            validate_kpp(self.kpp)
+        if self.ogrn:
+            validate_ogrn(self.ogrn)
 
-@dataclass
+
+@dataclass(slots=True)
 class WorkItem:
     """Наименование услуги, цена, кол-во"""
     task: str
     price: int
-    quantity: int = 1
\ No newline at end of file
+    quantity: int = 1
+
+    def __post_init__(self):
+        if not self.task:
+            raise ValidationError("Work item task is empty")
+        # bool — подкласс int, а float в цене исказил бы суммы в Decimal
+        for name, value in (("price", self.price), ("quantity", self.quantity)):
+            if not isinstance(value, int) or isinstance(value, bool):
+                got = type(value).__name__
+                raise ValidationError(
+                    f"Work item {self.task!r}: {name} must be an integer, got {got}"
+                )
+        if self.price < 0:
+            raise ValidationError(f"Work item {self.task!r}: negative price {self.price}")
+        if self.quantity < 1:
+            raise ValidationError(f"Work item {self.task!r}: quantity {self.quantity} < 1")
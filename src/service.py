@@ -0,0 +1,433 @@
+"""Локальный HTTP-сервис генерации документов и диалогов с агентом.
+
+Один долгоживущий процесс: LangChain, typst и клиент модели загружаются один
+раз, а запросы на генерацию проходят через ограниченную очередь заданий.
+
+    PYTHONPATH=.. python -m src.service --port 8080 --workers 4
+
+POST /documents/{act|invoice|org_card}  -> 202 {"job_id": ...}, 503 если очередь полна;
+                                           customer — реквизиты или ИНН/slug из справочника
+GET  /jobs/{job_id}                     -> статус задания
+GET  /jobs/{job_id}/pdf                 -> готовый PDF
+POST /extractions                       -> {"complete", "question", "state", ...}: заказчик и работы
+                                           из свободного текста одним вызовом модели; state
+                                           из ответа передаётся в следующий запрос
+POST /dialogs                           -> {"thread_id": ...}
+POST /dialogs/{thread_id}/messages      -> {"reply": ...}
+GET  /health
+GET  /metrics                           -> метрики в текстовом формате Prometheus
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+
+from dotenv import find_dotenv, load_dotenv
+
+from src.debug_tools import DebugGenerator
+from src.debug_tools.debug_docs_generator import DOCUMENT_TYPES, ORG_CARD, shared_runtime
+from src.models import Bank, Customer, WorkItem
+from src.telemetry import increment, render_prometheus, sinks_from_env, telemetry
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+MAX_BODY_BYTES = 1024 * 1024
+
+STATUS_TEXT = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Job:
+    """Задание на генерацию документа"""
+    id: str
+    doc_type: str
+    customer: Customer | None
+    jobs: list[WorkItem]
+    org_slug: str
+    org_type: str
+    status: str = QUEUED
+    error: str | None = None
+    pdf: bytes | None = field(default=None, repr=False)
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "doc_type": self.doc_type,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """Ограниченная очередь генерации с пулом воркеров.
+
+    Переполнение очереди отклоняется сразу (backpressure), а не копится в памяти.
+    Готовые задания хранятся, пока их не вытеснят max_results более новых.
+    """
+
+    def __init__(self, workers: int, max_queued: int, max_results: int = 1000):
+        self.workers = workers
+        self.max_results = max_results
+        self._queue: asyncio.Queue[Job] = asyncio.Queue(maxsize=max_queued)
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, job: Job) -> None:
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            increment("jobs_rejected")
+            raise HttpError(503, "Generation queue is full, retry later") from None
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_results + self._queue.maxsize + self.workers:
+            self._jobs.popitem(last=False)
+
+    def get(self, job_id: str) -> Job:
+        try:
+            return self._jobs[job_id]
+        except KeyError:
+            raise HttpError(404, f"Job {job_id} not found") from None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = RUNNING
+            try:
+                job.pdf = await asyncio.to_thread(
+                    DebugGenerator.render_pdf,
+                    job.doc_type,
+                    job.customer,
+                    job.jobs,
+                    job.org_slug,
+                    job.org_type,
+                )
+                job.status = DONE
+            except Exception as e:
+                job.status = FAILED
+                job.error = f"{type(e).__name__}: {e}"
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+    async def drain(self) -> None:
+        """Дожидается выполнения всех принятых заданий и останавливает воркеры"""
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def parse_customer(data: dict | None) -> Customer:
+    if not isinstance(data, dict):
+        raise HttpError(400, "customer must be an object")
+    try:
+        bank = data.get("bank")
+        return Customer(**{**data, "bank": Bank(**bank) if bank else None})
+    except (TypeError, ValueError) as e:
+        raise HttpError(400, f"Invalid customer: {e}") from None
+
+
+def parse_jobs(data: list | None) -> list[WorkItem]:
+    if not isinstance(data, list) or not data:
+        raise HttpError(400, "jobs must be a non-empty list")
+    try:
+        return [WorkItem(**item) for item in data]
+    except (TypeError, ValueError) as e:
+        raise HttpError(400, f"Invalid jobs: {e}") from None
+
+
+class DocumentService:
+    def __init__(self, workers: int, max_queued: int):
+        self.queue = JobQueue(workers, max_queued)
+        self._agent = None
+        self._extractor = None
+        self._directory = None
+        self._server: asyncio.AbstractServer | None = None
+        self._stopping = asyncio.Event()
+        # Keep-alive соединения, ждущие следующего запроса: при остановке закрываются,
+        # иначе wait_closed (Python 3.12+) ждал бы, пока клиент отключится сам
+        self._idle: set[asyncio.StreamWriter] = set()
+
+    @property
+    def directory(self):
+        """Справочник заказчиков: SQLAlchemy загружается при первом обращении"""
+        if self._directory is None:
+            from src.debug_tools.customer_directory import CustomerDirectory
+
+            self._directory = CustomerDirectory()
+        return self._directory
+
+    def resolve_customer(self, data: dict | str | None) -> Customer:
+        """Заказчик из тела запроса: объект с реквизитами или ИНН/slug из справочника"""
+        if not isinstance(data, str):
+            return parse_customer(data)
+        found = self.directory.find(data, limit=2)
+        if not found:
+            raise HttpError(404, f"Customer {data} not found in directory")
+        if len(found) > 1:
+            slugs = ", ".join(customer.slug for customer in found)
+            raise HttpError(409, f"Customer {data} is ambiguous: {slugs}")
+        return found[0]
+
+    @property
+    def agent(self):
+        """Агент создаётся один раз и дальше держит клиент модели тёплым"""
+        if self._agent is None:
+            from src.agents.llm_agent import LLMAgent
+            from src.agents.llm_client import shared_llm_client
+            from src.agents.prompts import collection_system_prompt
+            from src.agents.tools import to_async_tool
+
+            # Запросы агента идут через общий клиент: пул соединений, повторы, лимиты
+            model = shared_llm_client().chat_model(
+                model="claude-3-haiku-20240307",
+                temperature=0.1,
+                max_tokens=2048,
+            )
+            self._agent = LLMAgent(model, tools=[
+                to_async_tool(self.directory.find_customer),
+                to_async_tool(DebugGenerator.generate_pdf_act),
+                to_async_tool(DebugGenerator.generate_pdf_invoice),
+                to_async_tool(DebugGenerator.generate_pdf_org_card)
+            ], system_prompt=collection_system_prompt())
+        return self._agent
+
+    @property
+    def extractor(self):
+        """Извлечение данных документа; клиент модели общий с остальными агентами"""
+        if self._extractor is None:
+            from src.agents.extraction import ExtractionAgent
+
+            self._extractor = ExtractionAgent()
+        return self._extractor
+
+    async def extract(self, body: dict | None) -> dict:
+        """Один ход извлечения: текст пользователя плюс state прошлого ответа"""
+        from src.agents.extraction import ExtractionState
+
+        body = body or {}
+        text = body.get("text")
+        if not isinstance(text, str) or not text:
+            raise HttpError(400, "text must be a non-empty string")
+        if not isinstance(body.get("state", {}), dict):
+            raise HttpError(400, "state must be an object")
+        try:
+            state = ExtractionState.from_dict(body.get("state"))
+        except (TypeError, ValueError) as e:
+            raise HttpError(400, f"Invalid state: {e}") from None
+
+        state = await self.extractor.aextract(text, state)
+        reply = {
+            "complete": state.complete,
+            "question": state.follow_up(),
+            "missing": state.missing,
+            "invalid": state.invalid,
+            "state": state.to_dict(),
+        }
+        if state.complete:
+            # Готовое тело для POST /documents/{act|invoice}
+            reply["customer"] = asdict(state.to_customer())
+            reply["jobs"] = [asdict(item) for item in state.work_items()]
+        return reply
+
+    async def route(
+        self, method: str, path: str, body: dict | None
+    ) -> tuple[int, dict | bytes | str]:
+        parts = [part for part in path.split("/") if part]
+
+        if parts == ["health"] and method == "GET":
+            return 200, {
+                "status": "ok",
+                "queued": self.queue.depth,
+                "broken_templates": sorted(shared_runtime().templates.broken()),
+            }
+
+        if parts == ["metrics"] and method == "GET":
+            return 200, render_prometheus()
+
+        if len(parts) == 2 and parts[0] == "documents" and method == "POST":
+            doc_type = parts[1]
+            if doc_type not in DOCUMENT_TYPES:
+                raise HttpError(404, f"Unknown document type {doc_type}")
+            body = body or {}
+            card = doc_type == ORG_CARD
+            job = Job(
+                id=uuid.uuid4().hex,
+                doc_type=doc_type,
+                customer=None if card else self.resolve_customer(body.get("customer")),
+                jobs=[] if card else parse_jobs(body.get("jobs")),
+                org_slug=body.get("org_slug", "ip_angarhaeva"),
+                org_type=body.get("org_type", "ip"),
+            )
+            self.queue.submit(job)
+            return 202, job.to_dict()
+
+        if len(parts) in (2, 3) and parts[0] == "jobs" and method == "GET":
+            job = self.queue.get(parts[1])
+            if len(parts) == 2:
+                return 200, job.to_dict()
+            if parts[2] == "pdf":
+                if job.status != DONE:
+                    raise HttpError(409, f"Job {job.id} is {job.status}")
+                return 200, job.pdf
+
+        if parts == ["extractions"] and method == "POST":
+            return 200, await self.extract(body)
+
+        if parts == ["dialogs"] and method == "POST":
+            return 200, {"thread_id": self.agent.new_thread()}
+
+        if method == "POST" and len(parts) == 3 and parts[::2] == ["dialogs", "messages"]:
+            content = (body or {}).get("content")
+            if not isinstance(content, str) or not content:
+                raise HttpError(400, "content must be a non-empty string")
+            reply = await self.agent.ainvoke(content, thread_id=parts[1])
+            return 200, {"thread_id": parts[1], "reply": reply}
+
+        raise HttpError(404, f"No route for {method} {path}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while not self._stopping.is_set():
+                self._idle.add(writer)
+                try:
+                    request_line = await reader.readline()
+                finally:
+                    self._idle.discard(writer)
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    # Дальше поток байтов не разобрать на запросы: отвечаем и закрываем
+                    error = {"error": "Malformed request line"}
+                    await self._respond(writer, 400, error, keep_alive=False)
+                    break
+
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    try:
+                        length = int(headers.get("content-length", 0))
+                    except ValueError:
+                        keep_alive = False  # тело не отделить от следующего запроса
+                        raise HttpError(400, "Invalid Content-Length") from None
+                    if length > MAX_BODY_BYTES:
+                        keep_alive = False  # непрочитанное тело не должно стать запросом
+                        raise HttpError(413, "Request body is too large")
+                    raw = await reader.readexactly(length) if length else b""
+                    try:
+                        body = json.loads(raw) if raw else None
+                    except json.JSONDecodeError as e:
+                        raise HttpError(400, f"Invalid JSON: {e}") from None
+                    status, payload = await self.route(method, path.split("?", 1)[0], body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(
+        writer: asyncio.StreamWriter, status: int, payload: dict | bytes | str, keep_alive: bool
+    ) -> None:
+        if isinstance(payload, bytes):
+            content_type, data = "application/pdf", payload
+        elif isinstance(payload, str):
+            content_type, data = "text/plain; version=0.0.4; charset=utf-8", payload.encode()
+        else:
+            content_type = "application/json; charset=utf-8"
+            data = json.dumps(payload, ensure_ascii=False).encode()
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+    async def serve(self, host: str, port: int) -> None:
+        self.queue.start()
+        # Пробная компиляция всех шаблонов: битый шаблон отклоняется до первого запроса
+        broken = await asyncio.to_thread(shared_runtime().templates.validate_all)
+        for name, error in broken.items():
+            print(f"⚠️ Шаблон {name} отключён: {error.splitlines()[0]}")
+        if os.getenv("ANTHROPIC_API_KEY"):
+            self.agent  # прогрев: импорт LangGraph и создание клиента модели до первого запроса
+        self._server = await asyncio.start_server(self.handle, host, port)
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+
+        print(f"🚀 Сервис документов слушает http://{host}:{port}, воркеров: {self.queue.workers}")
+        await self._stopping.wait()
+
+        print("Останавливаюсь: новые запросы не принимаются, дожидаюсь заданий в очереди...")
+        self._server.close()
+        for writer in list(self._idle):
+            writer.close()
+        await self._server.wait_closed()
+        await self.queue.drain()
+        print("👋 Сервис остановлен")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP-сервис генерации документов")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--queue-size", type=int, default=100)
+    args = parser.parse_args()
+
+    load_dotenv(find_dotenv())
+    telemetry.sinks = sinks_from_env()
+    logging.basicConfig(format="%(asctime)s [%(name)s] %(message)s")
+    logging.getLogger("telemetry").setLevel(logging.INFO)
+    asyncio.run(DocumentService(args.workers, args.queue_size).serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""Инструментация горячих путей: спаны с таймингами, счётчики и токены моделей.
+
+Спаны вкладываются через ContextVar: открытые внутри документа или хода агента
+попадают в разбивку корневого спана, поэтому медленный документ или ход видно
+по событию корня без профилировщика. Агрегаты (гистограммы длительностей и
+счётчики) копятся всегда и отдаются в текстовом формате Prometheus; события
+спанов уходят в подключённые синки — лог или JSONL-файл.
+
+Синки включаются переменной окружения TELEMETRY_SINKS, например
+TELEMETRY_SINKS=log,jsonl:output/telemetry.jsonl
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Protocol
+
+PROFILE_LOAD = "profile_load"
+JSON_SERIALIZE = "json_serialize"
+TYPST_COMPILE = "typst_compile"
+DOCUMENT = "document"
+LLM_CALL = "llm_call"
+TOOL_CALL = "tool_call"
+AGENT_TURN = "agent_turn"
+
+# Атрибуты спанов, которые становятся метками метрик; остальные (thread_id,
+# имя заказчика) остаются только в событиях, чтобы не раздувать число серий
+METRIC_LABELS = ("doc_type", "backend", "model", "tool")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Порог, после которого корневой спан считается медленным, секунды
+SLOW_THRESHOLDS = {DOCUMENT: 2.0, AGENT_TURN: 15.0, LLM_CALL: 10.0}
+
+logger = logging.getLogger("telemetry")
+
+
+@dataclass
+class Span:
+    """Измеренный участок кода"""
+    name: str
+    attrs: dict = field(default_factory=dict)
+    trace_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    parent: "Span | None" = field(default=None, repr=False)
+    started_at: float = field(default_factory=time.time)
+    duration: float = 0.0
+    error: str | None = None
+    # Суммарное время дочерних спанов по имени, секунды
+    children: dict[str, float] = field(default_factory=dict)
+
+    def to_event(self, slow: bool) -> dict:
+        return {
+            "type": "span",
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "parent": self.parent.name if self.parent else None,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "error": self.error,
+            "slow": slow,
+            "attrs": self.attrs,
+            "children_ms": {name: round(total * 1000, 3) for name, total in self.children.items()},
+        }
+
+
+class Sink(Protocol):
+    def handle(self, event: dict) -> None: ...
+
+
+class LogSink:
+    """Пишет корневые спаны в лог, медленные — с уровнем WARNING и разбивкой по этапам"""
+
+    def __init__(self, logger: logging.Logger = logger, all_spans: bool = False):
+        self.logger = logger
+        self.all_spans = all_spans
+
+    def handle(self, event: dict) -> None:
+        if event["type"] != "span" or (event["parent"] and not self.all_spans):
+            return
+        breakdown = ", ".join(f"{name} {ms:.1f}" for name, ms in event["children_ms"].items())
+        attrs = " ".join(f"{key}={value}" for key, value in event["attrs"].items())
+        message = f"{event['name']} {event['duration_ms']:.1f} мс {attrs}"
+        if breakdown:
+            message += f" [{breakdown}]"
+        if event["error"]:
+            message += f" ошибка: {event['error']}"
+        level = logging.WARNING if event["slow"] or event["error"] else logging.INFO
+        self.logger.log(level, message)
+
+
+class JsonlSink:
+    """Дописывает каждое событие отдельной строкой JSON"""
+
+    def __init__(self, path: str | Path = "output/telemetry.jsonl"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def handle(self, event: dict) -> None:
+        line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as jsonl_file:
+            jsonl_file.write(line)
+
+
+def _labels(values: dict) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((key, str(value)) for key, value in values.items() if value is not None))
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+class Telemetry:
+    """Агрегаты метрик процесса и рассылка событий по синкам"""
+
+    def __init__(
+        self, sinks: list[Sink] | None = None, slow_thresholds: dict[str, float] | None = None
+    ):
+        self.sinks = list(sinks or [])
+        self.slow_thresholds = dict(SLOW_THRESHOLDS if slow_thresholds is None else slow_thresholds)
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, tuple], float] = {}
+        # (имя спана, метки) -> [счётчики по корзинам..., сумма, количество]
+        self._durations: dict[tuple[str, tuple], list[float]] = {}
+        self._current: ContextVar[Span | None] = ContextVar("telemetry_span", default=None)
+
+    def add_sink(self, sink: Sink) -> None:
+        self.sinks.append(sink)
+
+    def _dispatch(self, event: dict) -> None:
+        for sink in self.sinks:
+            try:
+                sink.handle(event)
+            except Exception:  # телеметрия не должна ронять генерацию
+                logger.exception("Telemetry sink %s failed", type(sink).__name__)
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """Увеличивает счётчик name с метками labels"""
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def counter(self, name: str, **labels) -> float:
+        """Текущее значение счётчика, суммированное по всем сериям с метками labels"""
+        wanted = set(_labels(labels))
+        with self._lock:
+            return sum(
+                value for (counter, series), value in self._counters.items()
+                if counter == name and wanted <= set(series)
+            )
+
+    def _finish(self, span: Span) -> None:
+        key = (span.name, _labels({label: span.attrs.get(label) for label in METRIC_LABELS}))
+        with self._lock:
+            histogram = self._durations.setdefault(key, [0] * (len(DURATION_BUCKETS) + 2))
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= bound:
+                    histogram[index] += 1
+            histogram[-2] += span.duration
+            histogram[-1] += 1
+            # Дочерние спаны заканчиваются и в потоках планировщика, а не только у родителя
+            if span.parent is not None:
+                children = span.parent.children
+                children[span.name] = children.get(span.name, 0.0) + span.duration
+        if span.error:
+            self.increment("span_errors", span=span.name, error=span.error.split(":", 1)[0])
+        if self.sinks:
+            slow = span.duration >= self.slow_thresholds.get(span.name, float("inf"))
+            with self._lock:
+                event = span.to_event(slow)
+            self._dispatch(event)
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Span]:
+        """Измеряет блок with; вложенные спаны попадают в разбивку родителя"""
+        parent = self._current.get()
+        trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        span = Span(name, attrs, trace_id=trace_id, parent=parent)
+        token = self._current.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            try:
+                self._current.reset(token)
+            except ValueError:  # асинхронный генератор закрыт уже в другом контексте
+                pass
+            self._finish(span)
+
+    def record_span(self, name: str, duration: float, error: str | None = None, **attrs) -> Span:
+        """Учитывает уже измеренный участок, например по колбэкам LangChain"""
+        parent = self._current.get()
+        span = Span(
+            name, attrs,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex[:16],
+            parent=parent,
+            started_at=time.time() - duration,
+            duration=duration,
+            error=error,
+        )
+        self._finish(span)
+        return span
+
+    def record_tokens(
+        self,
+        model: str | None,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cache_read_tokens: int = 0,
+        cache_creation_tokens: int = 0,
+    ) -> None:
+        """Токены одного вызова модели; input_tokens — без кэшированных"""
+        for kind, count in (
+            ("input", input_tokens),
+            ("output", output_tokens),
+            ("cache_read", cache_read_tokens),
+            ("cache_creation", cache_creation_tokens),
+        ):
+            if count:
+                self.increment("llm_tokens", count, model=model, kind=kind)
+        if self.sinks:
+            parent = self._current.get()
+            self._dispatch({
+                "type": "tokens",
+                "trace_id": parent.trace_id if parent else None,
+                "model": model,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "cache_read_tokens": cache_read_tokens,
+                "cache_creation_tokens": cache_creation_tokens,
+            })
+
+    def record_anthropic_usage(self, model: str | None, usage) -> None:
+        """Токены из response.usage Anthropic SDK, там input_tokens уже без кэша"""
+        self.record_tokens(
+            model,
+            input_tokens=usage.input_tokens or 0,
+            output_tokens=usage.output_tokens or 0,
+            cache_read_tokens=getattr(usage, "cache_read_input_tokens", None) or 0,
+            cache_creation_tokens=getattr(usage, "cache_creation_input_tokens", None) or 0,
+        )
+
+    def render_prometheus(self, prefix: str = "kontur") -> str:
+        """Текущие агрегаты в текстовом формате экспозиции Prometheus"""
+        with self._lock:
+            counters = dict(self._counters)
+            durations = {key: list(histogram) for key, histogram in self._durations.items()}
+
+        lines = []
+        for counter in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            for (name, labels), value in sorted(counters.items()):
+                if name == counter:
+                    lines.append(f"{prefix}_{counter}_total{_format_labels(labels)} {value:g}")
+
+        metric = f"{prefix}_span_duration_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for (name, labels), histogram in sorted(durations.items()):
+            labels = (("span", name),) + labels
+            for bound, count in zip(DURATION_BUCKETS, histogram):
+                bucket = _format_labels(labels + (("le", f"{bound:g}"),))
+                lines.append(f"{metric}_bucket{bucket} {count:g}")
+            bucket = _format_labels(labels + (("le", "+Inf"),))
+            lines.append(f"{metric}_bucket{bucket} {histogram[-1]:g}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {histogram[-2]:.6f}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+
+def sinks_from_env(value: str | None = None) -> list[Sink]:
+    """Синки из строки вида "log,jsonl:путь" (по умолчанию TELEMETRY_SINKS)"""
+    value = os.getenv("TELEMETRY_SINKS", "") if value is None else value
+    sinks: list[Sink] = []
+    for spec in filter(None, (part.strip() for part in value.split(","))):
+        kind, _, argument = spec.partition(":")
+        if kind == "log":
+            sinks.append(LogSink())
+        elif kind == "jsonl":
+            sinks.append(JsonlSink(argument or "output/telemetry.jsonl"))
+        else:
+            raise ValueError(f"Unknown telemetry sink {kind}")
+    return sinks
+
+
+telemetry = Telemetry(sinks_from_env())
+
+span = telemetry.span
+record_span = telemetry.record_span
+increment = telemetry.increment
+record_tokens = telemetry.record_tokens
+record_anthropic_usage = telemetry.record_anthropic_usage
+render_prometheus = telemetry.render_prometheus
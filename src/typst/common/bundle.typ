@@ -0,0 +1,17 @@
+// Несколько документов одного вида в одном PDF: одна компиляция на весь пакет.
+// bundle_template — путь к шаблону от корня typst ("/ip/<slug>/act.typ"),
+// шаблон экспортирует функцию document(data). bundle_data — JSON-массив данных.
+// Перед каждым документом ставится метка с номером первой страницы, в конце —
+// метка с последней страницей: по ним строится постраничный индекс.
+#import "/common/inputs.typ": input-json
+#import sys.inputs.at("bundle_template"): document
+
+#let items = input-json("bundle_data")
+
+#for (index, data) in items.enumerate() {
+  if index > 0 { pagebreak() }
+  context [#metadata((index: index, page: here().page())) <bundle-document>]
+  document(data)
+}
+
+#context [#metadata((index: none, page: here().page())) <bundle-document>]
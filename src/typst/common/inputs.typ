@@ -0,0 +1,8 @@
+// Данные документа из sys.inputs. Обычно это строка JSON в <key>; данные,
+// не поместившиеся в аргументы typst CLI, приходят файлом: путь от корня
+// typst лежит в <key>_file. Шаблон читает оба варианта одним вызовом.
+#let input-json(key, default: none) = {
+  let path = sys.inputs.at(key + "_file", default: none)
+  let raw = sys.inputs.at(key, default: none)
+  if path != none { json(path) } else if raw != none { json(bytes(raw)) } else { default }
+}
@@ -1,55 +1,63 @@
-#let org = json(sys.inputs.at("org_data"))
+// Шаблон экспортирует document(org), чтобы его можно было собрать в пакет
+// через common/bundle.typ. При самостоятельной компиляции данные приходят
+// строкой JSON прямо в sys.inputs (typst 0.13+), большие — файлом (common/inputs.typ).
+#import "/common/inputs.typ": input-json
 
-#set page(paper: "a4", margin: (x: 2cm, y: 2cm))
-#set text(font: "Times New Roman", size: 12pt)
+#let document(org) = [
+  #set page(paper: "a4", margin: (x: 2cm, y: 2cm))
+  #set text(font: "Times New Roman", size: 12pt)
 
-#align(center, text(16pt, weight: "bold")[
-  КАРТОЧКА ОРГАНИЗАЦИИ
-])
+  #align(center, text(16pt, weight: "bold")[
+    КАРТОЧКА ОРГАНИЗАЦИИ
+  ])
 
-#v(2em)
+  #v(2em)
 
-#table(
-  columns: (5cm, 1fr),
-  stroke: 0.1em,
-  inset: (left: 5pt, rest: 10pt),
+  #table(
+    columns: (5cm, 1fr),
+    stroke: 0.1em,
+    inset: (left: 5pt, rest: 10pt),
 
-  [*Полное наименование:*], [#org.full_name],
-  [*Юридический адрес:*], [#org.address],
-  [*ИНН:*], [#org.inn],
-  [*ОГРН:*], [#org.ogrn],
-  [*Расчётный счёт:*], [#org.account],
-  [*Банк:*], [#org.bank.name],
-  [*Адрес банка:*], [#org.bank.address],
-  [*БИК:*], [#org.bank.bic],
-  [*Корреспондентский счёт:*], [#org.bank.correspondent_account],
-  [*ИНН банка:*], [#org.bank.inn],
-  [*E-mail:*], [#org.email],
-  [*Номер телефона:*], [#org.work_phone],
-)
+    [*Полное наименование:*], [#org.full_name],
+    [*Юридический адрес:*], [#org.address],
+    [*ИНН:*], [#org.inn],
+    [*ОГРН:*], [#org.ogrn],
+    [*Расчётный счёт:*], [#org.account],
+    [*Банк:*], [#org.bank.name],
+    [*Адрес банка:*], [#org.bank.address],
+    [*БИК:*], [#org.bank.bic],
+    [*Корреспондентский счёт:*], [#org.bank.correspondent_account],
+    [*ИНН банка:*], [#org.bank.inn],
+    [*E-mail:*], [#org.email],
+    [*Номер телефона:*], [#org.work_phone],
+  )
 
-#v(4em)
+  #v(4em)
 
-#align(center)[
-  #box(stroke: 1pt, inset: 1em)[
-    *Для переводов и платежей*
+  #align(center)[
+    #box(stroke: 1pt, inset: 1em)[
+      *Для переводов и платежей*
 
-    Получатель: #org.name
+      Получатель: #org.name
 
-    ИНН: #org.inn
+      ИНН: #org.inn
 
-    Счёт: #org.account
+      Счёт: #org.account
 
-    Банк: #org.bank.name
+      Банк: #org.bank.name
 
-    БИК: #org.bank.bic
+      БИК: #org.bank.bic
 
-    Корр. счёт: #org.bank.correspondent_account
+      Корр. счёт: #org.bank.correspondent_account
+    ]
   ]
-]
 
-#v(2em)
+  #v(2em)
+
+  #align(right)[
+    Дата формирования: #datetime.today().display("[day].[month].[year]")
+  ]
+]
 
-#align(right)[
-  Дата формирования: #datetime.today().display("[day].[month].[year]")
-]
\ No newline at end of file
+#let org_data = input-json("org_data")
+#if org_data != none { document(org_data) }
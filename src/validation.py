@@ -0,0 +1,83 @@
+"""Проверка российских реквизитов: форматы и контрольные числа.
+
+Ошибка в ИНН или счёте ловится при создании модели, до компиляции typst и до
+того, как документ уйдёт заказчику.
+"""
+from src.exceptions import ValidationError
+
+_INN10_WEIGHTS = (2, 4, 10, 3, 5, 9, 4, 6, 8)
+_INN11_WEIGHTS = (7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+_INN12_WEIGHTS = (3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+_ACCOUNT_WEIGHTS = (7, 1, 3) * 8
+
+
+def _digits(value: str, lengths: tuple[int, ...], what: str) -> list[int]:
+    if not (
+        isinstance(value, str) and len(value) in lengths and value.isascii() and value.isdigit()
+    ):
+        expected = " or ".join(map(str, lengths))
+        raise ValidationError(f"{what} {value!r}: expected {expected} digits")
+    return [int(char) for char in value]
+
+
+def _control(digits: list[int], weights: tuple[int, ...]) -> int:
+    return sum(digit * weight for digit, weight in zip(digits, weights)) % 11 % 10
+
+
+def validate_inn(inn: str) -> None:
+    """ИНН организации (10 цифр) или физлица/ИП (12 цифр)"""
+    digits = _digits(inn, (10, 12), "INN")
+    if len(digits) == 10:
+        valid = _control(digits, _INN10_WEIGHTS) == digits[9]
+    else:
+        valid = (
+            _control(digits, _INN11_WEIGHTS) == digits[10]
+            and _control(digits, _INN12_WEIGHTS) == digits[11]
+        )
+    if not valid:
+        raise ValidationError(f"INN {inn}: checksum mismatch")
+
+
+def validate_kpp(kpp: str) -> None:
+    """КПП: код налоговой (4 цифры), причина постановки (2 цифры или буквы), номер (3 цифры)"""
+    if not (
+        isinstance(kpp, str) and len(kpp) == 9 and kpp.isascii()
+        and kpp[:4].isdigit() and kpp[6:].isdigit()
+        and kpp[4:6].isalnum() and kpp[4:6].upper() == kpp[4:6]
+    ):
+        raise ValidationError(f"KPP {kpp!r}: expected NNNNPPNNN")
+
+
+def validate_ogrn(ogrn: str) -> None:
+    """ОГРН (13 цифр) или ОГРНИП (15 цифр)"""
+    digits = _digits(ogrn, (13, 15), "OGRN")
+    modulus = 11 if len(digits) == 13 else 13
+    if int(ogrn[:-1]) % modulus % 10 != digits[-1]:
+        raise ValidationError(f"OGRN {ogrn}: checksum mismatch")
+
+
+def validate_bic(bic: str) -> None:
+    """БИК: 9 цифр"""
+    _digits(bic, (9,), "BIC")
+
+
+def _validate_account_key(account: str, prefix: str, what: str) -> None:
+    digits = _digits(account, (20,), what)
+    checksum = sum(
+        digit * weight % 10
+        for digit, weight in zip([int(char) for char in prefix] + digits, _ACCOUNT_WEIGHTS)
+    )
+    if checksum % 10:
+        raise ValidationError(f"{what} {account}: checksum mismatch with BIC")
+
+
+def validate_account(account: str, bic: str) -> None:
+    """Расчётный счёт: 20 цифр, ключ считается вместе с последними тремя цифрами БИК"""
+    validate_bic(bic)
+    _validate_account_key(account, bic[-3:], "Account")
+
+
+def validate_correspondent_account(account: str, bic: str) -> None:
+    """Корреспондентский счёт: ключ считается с «0» и 5–6 цифрами БИК"""
+    validate_bic(bic)
+    _validate_account_key(account, "0" + bic[4:6], "Correspondent account")
@@ -0,0 +1,39 @@
+from decimal import Decimal
+
+import pytest
+
+from src.amounts import amount_in_words, compute_totals, format_amount, ru_words, to_money
+from src.models import WorkItem
+
+
+def test_format_amount():
+    assert format_amount(Decimal("1234567.5")) == "1\u00a0234\u00a0567,50"
+
+
+@pytest.mark.parametrize("amount, words", [
+    ("1.01", "Один рубль 01 копейка"),
+    ("5", "Пять рублей 00 копеек"),
+    ("21001.05", "Двадцать одна тысяча один рубль 05 копеек"),
+    ("2000000", "Два миллиона рублей 00 копеек"),
+])
+def test_amount_in_words(amount, words):
+    assert amount_in_words(Decimal(amount)) == words
+
+
+def test_ru_words():
+    assert ru_words(0) == "ноль"
+    assert ru_words(112) == "сто двенадцать"
+
+
+def test_to_money_rounds_half_up():
+    assert to_money("0.005") == Decimal("0.01")
+    assert to_money(2.675) == Decimal("2.68")
+
+
+def test_compute_totals_vat_included():
+    jobs = [WorkItem(task="Обслуживание ККТ", price=600, quantity=10)]
+    totals = compute_totals(jobs, 20)
+    assert totals.line_totals == (Decimal("6000.00"),)
+    assert totals.total == Decimal("6000.00")
+    assert totals.vat == Decimal("1000.00")
+    assert compute_totals(jobs).vat == Decimal("0.00")
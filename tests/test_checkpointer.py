@@ -0,0 +1,43 @@
+import time
+
+from langgraph.checkpoint.base import create_checkpoint, empty_checkpoint
+
+from src.agents.checkpointer import SqliteCheckpointer
+
+
+def _put(saver: SqliteCheckpointer, thread_id: str, steps: int) -> dict:
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    checkpoint = empty_checkpoint()
+    for step in range(steps):
+        checkpoint = create_checkpoint(checkpoint, None, step)
+        config = saver.put(config, checkpoint, {"step": step}, {})
+    return config
+
+
+def _thread_ids(saver: SqliteCheckpointer) -> set[str]:
+    return {item.config["configurable"]["thread_id"] for item in saver.list(None)}
+
+
+def test_put_keeps_last_checkpoints(tmp_path):
+    saver = SqliteCheckpointer(tmp_path / "state.sqlite3", keep_last=2)
+    config = _put(saver, "thread", 5)
+    history = list(saver.list({"configurable": {"thread_id": "thread"}}))
+    assert len(history) == 2
+    assert history[0].config["configurable"]["checkpoint_id"] == (
+        config["configurable"]["checkpoint_id"]
+    )
+    assert history[0].metadata["step"] == 4
+
+
+def test_evict_finished_and_idle_threads(tmp_path):
+    saver = SqliteCheckpointer(tmp_path / "state.sqlite3", finished_ttl=0.05, idle_ttl=3600)
+    _put(saver, "finished", 1)
+    _put(saver, "active", 1)
+    saver.mark_finished("finished")
+    time.sleep(0.1)
+    assert saver.evict() == 1
+    assert _thread_ids(saver) == {"active"}
+
+    saver.idle_ttl = 0.05
+    assert saver.evict() == 1
+    assert _thread_ids(saver) == set()
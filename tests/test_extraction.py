@@ -0,0 +1,48 @@
+from src.agents.extraction import ExtractionState
+
+CUSTOMER = {
+    "name": 'МАУ "СС"',
+    "inn": "0323347497",
+    "kpp": "032301001",
+    "ogrn": "1030300123457",
+    "address": "670031, Улан-Удэ г, Широких-Полянского ул, дом № 50",
+    "signatory": "Иванов И.И.",
+}
+JOBS = [{"task": "Обслуживание ККТ", "price": 600, "quantity": 10}]
+
+
+def test_follow_up_lists_missing_fields():
+    state = ExtractionState()
+    state.merge({"customer": {"name": CUSTOMER["name"], "inn": None}, "jobs": []})
+    assert state.missing == ["inn", "ogrn", "address", "signatory", "jobs"]
+    assert state.follow_up() == (
+        "Не хватает: ИНН, ОГРН, адрес, подписант, работы (название, количество, цена)."
+    )
+
+
+def test_follow_up_asks_about_invalid_field():
+    state = ExtractionState()
+    state.merge({"customer": {**CUSTOMER, "inn": "0323347498"}, "jobs": JOBS})
+    assert state.missing == []
+    assert list(state.invalid) == ["inn"]
+    assert state.follow_up().startswith("Проверьте ИНН:")
+    assert not state.complete
+
+
+def test_merge_keeps_known_values_and_completes():
+    state = ExtractionState()
+    state.merge({"customer": CUSTOMER, "jobs": JOBS})
+    state.merge({"customer": {"inn": None, "signatory": " Петров П.П. "}, "jobs": None})
+    assert state.customer["inn"] == CUSTOMER["inn"]
+    assert state.customer["signatory"] == "Петров П.П."
+    assert state.complete
+    assert state.follow_up() is None
+    assert state.to_customer().slug == "inn_0323347497_032301001"
+
+
+def test_round_trip():
+    state = ExtractionState(turns=2)
+    state.merge({"customer": CUSTOMER, "jobs": JOBS})
+    state.usage.output_tokens = 7
+    restored = ExtractionState.from_dict(state.to_dict())
+    assert restored.to_dict() == state.to_dict()
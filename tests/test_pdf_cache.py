@@ -0,0 +1,57 @@
+import os
+import time
+
+from src.debug_tools.pdf_cache import PdfCache, template_files
+
+
+def _templates(tmp_path):
+    common = tmp_path / "common"
+    common.mkdir()
+    (common / "ru-numbers.typ").write_text("#let words(n) = n\n", encoding="utf-8")
+    act = tmp_path / "act.typ"
+    act.write_text('#import "common/ru-numbers.typ": words\nАкт\n', encoding="utf-8")
+    invoice = tmp_path / "invoice.typ"
+    invoice.write_text("Счёт\n", encoding="utf-8")
+    return act, invoice, common / "ru-numbers.typ"
+
+
+def test_template_files_follows_imports(tmp_path):
+    act, invoice, common = _templates(tmp_path)
+    assert template_files(str(act)) == sorted([act, common])
+    assert template_files(str(invoice)) == [invoice]
+
+
+def test_key_depends_on_inputs_and_imported_sources(tmp_path):
+    act, invoice, common = _templates(tmp_path)
+    cache = PdfCache(str(tmp_path / "cache"))
+    inputs = {"document_data": '{"number": 1}'}
+
+    act_key = cache.key(str(act), inputs)
+    invoice_key = cache.key(str(invoice), inputs)
+    assert cache.key(str(act), dict(inputs)) == act_key
+    assert cache.key(str(act), {"document_data": '{"number": 2}'}) != act_key
+
+    common.write_text("#let words(n) = str(n)\n", encoding="utf-8")
+    assert cache.key(str(act), inputs) != act_key
+    assert cache.key(str(invoice), inputs) == invoice_key
+
+
+def test_get_put(tmp_path):
+    cache = PdfCache(str(tmp_path / "cache"))
+    assert cache.get("ab" * 16) is None
+    cache.put("ab" * 16, b"%PDF-1.7")
+    assert cache.get("ab" * 16) == b"%PDF-1.7"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evict_removes_expired_then_oldest_over_limit(tmp_path):
+    cache = PdfCache(str(tmp_path / "cache"), max_bytes=250, max_age=3600, evict_every=1000)
+    now = time.time()
+    keys = ["aa" * 16, "bb" * 16, "cc" * 16, "dd" * 16]
+    for key, age in zip(keys, (7200, 300, 200, 100)):
+        cache.put(key, b"x" * 100)
+        path = cache._entry_path(key)
+        os.utime(path, (now - age, now - age))
+
+    assert cache.evict() == 2
+    assert [cache._entry_path(key).exists() for key in keys] == [False, False, True, True]
@@ -0,0 +1,73 @@
+import threading
+
+from src.debug_tools.scheduler import BATCH, INTERACTIVE, GenerationScheduler
+
+
+def _blocked(scheduler: GenerationScheduler) -> threading.Event:
+    """Занимает единственный воркер, пока тест не отпустит событие"""
+    release, started = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    scheduler.submit(None, block, BATCH)
+    assert started.wait(5)
+    return release
+
+
+def test_same_key_is_deduplicated():
+    scheduler = GenerationScheduler(max_workers=1)
+    release = _blocked(scheduler)
+    calls = []
+    first = scheduler.submit("key", lambda: calls.append(1) or "pdf", BATCH)
+    second = scheduler.submit("key", lambda: calls.append(2) or "other", BATCH)
+    assert first is second
+    assert scheduler.depth == 1
+    release.set()
+    assert first.result(5) == "pdf"
+    assert calls == [1]
+
+
+def test_interactive_duplicate_upgrades_priority():
+    scheduler = GenerationScheduler(max_workers=1)
+    release = _blocked(scheduler)
+    order = []
+    lock = threading.Lock()
+
+    def task(name):
+        def run():
+            with lock:
+                order.append(name)
+        return run
+
+    batch = scheduler.submit("batch", task("batch"), BATCH)
+    upgraded = scheduler.submit("upgraded", task("upgraded"), BATCH)
+    # Одинаковый ключ — одинаковая компиляция: годится функция любого из ждущих
+    assert scheduler.submit("upgraded", task("upgraded"), INTERACTIVE) is upgraded
+    assert scheduler.depth == 2
+    release.set()
+    batch.result(5)
+    upgraded.result(5)
+    assert order == ["upgraded", "batch"]
+
+
+def test_interactive_runs_before_queued_batch():
+    scheduler = GenerationScheduler(max_workers=1)
+    release = _blocked(scheduler)
+    order = []
+    batch = scheduler.submit(None, lambda: order.append("batch"), BATCH)
+    interactive = scheduler.submit(None, lambda: order.append("interactive"), INTERACTIVE)
+    release.set()
+    batch.result(5)
+    interactive.result(5)
+    assert order == ["interactive", "batch"]
+
+
+def test_key_is_released_after_completion():
+    scheduler = GenerationScheduler(max_workers=1)
+    first = scheduler.submit("key", lambda: 1, BATCH)
+    assert first.result(5) == 1
+    second = scheduler.submit("key", lambda: 2, BATCH)
+    assert second is not first
+    assert second.result(5) == 2
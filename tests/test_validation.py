@@ -0,0 +1,63 @@
+import pytest
+
+from src.exceptions import ValidationError
+from src.validation import (
+    validate_account,
+    validate_bic,
+    validate_correspondent_account,
+    validate_inn,
+    validate_kpp,
+    validate_ogrn,
+)
+
+BIC = "044525225"
+
+
+@pytest.mark.parametrize("inn", ["0323347497", "7707083893", "500100732259"])
+def test_inn_valid(inn):
+    validate_inn(inn)
+
+
+@pytest.mark.parametrize(
+    "inn", ["0323347498", "500100732250", "032334749", "03233474ab", "０３２３３４７４９７"]
+)
+def test_inn_invalid(inn):
+    with pytest.raises(ValidationError):
+        validate_inn(inn)
+
+
+@pytest.mark.parametrize("kpp", ["032301001", "7707AB001"])
+def test_kpp_valid(kpp):
+    validate_kpp(kpp)
+
+
+@pytest.mark.parametrize("kpp", ["03230100", "7707ab001", "77070100A"])
+def test_kpp_invalid(kpp):
+    with pytest.raises(ValidationError):
+        validate_kpp(kpp)
+
+
+@pytest.mark.parametrize("ogrn", ["1030300123457", "304030000123452"])
+def test_ogrn_valid(ogrn):
+    validate_ogrn(ogrn)
+
+
+@pytest.mark.parametrize("ogrn", ["1030300123458", "304030000123453", "10303001234"])
+def test_ogrn_invalid(ogrn):
+    with pytest.raises(ValidationError):
+        validate_ogrn(ogrn)
+
+
+def test_bic():
+    validate_bic(BIC)
+    with pytest.raises(ValidationError):
+        validate_bic("04452522")
+
+
+def test_accounts():
+    validate_account("40802812000000001234", BIC)
+    validate_correspondent_account("30101810400000000225", BIC)
+    with pytest.raises(ValidationError):
+        validate_account("40802812000000001235", BIC)
+    with pytest.raises(ValidationError):
+        validate_correspondent_account("30101810400000000226", BIC)